@@ -1,18 +1,43 @@
 # Import required libraries
+# startup goes first so time-to-ready includes every other import
+from util.startup import StartupState
 import json
+import hashlib
 import numpy as np
 import requests
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify
 from flask_sqlalchemy import SQLAlchemy
-from flask_bcrypt import Bcrypt
 from flask_cors import CORS
 from extensions import db
 from models import User
 from db_config import get_db_connection
-import tensorflow as tf
-from util.preprocessing import preprocess, preprocess_halal
-from transformers import BertTokenizer
+from util.preprocessing import (preprocess, preprocess_halal_batch, preprocess_shared, token_cache,
+                                cache_key_text, e_code_value)
+from util.model_registry import ModelRegistry, file_fingerprint
+from util.batching import MicroBatcher
+from util.metrics import REGISTRY, STAGE_SECONDS
+from util.spoonacular import SpoonacularClient
+from util.profile_cache import ProfileCache
+from util.personalization import LabelAllergenIndex
+from util.password_hasher import PasswordHasher, HasherBusy, PASSWORD_HASH_PRESTART
+from util.result_cache import ResultCache
+from util.allergen_matcher import AllergenMatcher
+from util.tokenizer import get_tokenizer, TOKENIZER_BACKEND, TOKENIZER_VOCAB_PATH, TOKENIZER_PRETRAINED
+from util.ecode_index import get_e_code_index
+from util.sequence_buckets import SEQUENCE_BUCKETS, parse_buckets, split_by_bucket, trim_inputs
 import os
+import threading
+import time
+import logging
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+# Leveled logging; set LOG_LEVEL=DEBUG to see per-request input/output dumps
+logging.basicConfig(
+    level=os.environ.get('LOG_LEVEL', 'INFO').upper(),
+    format='%(asctime)s %(levelname)s %(name)s: %(message)s'
+)
+logger = logging.getLogger(__name__)
 
 # Add this near the top of app.py
 ALLERGEN_SYNONYMS = {
@@ -29,6 +54,20 @@ ALLERGEN_SYNONYMS = {
     # Add more as needed
     }
 
+# Synonym table compiled once into a single-pass multi-pattern matcher
+ALLERGEN_MATCHER = AllergenMatcher(ALLERGEN_SYNONYMS)
+
+
+@functools.lru_cache(maxsize=256)
+def _allergen_matcher_for(extra_terms):
+    """
+    Matcher that also knows allergens missing from ALLERGEN_SYNONYMS
+    (each one matched as its own term). Cached per set of extra terms.
+    """
+    if not extra_terms:
+        return ALLERGEN_MATCHER
+    return ALLERGEN_MATCHER.extended({term: [term] for term in extra_terms})
+
 
 #for running:
 
@@ -43,8 +82,18 @@ app = Flask(__name__)
 
 # Enable CORS (Cross-Origin Resource Sharing) for the app
 CORS(app)
-# Initialize Bcrypt for password hashing
-bcrypt = Bcrypt(app)
+# bcrypt password hashing in a bounded process pool, off the request threads
+# (BCRYPT_LOG_ROUNDS and PASSWORD_HASH_* settings)
+password_hasher = PasswordHasher()
+if PASSWORD_HASH_PRESTART:
+    # Fork the hashing processes now, before any threads or models exist
+    password_hasher.start()
+
+
+@app.errorhandler(HasherBusy)
+def hasher_busy(e):
+    # Too many logins/signups at once; the client should retry shortly
+    return jsonify({'status': 'error', 'message': 'Server busy, please retry'}), 503, {'Retry-After': '1'}
 
 # Configure the database - using SQLite for development
 app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///users.db'
@@ -65,7 +114,7 @@ def signup():
     username = data['username']
 
     # Hash the password for secure storage
-    hashed_password = bcrypt.generate_password_hash(password).decode('utf-8')
+    hashed_password = password_hasher.generate_password_hash(password)
 
     # Get database connection and cursor
     conn = get_db_connection()
@@ -98,22 +147,43 @@ def login():
     conn = get_db_connection()
     cursor = conn.cursor(dictionary=True)
 
-    # Query user by email
-    cursor.execute("SELECT * FROM users WHERE email = %s", (email,))
-    user = cursor.fetchone()
-
-    # Close connection
-    cursor.close()
-    conn.close()
+    try:
+        # Query user by email
+        cursor.execute("SELECT * FROM users WHERE email = %s", (email,))
+        user = cursor.fetchone()
+    finally:
+        # Return connection to the pool
+        cursor.close()
+        conn.close()
 
     # Verify password and return appropriate response
-    if user and bcrypt.check_password_hash(user['password'], password):
+    if user and password_hasher.check_password_hash(user['password'], password):
         # Remove password from response for security
         user.pop('password', None)
         return jsonify({'status': 'success', 'message': 'Login successful', 'user': user})
     else:
         return jsonify({'status': 'error', 'message': 'Invalid credentials'})
 
+def load_allergens(user_id):
+    """
+    Read a user's allergen list from the database.
+    Returns None for an unknown user, so that is not cached.
+    """
+    conn = get_db_connection()
+    cursor = conn.cursor(dictionary=True)
+    try:
+        cursor.execute("SELECT allergens FROM users WHERE id=%s", (user_id,))
+        row = cursor.fetchone()
+    finally:
+        cursor.close()
+        conn.close()
+    if row is None:
+        return None
+    return json.loads(row['allergens']) if row['allergens'] else []
+
+# Read-through cache in front of load_allergens (PROFILE_CACHE_* settings)
+profile_cache = ProfileCache(load_allergens)
+
 # Endpoint to set user allergens
 @app.route('/user/allergens', methods=['POST'])
 def set_allergens():
@@ -124,27 +194,33 @@ def set_allergens():
     # Update user's allergens in database
     conn = get_db_connection()
     cursor = conn.cursor()
-    cursor.execute("UPDATE users SET allergens=%s WHERE id=%s", (json.dumps(allergens), user_id))
-    conn.commit()
-    cursor.close()
-    conn.close()
+    try:
+        cursor.execute("UPDATE users SET allergens=%s WHERE id=%s", (json.dumps(allergens), user_id))
+        conn.commit()
+        updated = cursor.rowcount
+    finally:
+        cursor.close()
+        conn.close()
+    if not updated:
+        # MySQL also reports 0 rows when the profile did not change
+        if load_allergens(user_id) is None:
+            return jsonify({'status': 'error', 'message': 'User not found'}), 404
+    else:
+        # The next read (in any worker) loads the new profile
+        profile_cache.invalidate(user_id)
     return jsonify({'status': 'success'})
 
 # Endpoint to get user allergens
 @app.route('/user/allergens/<int:user_id>', methods=['GET'])
 def get_allergens(user_id):
-    conn = get_db_connection()
-    cursor = conn.cursor(dictionary=True)
-    cursor.execute("SELECT allergens FROM users WHERE id=%s", (user_id,))
-    row = cursor.fetchone()
-    cursor.close()
-    conn.close()
-    if row and row['allergens']:
-        return jsonify({'allergens': json.loads(row['allergens'])})
-    return jsonify({'allergens': []})
+    allergens = profile_cache.get(user_id)
+    return jsonify({'allergens': allergens or []})
 
 # Spoonacular API key for recipe recommendations
-SPOONACULAR_API_KEY = 'c58c7853ee004c26b4de0f0eedaa09fd'
+SPOONACULAR_API_KEY = os.environ.get('SPOONACULAR_API_KEY', 'c58c7853ee004c26b4de0f0eedaa09fd')
+
+# Shared keep-alive client (base URL and timeouts configurable via environment)
+spoonacular = SpoonacularClient(SPOONACULAR_API_KEY)
 
 # Endpoint to get allergen-free recipe recommendations
 @app.route('/recipes/recommend', methods=['POST'])
@@ -152,38 +228,44 @@ def recommend_recipes():
     data = request.json
     allergens = data.get('allergens', [])
     # Expand allergens to include synonyms
+    requested = set()
     allergen_terms = set()
     for allergen in allergens:
-        allergen = allergen.lower()
+        allergen = allergen.lower().strip()
+        requested.add(allergen)
         if allergen in ALLERGEN_SYNONYMS:
             allergen_terms.update([a.lower() for a in ALLERGEN_SYNONYMS[allergen]])
         else:
             allergen_terms.add(allergen)
-    exclude = ','.join(allergen_terms)
-    url = f'https://api.spoonacular.com/recipes/complexSearch?apiKey={SPOONACULAR_API_KEY}&number=10'
-    if exclude:
-        url += f"&excludeIngredients={exclude}"
-    response = requests.get(url)
-    print("Received allergens:", allergens, flush=True)
-    print("Expanded allergen terms:", allergen_terms, flush=True)
-    print("Spoonacular URL:", url, flush=True)
-    print("Spoonacular response:", response.text, flush=True)
-    recipes = response.json().get('results', [])
-    print("Recipes list:", recipes, flush=True)
+    matcher = _allergen_matcher_for(frozenset(requested - set(ALLERGEN_SYNONYMS)))
+    logger.debug("Received allergens: %s", allergens)
+    logger.debug("Expanded allergen terms: %s", allergen_terms)
+
+    try:
+        recipes = spoonacular.search_recipes(allergen_terms, number=10)
+    except requests.RequestException as e:
+        logger.warning("Spoonacular search failed: %s", e)
+        return jsonify({'status': 'error', 'message': 'Recipe service unavailable'}), 502
+
+    # Fetch all recipe details concurrently instead of one after another
+    details_by_id = spoonacular.recipe_information_many(recipe['id'] for recipe in recipes)
 
     safe_recipes = []
     for recipe in recipes:
         recipe_id = recipe['id']
-        detail_url = f'https://api.spoonacular.com/recipes/{recipe_id}/information?apiKey={SPOONACULAR_API_KEY}'
-        detail_resp = requests.get(detail_url)
-        if detail_resp.status_code == 200:
-            details = detail_resp.json()
-            ingredient_names = [i['name'].lower() for i in details.get('extendedIngredients', [])]
-            matched = [term for term in allergen_terms for ingredient in ingredient_names if term in ingredient]
+        details = details_by_id.get(recipe_id)
+        if details is not None:
+            ingredient_names = [i['name'] for i in details.get('extendedIngredients', [])]
+            # Single pass over all ingredient names; keep only requested allergens
+            matched = {
+                allergen: terms
+                for allergen, terms in matcher.matches(ingredient_names).items()
+                if allergen in requested
+            }
             if not matched:
                 safe_recipes.append(recipe)
             else:
-                print(f"Filtered out recipe {recipe_id} due to allergen match: {matched}", flush=True)
+                logger.debug("Filtered out recipe %s due to allergen match: %s", recipe_id, matched)
     return jsonify({'recipes': safe_recipes})
 
 # Endpoint for password reset
@@ -198,16 +280,18 @@ def reset_password():
         return jsonify({'status': 'error', 'message': 'Email and new password required'}), 400
 
     # Hash the new password
-    hashed_password = bcrypt.generate_password_hash(new_password).decode('utf-8')
+    hashed_password = password_hasher.generate_password_hash(new_password)
 
     # Update password in database
     conn = get_db_connection()
     cursor = conn.cursor()
-    cursor.execute("UPDATE users SET password=%s WHERE email=%s", (hashed_password, email))
-    conn.commit()
-    updated = cursor.rowcount
-    cursor.close()
-    conn.close()
+    try:
+        cursor.execute("UPDATE users SET password=%s WHERE email=%s", (hashed_password, email))
+        conn.commit()
+        updated = cursor.rowcount
+    finally:
+        cursor.close()
+        conn.close()
 
     # Return appropriate response
     if updated:
@@ -226,235 +310,562 @@ labels_path = os.path.join(BASE_DIR,'model', 'exolabels.txt')
 # Load allergen labels
 with open(labels_path, 'r') as f:
     ALLERGEN_LABELS = [line.strip() for line in f.readlines()]
-# Get the directory where app.py is located
+
+# Profile allergens -> model labels, as bitmasks for /predict with a user_id
+LABEL_INDEX = LabelAllergenIndex(ALLERGEN_LABELS, ALLERGEN_SYNONYMS)
+
+# Model files (overridable so the backend can be pointed at other builds)
+model_path = os.environ.get('ALLERGEN_MODEL_PATH', os.path.join(BASE_DIR, 'model', 'model.tflite'))
+halal_model_path = os.environ.get('HALAL_MODEL_PATH', os.path.join(BASE_DIR, 'halal_model.tflite'))
+
+# Load both models once and serve pre-allocated interpreters from a pool
+model_registry = ModelRegistry()
+model_registry.register('allergen', model_path)
+model_registry.register('halal', halal_model_path)
+
+# Texts are tokenized to this length; with SEQUENCE_BUCKETS set each text is
+# then run at the smallest bucket length its tokens fit in
+MAX_SEQUENCE_LENGTH = 128
+SEQUENCE_BUCKET_LENGTHS = parse_buckets(SEQUENCE_BUCKETS, MAX_SEQUENCE_LENGTH)
+
+
+def _batching_config(prefix):
+    """
+    Read the opt-in micro-batching settings for one endpoint, e.g.
+    PREDICT_BATCHING=1, PREDICT_BATCH_WINDOW_MS=5, PREDICT_MAX_BATCH=32.
+    """
+    enabled = os.environ.get(f'{prefix}_BATCHING', '0').lower() in ('1', 'true', 'yes')
+    window_ms = float(os.environ.get(f'{prefix}_BATCH_WINDOW_MS', 5))
+    max_batch = int(os.environ.get(f'{prefix}_MAX_BATCH', 32))
+    return enabled, window_ms, max_batch
+
+
+def _run_chunked(name, inputs, chunk_size=None, endpoint=None, sequence_length=None):
+    """
+    Run a model over already preprocessed inputs, chunk_size rows per invoke().
+    Args:
+        name (str): Registered model name.
+        inputs (list or dict): Input arrays with the batch as first dimension.
+        chunk_size (int or None): Rows per model run; None runs everything at once.
+        endpoint (str): Endpoint label for the stage timings.
+        sequence_length (int or None): Run on the interpreters resized to this
+            sequence length; None uses the model's own.
+    Returns:
+        np.ndarray: The first output tensor for all rows.
+    """
+    endpoint = endpoint or name
+    arrays = list(inputs.values()) if isinstance(inputs, dict) else inputs
+    total = arrays[0].shape[0]
+    chunk_size = chunk_size or total
+    outputs = []
+    for start in range(0, total, chunk_size):
+        if isinstance(inputs, dict):
+            chunk = {key: value[start:start + chunk_size] for key, value in inputs.items()}
+        else:
+            chunk = [value[start:start + chunk_size] for value in inputs]
+        with model_registry.checkout(name, sequence_length=sequence_length) as pooled:
+            with STAGE_SECONDS.time(endpoint=endpoint, stage='tensor_set'):
+                pooled.set_inputs(chunk)
+            with STAGE_SECONDS.time(endpoint=endpoint, stage='invoke'):
+                pooled.invoke()
+            outputs.append(pooled.output())
+    return np.concatenate(outputs)
+
+
+def _run_bucketed(name, inputs, attention_mask, chunk_size=None, endpoint=None):
+    """
+    Run a model with each row trimmed to the smallest sequence-length bucket
+    its tokens fit in (see SEQUENCE_BUCKETS), one group of rows per bucket.
+    Without buckets this is _run_chunked at full length.
+    Returns:
+        np.ndarray: The first output tensor for all rows, in input order.
+    """
+    buckets = model_registry.supported_buckets(name, SEQUENCE_BUCKET_LENGTHS) if SEQUENCE_BUCKET_LENGTHS else ()
+    if len(buckets) < 2:
+        return _run_chunked(name, inputs, chunk_size, endpoint)
+
+    output = None
+    for length, rows in split_by_bucket(attention_mask, buckets):
+        part = _run_chunked(name, trim_inputs(inputs, rows, length, MAX_SEQUENCE_LENGTH),
+                            chunk_size, endpoint, sequence_length=length)
+        if output is None:
+            output = np.empty((attention_mask.shape[0],) + part.shape[1:], dtype=part.dtype)
+        output[rows] = part
+    return output
+
+
+def run_allergen_batch(texts, chunk_size=None, endpoint='predict'):
+    """
+    Run the allergen model on a list of texts, tokenized in one call.
+    Returns one row of label scores per text.
+    """
+    with STAGE_SECONDS.time(endpoint=endpoint, stage='tokenize'):
+        inputs = preprocess(texts, max_length=MAX_SEQUENCE_LENGTH)
+    return _allergen_scores(inputs, chunk_size, endpoint)
+
+
+def _allergen_scores(inputs, chunk_size=None, endpoint='predict'):
+    input_word_ids, input_mask, input_type_ids = inputs
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Allergen inputs: %d texts, shapes %s %s %s", len(input_word_ids),
+                     input_word_ids.shape, input_mask.shape, input_type_ids.shape)
+    output = _run_bucketed('allergen', [input_word_ids, input_mask, input_type_ids], input_mask,
+                           chunk_size, endpoint)
+    return list(output)
+
+
+def run_halal_batch(items, chunk_size=None, endpoint='halal_check'):
+    """
+    Run the halal model on a list of (text, e_code) pairs, tokenized in one call.
+    Returns one halal probability per pair.
+    """
+    texts = [text for text, _ in items]
+    e_codes = [e_code for _, e_code in items]
+    with STAGE_SECONDS.time(endpoint=endpoint, stage='tokenize'):
+        inputs = preprocess_halal_batch(
+            texts, e_codes, tokenizer=get_tokenizer(), max_length=MAX_SEQUENCE_LENGTH
+        )
+    return _halal_probs(inputs, chunk_size, endpoint)
+
+
+def _halal_probs(inputs, chunk_size=None, endpoint='halal_check'):
+    input_ids, attention_mask, e_code_input = inputs
+    if logger.isEnabledFor(logging.DEBUG):
+        for detail in model_registry.pool('halal').input_details:
+            logger.debug("Halal model input: name='%s', shape=%s, dtype=%s",
+                         detail['name'], detail['shape'], detail['dtype'])
+        logger.debug("Halal inputs: input_ids %s range [%d, %d], attention_mask sum %d, e_code_input %s",
+                     input_ids.shape, input_ids.min(), input_ids.max(),
+                     attention_mask.sum(), e_code_input.ravel().tolist())
+    output = _run_bucketed('halal', {
+        'input_ids': input_ids,
+        'attention_mask': attention_mask,
+        'e_code_input': e_code_input,
+    }, attention_mask, chunk_size, endpoint)
+    return [float(row[0]) for row in output]
+
+
+# Runs the halal model next to the allergen model for /analyze; TFLite
+# releases the GIL during invoke(), so the two models overlap
+ANALYZE_CONCURRENT = os.environ.get('ANALYZE_CONCURRENT', '1').lower() in ('1', 'true', 'yes')
+ANALYZE_WORKERS = int(os.environ.get('ANALYZE_WORKERS', 4))
+_analyze_executor = ThreadPoolExecutor(max_workers=ANALYZE_WORKERS, thread_name_prefix='analyze')
+
+
+def _reset_analyze_executor():
+    # Worker threads do not survive fork(); give each gunicorn worker its own
+    global _analyze_executor
+    _analyze_executor = ThreadPoolExecutor(max_workers=ANALYZE_WORKERS, thread_name_prefix='analyze')
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_analyze_executor)
+
+
+def run_analysis_batch(items, chunk_size=None, endpoint='analyze'):
+    """
+    Run both models on a list of (text, e_code) pairs from a single
+    tokenization, the two models concurrently when ANALYZE_CONCURRENT is on.
+    Returns:
+        list: One (allergen score row, halal probability) pair per item.
+    """
+    texts = [text for text, _ in items]
+    e_codes = [e_code for _, e_code in items]
+    with STAGE_SECONDS.time(endpoint=endpoint, stage='tokenize'):
+        allergen_inputs, halal_inputs = preprocess_shared(
+            texts, e_codes, tokenizer=get_tokenizer(), max_length=MAX_SEQUENCE_LENGTH
+        )
+    if ANALYZE_CONCURRENT:
+        halal_future = _analyze_executor.submit(_halal_probs, halal_inputs, chunk_size, endpoint)
+        scores = _allergen_scores(allergen_inputs, chunk_size, endpoint)
+        halal_probs = halal_future.result()
+    else:
+        scores = _allergen_scores(allergen_inputs, chunk_size, endpoint)
+        halal_probs = _halal_probs(halal_inputs, chunk_size, endpoint)
+    return list(zip(scores, halal_probs))
+
+
+# Opt-in batching layers that coalesce concurrent single-text requests
+batchers = {}
+for _endpoint, _prefix, _batch_fn in (('predict', 'PREDICT', run_allergen_batch),
+                                      ('halal_check', 'HALAL', run_halal_batch),
+                                      ('analyze', 'ANALYZE', run_analysis_batch)):
+    _enabled, _window_ms, _max_batch = _batching_config(_prefix)
+    if _enabled:
+        batchers[_endpoint] = MicroBatcher(_endpoint, _batch_fn, window_ms=_window_ms, max_batch=_max_batch)
+
+
+# Endpoint for interpreter pool and batching statistics (checkouts, wait times, batch sizes)
+@app.route('/models/stats', methods=['GET'])
+def model_stats():
+    return jsonify({
+        'pools': model_registry.stats(),
+        'batchers': {name: batcher.stats() for name, batcher in batchers.items()},
+        'token_cache': token_cache.stats(),
+        'profile_cache': profile_cache.stats(),
+        'password_hasher': password_hasher.stats(),
+        'result_cache': result_cache.stats(),
+    })
+
+
+def _numeric_stats(stats_by_name):
+    """
+    Flatten {name: {stat: value}} into gauge samples, keeping numeric values
+    only. Booleans become 0/1; Prometheus cannot parse True/False.
+    """
+    return {
+        (name, stat): int(value) if isinstance(value, bool) else value
+        for name, stats in stats_by_name.items()
+        for stat, value in stats.items()
+        if isinstance(value, (int, float))
+    }
+
+REGISTRY.gauge('nutriguard_interpreter_pool', 'Interpreter pool statistics.', ('model', 'stat'),
+               lambda: _numeric_stats(model_registry.stats()))
+REGISTRY.gauge('nutriguard_batcher', 'Micro-batching statistics.', ('endpoint', 'stat'),
+               lambda: _numeric_stats({name: batcher.stats() for name, batcher in batchers.items()}))
+REGISTRY.gauge('nutriguard_token_cache', 'Tokenization cache statistics.', ('cache', 'stat'),
+               lambda: _numeric_stats({'tokens': token_cache.stats()}))
+REGISTRY.gauge('nutriguard_result_cache', 'Response cache statistics.', ('cache', 'stat'),
+               lambda: _numeric_stats({'results': result_cache.stats()}))
+REGISTRY.gauge('nutriguard_password_hasher', 'Password hashing pool statistics.', ('pool', 'stat'),
+               lambda: _numeric_stats({'bcrypt': password_hasher.stats()}))
+REGISTRY.gauge('nutriguard_profile_cache', 'Allergen profile cache statistics.', ('cache', 'stat'),
+               lambda: _numeric_stats({'profiles': profile_cache.stats()}))
 
 
+# Endpoint for Prometheus metrics (stage latency histograms, pool and cache stats)
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    return Response(REGISTRY.render(), mimetype='text/plain; version=0.0.4')
+
+
+# Cache of final /predict and /halal_check responses, keyed by model version
+# and normalized input (RESULT_CACHE_* settings)
+result_cache = ResultCache()
+
+
+@functools.lru_cache(maxsize=None)
+def _inference_settings(name):
+    """
+    Settings besides the model file that change a model's outputs: sequence
+    length, the buckets it actually runs at, tokenizer backend and
+    vocabulary. Part of every result cache key, so a restart with other
+    settings does not serve results (or ETags) computed under the old ones.
+
+    Computed once per process, like the model fingerprints (taken when a
+    model is loaded): replacing a .tflite or vocab.txt on disk does not
+    change any key until the next restart, and cached responses and ETags
+    from before the swap stay valid until then. Restart after swapping.
+    """
+    tokenizer = get_tokenizer()
+    vocab = file_fingerprint(TOKENIZER_VOCAB_PATH) if os.path.exists(TOKENIZER_VOCAB_PATH) else TOKENIZER_PRETRAINED
+    buckets = model_registry.supported_buckets(name, SEQUENCE_BUCKET_LENGTHS) if SEQUENCE_BUCKET_LENGTHS else ()
+    return (f"max_length={MAX_SEQUENCE_LENGTH};buckets={','.join(map(str, buckets))};"
+            f"tokenizer={TOKENIZER_BACKEND}/{type(tokenizer).__name__};vocab={vocab}")
+
+
+def _etag(key, profile=None):
+    """
+    ETag of a response: its result cache key, mixed with the user's
+    allergens when the response is personalized.
+    """
+    if profile is None:
+        return key
+    return hashlib.sha256((key + json.dumps(sorted(profile))).encode('utf-8')).hexdigest()
+
+
+def _with_etag(response, etag):
+    response.set_etag(etag)
+    return response
+
+
+def _not_modified(etag):
+    # The client already has this exact response; skip the model and the payload
+    return _with_etag(Response(status=304), etag)
 
 
 # Endpoint for allergen prediction
 @app.route('/predict', methods=['POST'])
 def predict():
-    print("=== /predict endpoint called ===", flush=True)
+    start = time.perf_counter()
     try:
-        # Example: Load a file in a 'data' subfolder
-        model_path = os.path.join(BASE_DIR,'model', 'model.tflite')
-        print(f"Model path: {model_path}", flush=True)
-        # Load TFLite model for allergen detection
-        interpreter = tf.lite.Interpreter(model_path=model_path)
-        interpreter.allocate_tensors()
-        print("Interpreter loaded and tensors allocated.", flush=True)
-
-        # Get input/output details from the model
-        input_details = interpreter.get_input_details()
-        output_details = interpreter.get_output_details()
-        print(f"Input details: {input_details}", flush=True)
-        print(f"Output details: {output_details}", flush=True)
-
         # Get input text from request
         data = request.get_json()
-        print("Received data:", data, flush=True)
         text = data['text']
-        print("Text to process:", text, flush=True)
-
-        # === Preprocess text ===
-        input_word_ids, input_mask, input_type_ids = preprocess(text)
-        print("Preprocessed input shapes:",
-              input_word_ids.shape, input_mask.shape, input_type_ids.shape, flush=True)
-
-        # Set TFLite model inputs
-        interpreter.set_tensor(input_details[0]['index'], input_word_ids)
-        interpreter.set_tensor(input_details[1]['index'], input_mask)
-        interpreter.set_tensor(input_details[2]['index'], input_type_ids)
-        print("Input tensors set.", flush=True)
-
-        # Run the model
-        interpreter.invoke()
-        print("Model invoked.", flush=True)
-
-        # Get model output
-        output = interpreter.get_tensor(output_details[0]['index'])  # shape: (1, num_labels)
-        prediction = output[0]  # shape: (num_labels,)
-        print("Raw model output:", prediction, flush=True)
-
-        # Apply threshold to filter relevant predictions
-        threshold = 0.5
-        model_prediction = {
-            label: float(score)
-            for label, score in zip(ALLERGEN_LABELS, prediction)
-            if score > threshold
-        }
-
-        # If no allergens above threshold, explicitly set to none
-        if not model_prediction:
-            response = {
-                "model_prediction": {},
-                "final_decision": "No Major Allergens",
-                "high_risk_ingredients": [],
-                "confidence": "Low"
-            }
-        else:
-            response = {
-                "model_prediction": model_prediction,
-                "final_decision": "Contains Allergens",
-                "high_risk_ingredients": list(model_prediction.keys()),
-                "confidence": "High"
-            }
-
-        return jsonify(response)
+        user_id = data.get('user_id')
+        logger.debug("/predict text: %r", text)
+        if user_id is not None and not isinstance(user_id, int):
+            return jsonify({'error': "'user_id' must be an integer"}), 400
+        profile = _user_profile(user_id)
+        if profile is None:
+            return jsonify({'error': 'Unknown user'}), 404
+
+        key = result_cache.key('predict', model_registry.fingerprint('allergen'), _inference_settings('allergen'),
+                               cache_key_text(text))
+        etag = _etag(key, profile if user_id is not None else None)
+        if request.if_none_match.contains(etag):
+            return _not_modified(etag)
+
+        def compute():
+            if 'predict' in batchers:
+                # Coalesced with other concurrent requests into one model run
+                prediction = batchers['predict'].submit(text)
+            else:
+                prediction = run_allergen_batch([text])[0]
+            logger.debug("Raw model output: %s", prediction)
+            with STAGE_SECONDS.time(endpoint='predict', stage='postprocess'):
+                return _allergen_response(prediction)
+
+        # Repeated scans of the same product are answered from the cache
+        response = result_cache.get_or_compute(key, compute)
+        if user_id is not None:
+            predicted = LABEL_INDEX.labels_mask(response['model_prediction'])
+            response = dict(response, personalized=_personalized_responses([predicted], profile)[0])
+        return _with_etag(jsonify(response), etag)
     except Exception as e:
-        print("Exception in /predict:", e, flush=True)
+        logger.exception("Exception in /predict")
         return jsonify({'error': str(e)}), 500
+    finally:
+        STAGE_SECONDS.observe(time.perf_counter() - start, endpoint='predict', stage='total')
+
+
+def _allergen_response(prediction, threshold=0.5):
+    """
+    Build the /predict response payload from one row of label scores.
+    """
+    # Apply threshold to filter relevant predictions
+    model_prediction = {
+        label: float(score)
+        for label, score in zip(ALLERGEN_LABELS, prediction)
+        if score > threshold
+    }
 
+    # If no allergens above threshold, explicitly set to none
+    if not model_prediction:
+        return {
+            "model_prediction": {},
+            "final_decision": "No Major Allergens",
+            "high_risk_ingredients": [],
+            "confidence": "Low"
+        }
+    return {
+        "model_prediction": model_prediction,
+        "final_decision": "Contains Allergens",
+        "high_risk_ingredients": list(model_prediction.keys()),
+        "confidence": "High"
+    }
 
-# Example: Load a file in a 'data' subfolder
-halal_model_path = os.path.join(BASE_DIR, 'halal_model.tflite')
-
-# Check if the halal model file exists
-print(os.path.exists(halal_model_path), flush=True)
-# Load TFLite model for halal detection
 
+def _user_profile(user_id):
+    """
+    Allergen list of the user a request is personalized for: [] when no
+    user_id is given, None for an unknown user.
+    """
+    if user_id is None:
+        return []
+    return profile_cache.get(user_id)
+
+
+def _personalized_responses(predicted_bits, profile):
+    """
+    Check predicted labels (one LABEL_INDEX bitmask per result) against one
+    user's allergen profile. Returns one payload per result, naming the
+    predicted labels that fall under the profile and the profile allergens
+    no label can check.
+    """
+    profile_mask, unchecked = LABEL_INDEX.profile_mask(profile)
+    # One AND over the whole batch
+    hits = np.asarray(predicted_bits, dtype=np.int64) & profile_mask
+    return [
+        {
+            "user_allergens": profile,
+            "matched_labels": LABEL_INDEX.labels_in(int(mask)),
+            "unchecked_allergens": unchecked,
+            "final_decision": "Contains Your Allergens" if mask else "No Allergens From Your Profile",
+        }
+        for mask in hits
+    ]
 
-# Load tokenizer and e_code mapping once for efficiency
-tokenizer = BertTokenizer.from_pretrained('bert-base-uncased')
-e_code_mapping_path = 'e_code_mapping.json'
 
 # Endpoint for halal status check
-# Add commentMore actions
 @app.route('/halal_check', methods=['POST'])
 def halal_check():
-    print("=== /halal_check endpoint called ===", flush=True)
-    print("Request data:", request.get_json(), flush=True)
-    
+    start = time.perf_counter()
     try:
-        halal_interpreter = tf.lite.Interpreter(model_path=halal_model_path)
-        halal_interpreter.allocate_tensors()
-        halal_input_details = halal_interpreter.get_input_details()
-        halal_output_details = halal_interpreter.get_output_details()
-
-        # Print model input details
-        print("\n=== MODEL INPUT DETAILS ===", flush=True)
-        for i, detail in enumerate(halal_input_details):
-            print(f"Input {i}: name='{detail['name']}', shape={detail['shape']}, dtype={detail['dtype']}", flush=True)
-
         data = request.get_json()
         text = data.get('text', '')
         e_code = data.get('e_code', None)
+        logger.debug("/halal_check text: %r, e_code: %r", text, e_code)
 
-        print(f"\nReceived text: '{text}'", flush=True)
-        print(f"Received e_code: '{e_code}'", flush=True)
+        key = result_cache.key('halal_check', model_registry.fingerprint('halal'), _inference_settings('halal'),
+                               cache_key_text(text), e_code_value(e_code))
+        if request.if_none_match.contains(key):
+            return _not_modified(key)
 
-        # Preprocess input
-        input_ids, attention_mask, e_code_input = preprocess_halal(
-            text,
-            e_code,
-            tokenizer=tokenizer,
-            e_code_mapping_path=e_code_mapping_path,
-            max_length=128
-        )
+        def compute():
+            if 'halal_check' in batchers:
+                # Coalesced with other concurrent requests into one model run
+                halal_prob = batchers['halal_check'].submit((text, e_code))
+            else:
+                halal_prob = run_halal_batch([(text, e_code)])[0]
+            logger.debug("Halal probability: %s", halal_prob)
+            with STAGE_SECONDS.time(endpoint='halal_check', stage='postprocess'):
+                return _halal_response(halal_prob)
 
-        # Print preprocessed data
-        print(f"\n=== PREPROCESSED DATA ===", flush=True)
-        print(f"input_ids shape: {input_ids.shape}, dtype: {input_ids.dtype}", flush=True)
-        print(f"input_ids min/max: {input_ids.min()}/{input_ids.max()}", flush=True)
-        print(f"input_ids first 10: {input_ids[0][:10]}", flush=True)
-        
-        print(f"attention_mask shape: {attention_mask.shape}, dtype: {attention_mask.dtype}", flush=True)
-        print(f"attention_mask sum: {attention_mask.sum()}", flush=True)
-        
-        print(f"e_code_input shape: {e_code_input.shape}, dtype: {e_code_input.dtype}", flush=True)
-        print(f"e_code_input value: {e_code_input}", flush=True)
-
-        # Validate input shapes match model expectations
-        print(f"\n=== SHAPE VALIDATION ===", flush=True)
-        for detail in halal_input_details:
-            if detail['name'] == 'input_ids':
-                expected_shape = detail['shape']
-                actual_shape = input_ids.shape
-                print(f"input_ids - Expected: {expected_shape}, Actual: {actual_shape}, Match: {expected_shape == list(actual_shape)}", flush=True)
-            elif detail['name'] == 'attention_mask':
-                expected_shape = detail['shape']
-                actual_shape = attention_mask.shape
-                print(f"attention_mask - Expected: {expected_shape}, Actual: {actual_shape}, Match: {expected_shape == list(actual_shape)}", flush=True)
-            elif detail['name'] == 'e_code_input':
-                expected_shape = detail['shape']
-                actual_shape = e_code_input.shape
-                print(f"e_code_input - Expected: {expected_shape}, Actual: {actual_shape}, Match: {expected_shape == list(actual_shape)}", flush=True)
-
-        # Additional safety checks before setting tensors
-        print(f"\n=== SAFETY CHECKS ===", flush=True)
-        
-        # Check for any extremely large values that might cause issues
-        if input_ids.max() > 50000:  # Reasonable upper bound for vocab
-            print(f"WARNING: Very large token ID detected: {input_ids.max()}", flush=True)
-            input_ids = np.clip(input_ids, 0, 30521)  # Clip to BERT vocab size
-            print(f"Clipped input_ids max to: {input_ids.max()}", flush=True)
-        
-        if e_code_input.max() > 1000:  # Reasonable upper bound for e-codes
-            print(f"WARNING: Very large e_code value detected: {e_code_input.max()}", flush=True)
-            e_code_input = np.clip(e_code_input, 0, 999)
-            print(f"Clipped e_code_input max to: {e_code_input.max()}", flush=True)
-
-        # Set tensors by name with error handling
-        print(f"\n=== SETTING TENSORS ===", flush=True)
-        for detail in halal_input_details:
-            try:
-                if detail['name'] == 'input_ids':
-                    print(f"Setting input_ids tensor...", flush=True)
-                    halal_interpreter.set_tensor(detail['index'], input_ids)
-                    print(f"✓ input_ids tensor set successfully", flush=True)
-                elif detail['name'] == 'attention_mask':
-                    print(f"Setting attention_mask tensor...", flush=True)
-                    halal_interpreter.set_tensor(detail['index'], attention_mask)
-                    print(f"✓ attention_mask tensor set successfully", flush=True)
-                elif detail['name'] == 'e_code_input':
-                    print(f"Setting e_code_input tensor...", flush=True)
-                    halal_interpreter.set_tensor(detail['index'], e_code_input)
-                    print(f"✓ e_code_input tensor set successfully", flush=True)
-            except Exception as tensor_error:
-                print(f"ERROR setting tensor {detail['name']}: {tensor_error}", flush=True)
-                raise tensor_error
-
-        # Try to invoke with additional error context
-        print(f"\n=== INVOKING MODEL ===", flush=True)
-        try:
-            halal_interpreter.invoke()
-            print(f"✓ Model invocation successful", flush=True)
-        except Exception as invoke_error:
-            print(f"ERROR during model invocation: {invoke_error}", flush=True)
-            print(f"Error type: {type(invoke_error)}", flush=True)
-            
-            # Try to identify which specific input might be causing the issue
-            print(f"\n=== DEBUGGING SPECIFIC INPUTS ===", flush=True)
-            
-            # Check if it's the input_ids causing issues
-            unique_tokens = np.unique(input_ids)
-            print(f"Unique tokens in input_ids: {len(unique_tokens)}", flush=True)
-            print(f"Token range: {unique_tokens.min()} to {unique_tokens.max()}", flush=True)
-            
-            # Check e_code specifically
-            print(f"E-code value being passed: {e_code_input[0][0]}", flush=True)
-            
-            raise invoke_error
-
-        # Get output
-        output = halal_interpreter.get_tensor(halal_output_details[0]['index'])
-        halal_prob = float(output[0][0])
-
-        print(f"Halal probability: {halal_prob}", flush=True)
-
-        response = {
-            "halal_probability": halal_prob,
-            "halal_status": "Halal" if halal_prob > 0.5 else "Not Halal"
-        }
+        response = result_cache.get_or_compute(key, compute)
+        return _with_etag(jsonify(response), key)
+    except Exception as e:
+        logger.exception("Exception in /halal_check")
+        return jsonify({"error": f"Internal server error: {str(e)}"}), 500
+    finally:
+        STAGE_SECONDS.observe(time.perf_counter() - start, endpoint='halal_check', stage='total')
+
+
+def _halal_response(halal_prob):
+    """
+    Build the /halal_check response payload from the halal probability.
+    """
+    return {
+        "halal_probability": halal_prob,
+        "halal_status": "Halal" if halal_prob > 0.5 else "Not Halal"
+    }
+
+
+# Endpoint for allergen and halal verdicts from one tokenization
+@app.route('/analyze', methods=['POST'])
+def analyze():
+    start = time.perf_counter()
+    try:
+        data = request.get_json() or {}
+        text = data.get('text', '')
+        e_code = data.get('e_code', None)
+        logger.debug("/analyze text: %r, e_code: %r", text, e_code)
+
+        if 'analyze' in batchers:
+            # Coalesced with other concurrent requests into one model run
+            prediction, halal_prob = batchers['analyze'].submit((text, e_code))
+        else:
+            prediction, halal_prob = run_analysis_batch([(text, e_code)])[0]
+
+        with STAGE_SECONDS.time(endpoint='analyze', stage='postprocess'):
+            response = {
+                'allergen': _allergen_response(prediction),
+                'halal': _halal_response(halal_prob),
+            }
         return jsonify(response)
+    except Exception as e:
+        logger.exception("Exception in /analyze")
+        return jsonify({'error': str(e)}), 500
+    finally:
+        STAGE_SECONDS.observe(time.perf_counter() - start, endpoint='analyze', stage='total')
+
+
+# Rows per model run and maximum texts per request for /predict/batch
+BATCH_CHUNK_SIZE = int(os.environ.get('BATCH_CHUNK_SIZE', 32))
+BATCH_MAX_ITEMS = int(os.environ.get('BATCH_MAX_ITEMS', 5000))
+
+# Endpoint for scoring many ingredient texts in one call
+@app.route('/predict/batch', methods=['POST'])
+def predict_batch():
+    data = request.get_json() or {}
+    texts = data.get('texts')
+    e_codes = data.get('e_codes')
+
+    # Validate input
+    if not isinstance(texts, list) or not texts or not all(isinstance(t, str) for t in texts):
+        return jsonify({'error': "'texts' must be a non-empty list of strings"}), 400
+    if len(texts) > BATCH_MAX_ITEMS:
+        return jsonify({'error': f"At most {BATCH_MAX_ITEMS} texts per request"}), 413
+    if e_codes is not None and (not isinstance(e_codes, list) or len(e_codes) != len(texts)):
+        return jsonify({'error': "'e_codes' must be a list with one entry per text"}), 400
+
+    user_id = data.get('user_id')
+    if user_id is not None and not isinstance(user_id, int):
+        return jsonify({'error': "'user_id' must be an integer"}), 400
 
+    # The halal model is run too when e-codes are given or it is asked for
+    include_halal = e_codes is not None or bool(data.get('halal', False))
+
+    start = time.perf_counter()
+    try:
+        profile = _user_profile(user_id)
+        if profile is None:
+            return jsonify({'error': 'Unknown user'}), 404
+
+        halal_probs = None
+        if include_halal:
+            # Both models from one tokenization
+            items = list(zip(texts, e_codes or [None] * len(texts)))
+            pairs = run_analysis_batch(items, chunk_size=BATCH_CHUNK_SIZE, endpoint='predict_batch')
+            scores = [row for row, _ in pairs]
+            halal_probs = [prob for _, prob in pairs]
+        else:
+            scores = run_allergen_batch(texts, chunk_size=BATCH_CHUNK_SIZE, endpoint='predict_batch')
+
+        with STAGE_SECONDS.time(endpoint='predict_batch', stage='postprocess'):
+            results = [_allergen_response(row) for row in scores]
+            if halal_probs is not None:
+                for result, halal_prob in zip(results, halal_probs):
+                    result['halal'] = _halal_response(halal_prob)
+            if user_id is not None:
+                for result, personalized in zip(results, _personalized_responses(LABEL_INDEX.predicted_bits(scores), profile)):
+                    result['personalized'] = personalized
+        return jsonify({'results': results})
     except Exception as e:
-        print(f"\n=== FATAL ERROR ===", flush=True)
-        print(f"Error: {str(e)}", flush=True)
-        print(f"Error type: {type(e)}", flush=True)
-        import traceback
-        print(f"Full traceback: {traceback.format_exc()}", flush=True)
-        return jsonify({"error": f"Internal server error: {str(e)}"}), 500
+        logger.exception("Exception in /predict/batch")
+        return jsonify({'error': str(e)}), 500
+    finally:
+        STAGE_SECONDS.observe(time.perf_counter() - start, endpoint='predict_batch', stage='total')
+
+# Startup: 'eager' loads the tokenizer and models and warms them up before
+# the app is imported; 'lazy' does the same in a background thread so the
+# server starts accepting connections at once (/ready reports when it is done)
+STARTUP_MODE = os.environ.get('STARTUP_MODE', 'eager').lower()
+STARTUP_WARMUP = os.environ.get('STARTUP_WARMUP', '1').lower() in ('1', 'true', 'yes')
+startup = StartupState()
+startup.mark('import')
+
+
+def warm_up():
+    """
+    Load the shared tokenizer, the e-code index and every model, then run one
+    inference per model so the first real request does not pay for lazy
+    initialization.
+    """
+    try:
+        get_tokenizer()
+        get_e_code_index()
+        startup.mark('tokenizer')
+        model_registry.load_all()
+        loaded = model_registry.stats()
+        if SEQUENCE_BUCKET_LENGTHS:
+            for name in loaded:
+                model_registry.supported_buckets(name, SEQUENCE_BUCKET_LENGTHS)
+        startup.mark('models')
+        if STARTUP_WARMUP:
+            if 'allergen' in loaded:
+                run_allergen_batch(['warm up'], endpoint='warmup')
+            if 'halal' in loaded:
+                run_halal_batch([('warm up', None)], endpoint='warmup')
+            startup.mark('warmup')
+        startup.set_ready()
+        logger.info("Ready in %.2fs", startup.time_to_ready)
+    except Exception as e:
+        logger.exception("Warm-up failed")
+        startup.set_failed(e)
+
+
+if STARTUP_MODE == 'lazy':
+    threading.Thread(target=warm_up, name='warm-up', daemon=True).start()
+else:
+    warm_up()
+
+
+# Readiness endpoint: 200 once warm-up has finished, 503 before (or if it failed)
+@app.route('/ready', methods=['GET'])
+def ready():
+    return jsonify(startup.as_dict()), 200 if startup.ready else 503
 
 # Tooba Model End --------------------------------------------------------------------------------------------------------------------------
 
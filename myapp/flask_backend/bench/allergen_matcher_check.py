@@ -0,0 +1,78 @@
+"""
+Check the allergen matcher that filters /recipes/recommend against
+ingredient names it must (and must not) flag, using the ALLERGEN_SYNONYMS
+table from app.py. Missing an allergen here means recommending a recipe to
+a user who is allergic to it.
+
+Usage (from myapp/flask_backend):
+    python bench/allergen_matcher_check.py
+
+Exits with status 1 if any case fails.
+"""
+import os
+import sys
+import ast
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from util.allergen_matcher import AllergenMatcher  # noqa: E402
+
+# ingredient name -> allergens it must be flagged for
+MUST_MATCH = {
+    'breadcrumbs': {'wheat'},
+    'breadsticks': {'wheat'},
+    'cornbread': {'wheat'},
+    'crabmeat': {'shellfish'},
+    'cheesecake': {'milk'},
+    'buttermilk': {'milk'},
+    'eggnog': {'egg'},
+    'eggs': {'egg'},
+    'soymilk': {'soy', 'milk'},
+    'almondmilk': {'tree nut', 'milk'},
+    'peanutbutter': {'peanut', 'milk'},
+    'peaches': set(),
+    'smoked salmon fillets': {'fish'},
+}
+
+# ingredient name -> allergens it must not be flagged for
+MUST_NOT_MATCH = {
+    'eggplant': {'egg'},
+    'eggplants': {'egg'},
+    'butternut squash': {'milk'},
+    'hamburger buns': {'pork'},
+    'mushroom': {'milk', 'egg', 'wheat'},
+}
+
+
+def load_synonyms(path=os.path.join(BACKEND_DIR, 'app.py')):
+    # Read the table from app.py without importing the app (and TensorFlow)
+    with open(path, encoding='utf-8') as f:
+        tree = ast.parse(f.read())
+    for node in tree.body:
+        if isinstance(node, ast.Assign) and any(
+                isinstance(target, ast.Name) and target.id == 'ALLERGEN_SYNONYMS' for target in node.targets):
+            return ast.literal_eval(node.value)
+    raise LookupError(f"ALLERGEN_SYNONYMS not found in {path}")
+
+
+def main():
+    matcher = AllergenMatcher(load_synonyms())
+    failures = 0
+    for name, expected in MUST_MATCH.items():
+        found = matcher.canonical_allergens(name)
+        if not expected <= found:
+            failures += 1
+            print(f"MISSED   {name!r}: expected {sorted(expected)}, found {sorted(found)}")
+    for name, forbidden in MUST_NOT_MATCH.items():
+        found = matcher.canonical_allergens(name)
+        if found & forbidden:
+            failures += 1
+            print(f"FLAGGED  {name!r}: {sorted(found & forbidden)}")
+    total = len(MUST_MATCH) + len(MUST_NOT_MATCH)
+    print(f"{total - failures}/{total} cases passed")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,183 @@
+"""
+Check that /predict latency holds up while logins hammer the backend.
+
+For each mode the backend is started on the synthetic models (as in
+bench/loadtest.py), test users are signed up, and /predict is measured
+twice: alone, and while --login-concurrency threads log in back to back.
+Modes: 'pool' hashes in the password process pool (the default setup),
+'inline' sets PASSWORD_HASH_WORKERS=0 and hashes on the request threads.
+
+Usage (from myapp/flask_backend):
+    python bench/auth_load.py --modes pool inline --concurrency 8 --login-concurrency 16
+    python bench/auth_load.py --server gunicorn --rounds 12 --output auth.json
+
+Prints one JSON document; with the pool the loaded p99 should stay close
+to the baseline, while inline hashing shows the spike.
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import threading
+from collections import Counter
+
+import requests
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(BACKEND_DIR, 'bench'))
+
+from loadtest import MODELS_DIR, load_corpus, make_payloads, start_backend, run_scenario, _ensure_models  # noqa: E402
+from spoonacular_stub import SpoonacularStub  # noqa: E402
+
+MODES = {
+    'pool': {},
+    'inline': {'PASSWORD_HASH_WORKERS': '0'},
+}
+
+
+def signup_users(url, count):
+    users = []
+    for number in range(count):
+        user = {'email': f'bench{number}@example.invalid', 'password': f'bench-password-{number}',
+                'username': f'bench{number}'}
+        requests.post(f'{url}/signup', json=user, timeout=60).raise_for_status()
+        users.append(user)
+    return users
+
+
+class LoginStorm:
+    """
+    Threads that log in back to back until stopped, counting responses.
+    """
+
+    def __init__(self, url, users, concurrency):
+        self.url = url
+        self.users = users
+        self.concurrency = concurrency
+        self.statuses = Counter()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._threads = []
+
+    def _worker(self, worker_id):
+        session = requests.Session()
+        number = worker_id
+        while not self._stop.is_set():
+            user = self.users[number % len(self.users)]
+            number += self.concurrency
+            try:
+                status = session.post(f'{self.url}/login', json={
+                    'email': user['email'], 'password': user['password'],
+                }, timeout=60).status_code
+            except requests.RequestException:
+                status = 'error'
+            with self._lock:
+                self.statuses[status] += 1
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        for worker_id in range(self.concurrency):
+            thread = threading.Thread(target=self._worker, args=(worker_id,), daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        for thread in self._threads:
+            thread.join()
+        self.elapsed = time.perf_counter() - self.started
+
+
+def run_mode(args, mode, stub, payloads):
+    os.environ.update(MODES[mode], BCRYPT_LOG_ROUNDS=str(args.rounds))
+    workdir = tempfile.mkdtemp(prefix='nutriguard-auth-')
+    process = None
+    try:
+        process, url = start_backend(args, stub.url, workdir)
+        users = signup_users(url, args.users)
+        path, payload_fn = payloads['predict']
+
+        baseline = run_scenario(url, path, payload_fn, args.concurrency, args.requests, args.warmup, args.seed)
+        with LoginStorm(url, users, args.login_concurrency) as storm:
+            loaded = run_scenario(url, path, payload_fn, args.concurrency, args.requests, args.warmup, args.seed)
+        logins = sum(storm.statuses.values())
+        return {
+            'mode': mode,
+            'baseline': baseline,
+            'under_login_load': loaded,
+            'p99_ratio': loaded['p99_ms'] / baseline['p99_ms'] if baseline['p99_ms'] else None,
+            'logins': {
+                'requests': logins,
+                'per_second': logins / storm.elapsed if storm.elapsed else 0.0,
+                'statuses': {str(status): count for status, count in storm.statuses.items()},
+            },
+        }
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait(timeout=30)
+        for name in MODES[mode]:
+            os.environ.pop(name, None)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--modes', nargs='+', choices=list(MODES), default=['pool', 'inline'])
+    parser.add_argument('--concurrency', type=int, default=8, help='concurrent /predict clients')
+    parser.add_argument('--login-concurrency', type=int, default=16, help='concurrent /login clients')
+    parser.add_argument('--requests', type=int, default=500, help='measured /predict requests per phase')
+    parser.add_argument('--warmup', type=int, default=20)
+    parser.add_argument('--users', type=int, default=20)
+    parser.add_argument('--rounds', type=int, default=12, help='BCRYPT_LOG_ROUNDS for the backend')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--server', choices=('flask', 'gunicorn'), default='flask')
+    parser.add_argument('--models', default=MODELS_DIR, help='directory with the synthetic models')
+    parser.add_argument('--real-models', action='store_true', help="use the backend's own models and tokenizer")
+    parser.add_argument('--startup-timeout', type=float, default=120.0)
+    parser.add_argument('--output', help='also write the JSON report to this file')
+    args = parser.parse_args()
+    # start_backend options this benchmark does not vary; /predict must
+    # reach the model, so its response cache is off
+    args.no_upstream_cache = False
+    args.no_result_cache = True
+
+    if not args.real_models:
+        _ensure_models(args.models)
+    payloads = make_payloads(load_corpus(), [], batch_size=1)
+
+    stub = SpoonacularStub().start()
+    try:
+        results = []
+        for mode in args.modes:
+            result = run_mode(args, mode, stub, payloads)
+            results.append(result)
+            print(f"{mode:>7}: predict p99 {result['baseline']['p99_ms']:7.1f} ms alone, "
+                  f"{result['under_login_load']['p99_ms']:7.1f} ms under "
+                  f"{result['logins']['per_second']:.1f} logins/s", file=sys.stderr)
+    finally:
+        stub.stop()
+
+    report = {
+        'meta': {
+            'server': args.server,
+            'concurrency': args.concurrency,
+            'login_concurrency': args.login_concurrency,
+            'rounds': args.rounds,
+            'requests': args.requests,
+            'cpus': os.cpu_count(),
+        },
+        'results': results,
+    }
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,286 @@
+"""
+Load test for the inference endpoints, reproducible and offline.
+
+By default this generates the synthetic models and vocabulary
+(bench/make_models.py) if they are missing, starts the Spoonacular stub,
+starts the backend on them with a throwaway SQLite database, drives each
+scenario with the configured concurrency and prints one JSON document with
+throughput and p50/p95/p99 latency per scenario.
+
+Usage (from myapp/flask_backend):
+    python bench/loadtest.py --concurrency 1 8 32 --requests 500 --output results.json
+    python bench/loadtest.py --server gunicorn --scenarios predict predict_batch
+    python bench/loadtest.py --url http://127.0.0.1:5050        # an already running backend
+
+Scenarios: predict, halal_check, analyze, predict_batch, recipes_recommend and
+check_allergens. /check_allergens belongs to the separate analysis API in
+py/, so that scenario only runs when --check-allergens-url is given.
+"""
+import os
+import sys
+import csv
+import json
+import time
+import random
+import shutil
+import socket
+import argparse
+import platform
+import tempfile
+import subprocess
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import requests
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+REPO_DIR = os.path.dirname(os.path.dirname(BACKEND_DIR))
+sys.path.insert(0, os.path.join(BACKEND_DIR, 'bench'))
+
+from spoonacular_stub import SpoonacularStub  # noqa: E402
+
+MODELS_DIR = os.path.join(BACKEND_DIR, 'bench', 'models')
+CORPUS_PATH = os.path.join(REPO_DIR, 'py', 'allergen.csv')
+E_CODES_PATH = os.path.join(BACKEND_DIR, 'util', 'e_code_mapping.json')
+ALLERGENS = ['milk', 'egg', 'soy', 'peanut', 'tree nut', 'wheat', 'fish', 'shellfish', 'sesame', 'mustard']
+SCENARIOS = ('predict', 'halal_check', 'analyze', 'predict_batch', 'recipes_recommend', 'check_allergens')
+
+
+def load_corpus(path=CORPUS_PATH):
+    """
+    Ingredient lists as the app sends them: the ingredient columns of
+    allergen.csv joined with commas, without 'None' placeholders.
+    """
+    texts = []
+    with open(path, newline='', encoding='utf-8') as f:
+        for row in csv.DictReader(f):
+            parts = [row[key] for key in ('Main Ingredient', 'Sweetener', 'Fat/Oil', 'Seasoning')]
+            texts.append(', '.join(part for part in parts if part and part != 'None'))
+    return texts
+
+
+def make_payloads(corpus, e_codes, batch_size):
+    # scenario -> (path, function(rng) returning a JSON body)
+    return {
+        'predict': ('/predict', lambda rng: {'text': rng.choice(corpus)}),
+        'halal_check': ('/halal_check', lambda rng: {
+            'text': rng.choice(corpus),
+            'e_code': rng.choice(e_codes) if rng.random() < 0.5 else None,
+        }),
+        'analyze': ('/analyze', lambda rng: {
+            'text': rng.choice(corpus),
+            'e_code': rng.choice(e_codes) if rng.random() < 0.5 else None,
+        }),
+        'predict_batch': ('/predict/batch', lambda rng: {
+            'texts': [rng.choice(corpus) for _ in range(batch_size)],
+        }),
+        'recipes_recommend': ('/recipes/recommend', lambda rng: {
+            'allergens': rng.sample(ALLERGENS, rng.randint(1, 3)),
+        }),
+        'check_allergens': ('/check_allergens/', lambda rng: {'ingredients': rng.choice(corpus)}),
+    }
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def _ensure_models(models_dir):
+    needed = ('model.tflite', 'halal_model.tflite', 'vocab.txt')
+    if not all(os.path.exists(os.path.join(models_dir, name)) for name in needed):
+        subprocess.run([sys.executable, os.path.join(BACKEND_DIR, 'bench', 'make_models.py'),
+                        '--out', models_dir], check=True)
+
+
+def start_backend(args, stub_url, workdir):
+    """
+    Start the backend on the synthetic models and return (process, base url).
+    """
+    port = _free_port()
+    env = dict(
+        os.environ,
+        ALLERGEN_MODEL_PATH=os.path.join(args.models, 'model.tflite'),
+        HALAL_MODEL_PATH=os.path.join(args.models, 'halal_model.tflite'),
+        TOKENIZER_VOCAB_PATH=os.path.join(args.models, 'vocab.txt'),
+        SPOONACULAR_BASE_URL=stub_url,
+        SPOONACULAR_API_KEY='bench',
+        DB_BACKEND='sqlite',
+        DB_SQLITE_PATH=os.path.join(workdir, 'bench.db'),
+        LOG_LEVEL='WARNING',
+    )
+    if args.real_models:
+        for name in ('ALLERGEN_MODEL_PATH', 'HALAL_MODEL_PATH', 'TOKENIZER_VOCAB_PATH'):
+            env.pop(name)
+    if args.no_upstream_cache:
+        env.update(SPOONACULAR_SEARCH_TTL='0', SPOONACULAR_DETAIL_TTL='0')
+    if args.no_result_cache:
+        env.update(RESULT_CACHE='0')
+
+    if args.server == 'gunicorn':
+        command = ['gunicorn', '-c', 'gunicorn.conf.py', '--bind', f'127.0.0.1:{port}', 'wsgi:application']
+    else:
+        command = [sys.executable, '-c',
+                   f"from app import app; app.run(host='127.0.0.1', port={port}, threaded=True)"]
+    process = subprocess.Popen(command, cwd=BACKEND_DIR, env=env)
+    url = f'http://127.0.0.1:{port}'
+
+    deadline = time.time() + args.startup_timeout
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Backend exited with status {process.returncode}")
+        try:
+            if requests.get(f'{url}/ready', timeout=1).status_code == 200:
+                return process, url
+        except requests.RequestException:
+            pass
+        time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError(f"Backend not ready after {args.startup_timeout}s")
+
+
+def run_scenario(url, path, payload_fn, concurrency, total, warmup, seed):
+    """
+    Send `total` requests from `concurrency` threads (each with its own
+    keep-alive session) and summarize latencies.
+    """
+    counter = iter(range(total + warmup))
+    lock = threading.Lock()
+    timings, errors = [], 0
+
+    def worker(worker_id):
+        nonlocal errors
+        rng = random.Random(seed * 1000 + worker_id)
+        session = requests.Session()
+        while True:
+            with lock:
+                number = next(counter, None)
+            if number is None:
+                return
+            body = payload_fn(rng)
+            start = time.perf_counter()
+            try:
+                ok = session.post(url + path, json=body, timeout=60).ok
+            except requests.RequestException:
+                ok = False
+            end = time.perf_counter()
+            if number < warmup:
+                continue
+            with lock:
+                timings.append((start, end))
+                errors += 0 if ok else 1
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(worker, range(concurrency)))
+
+    # Throughput over the measured requests only, not the warm-up
+    wall = max(end for _, end in timings) - min(start for start, _ in timings) if timings else 0.0
+    samples = np.array([end - start for start, end in timings]) * 1000
+    return {
+        'concurrency': concurrency,
+        'requests': len(timings),
+        'errors': errors,
+        'throughput_rps': len(timings) / wall if wall else 0.0,
+        'mean_ms': float(samples.mean()) if len(samples) else None,
+        'p50_ms': float(np.percentile(samples, 50)) if len(samples) else None,
+        'p95_ms': float(np.percentile(samples, 95)) if len(samples) else None,
+        'p99_ms': float(np.percentile(samples, 99)) if len(samples) else None,
+        'max_ms': float(samples.max()) if len(samples) else None,
+    }
+
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=BACKEND_DIR, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scenarios', nargs='+', choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 8])
+    parser.add_argument('--requests', type=int, default=200, help='measured requests per scenario and concurrency')
+    parser.add_argument('--warmup', type=int, default=20)
+    parser.add_argument('--batch-size', type=int, default=16, help='texts per /predict/batch request')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--url', help='benchmark an already running backend instead of starting one')
+    parser.add_argument('--server', choices=('flask', 'gunicorn'), default='flask')
+    parser.add_argument('--models', default=MODELS_DIR, help='directory with the synthetic models')
+    parser.add_argument('--real-models', action='store_true', help="use the backend's own models and tokenizer")
+    parser.add_argument('--stub-delay-ms', type=float, default=50.0, help='Spoonacular stub latency')
+    parser.add_argument('--no-upstream-cache', action='store_true', help='disable the Spoonacular response cache')
+    parser.add_argument('--no-result-cache', action='store_true',
+                        help='disable the /predict and /halal_check response cache')
+    parser.add_argument('--check-allergens-url', help='base URL of the py/ analysis API for check_allergens')
+    parser.add_argument('--startup-timeout', type=float, default=120.0)
+    parser.add_argument('--output', help='also write the JSON report to this file')
+    args = parser.parse_args()
+
+    corpus = load_corpus()
+    with open(E_CODES_PATH) as f:
+        e_codes = sorted(json.load(f))
+    payloads = make_payloads(corpus, e_codes, args.batch_size)
+
+    stub = process = None
+    workdir = tempfile.mkdtemp(prefix='nutriguard-bench-')
+    try:
+        url = args.url
+        if url is None:
+            if not args.real_models:
+                _ensure_models(args.models)
+            stub = SpoonacularStub(delay_ms=args.stub_delay_ms).start()
+            process, url = start_backend(args, stub.url, workdir)
+
+        results = []
+        for scenario in args.scenarios:
+            base = url
+            if scenario == 'check_allergens':
+                if not args.check_allergens_url:
+                    print("skipping check_allergens (no --check-allergens-url)", file=sys.stderr)
+                    continue
+                base = args.check_allergens_url.rstrip('/')
+            path, payload_fn = payloads[scenario]
+            for concurrency in args.concurrency:
+                result = run_scenario(base, path, payload_fn, concurrency, args.requests, args.warmup, args.seed)
+                result['scenario'] = scenario
+                results.append(result)
+                print(f"{scenario:>18} c={concurrency:<3} {result['throughput_rps']:8.1f} req/s  "
+                      f"p50 {result['p50_ms']:7.1f}  p95 {result['p95_ms']:7.1f}  "
+                      f"p99 {result['p99_ms']:7.1f} ms  errors {result['errors']}", file=sys.stderr)
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait(timeout=30)
+        if stub is not None:
+            stub.stop()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        'meta': {
+            'commit': _git_commit(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpus': os.cpu_count(),
+            'server': 'external' if args.url else args.server,
+            'models': 'real' if args.real_models or args.url else 'synthetic',
+            'requests': args.requests,
+            'warmup': args.warmup,
+            'batch_size': args.batch_size,
+            'stub_delay_ms': args.stub_delay_ms,
+            'result_cache': not args.no_result_cache,
+            'seed': args.seed,
+        },
+        'results': results,
+    }
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
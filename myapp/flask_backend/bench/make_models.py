@@ -0,0 +1,136 @@
+"""
+Generate tiny synthetic TFLite models (and a small WordPiece vocabulary) with
+the same input signatures as the real ones, so the backend and benchmarks
+can run offline without the trained models.
+
+    allergen: input_word_ids, input_mask, input_type_ids -> (batch, n_labels)
+    halal:    input_ids, attention_mask, e_code_input    -> (batch, 1)
+
+Both accept any batch size and sequence length (resize_tensor_input), and
+both average token embeddings under the mask, so like the real models their
+cost grows with batch size and sequence length and their outputs ignore
+padding.
+
+Usage (from myapp/flask_backend):
+    python bench/make_models.py --out bench/models
+"""
+import os
+import sys
+import csv
+import re
+import argparse
+
+import numpy as np
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+REPO_DIR = os.path.dirname(os.path.dirname(BACKEND_DIR))
+DEFAULT_OUT = os.path.join(BACKEND_DIR, 'bench', 'models')
+
+VOCAB_SIZE = 30522
+HIDDEN = 32
+MAX_E_CODE = 500
+SPECIAL_TOKENS = ['[PAD]', '[UNK]', '[CLS]', '[SEP]', '[MASK]']
+
+ALLERGEN_INPUTS = ('input_word_ids', 'input_mask', 'input_type_ids')
+HALAL_INPUTS = ('input_ids', 'attention_mask', 'e_code_input')
+
+
+def _convert(function, specs, path, expected_names):
+    import tensorflow as tf
+
+    concrete = tf.function(function, input_signature=specs).get_concrete_function()
+    converter = tf.lite.TFLiteConverter.from_concrete_functions([concrete])
+    with open(path, 'wb') as f:
+        f.write(converter.convert())
+
+    # The backend feeds the allergen model by position and the halal model by
+    # name, so both must come out of the converter exactly as expected
+    interpreter = tf.lite.Interpreter(model_path=path)
+    names = tuple(detail['name'] for detail in interpreter.get_input_details())
+    if names != expected_names:
+        raise RuntimeError(f"{path}: converter produced inputs {names}, expected {expected_names}")
+    return path
+
+
+def _masked_mean(tf, embeddings, mask):
+    mask = tf.cast(mask, tf.float32)[:, :, None]
+    return tf.reduce_sum(embeddings * mask, axis=1) / tf.maximum(tf.reduce_sum(mask, axis=1), 1.0)
+
+
+def build_allergen_model(path, n_labels, seed=0):
+    import tensorflow as tf
+
+    rng = np.random.default_rng(seed)
+    token_table = tf.constant(rng.normal(size=(VOCAB_SIZE, HIDDEN)).astype(np.float32))
+    type_table = tf.constant(rng.normal(size=(2, HIDDEN)).astype(np.float32))
+    hidden = tf.constant(rng.normal(size=(HIDDEN, HIDDEN)).astype(np.float32) / np.sqrt(HIDDEN))
+    head = tf.constant(rng.normal(size=(HIDDEN, n_labels)).astype(np.float32) / np.sqrt(HIDDEN))
+
+    def model(input_word_ids, input_mask, input_type_ids):
+        embeddings = tf.gather(token_table, input_word_ids) + tf.gather(type_table, input_type_ids)
+        # One dense layer per position so cost scales with sequence length
+        embeddings = tf.nn.gelu(tf.einsum('bsh,hk->bsk', embeddings, hidden))
+        return tf.sigmoid(tf.matmul(_masked_mean(tf, embeddings, input_mask), head))
+
+    specs = [tf.TensorSpec([None, None], tf.int32, name=name) for name in ALLERGEN_INPUTS]
+    return _convert(model, specs, path, ALLERGEN_INPUTS)
+
+
+def build_halal_model(path, seed=1):
+    import tensorflow as tf
+
+    rng = np.random.default_rng(seed)
+    token_table = tf.constant(rng.normal(size=(VOCAB_SIZE, HIDDEN)).astype(np.float32))
+    e_code_table = tf.constant(rng.normal(size=(MAX_E_CODE + 1, HIDDEN)).astype(np.float32))
+    hidden = tf.constant(rng.normal(size=(HIDDEN, HIDDEN)).astype(np.float32) / np.sqrt(HIDDEN))
+    head = tf.constant(rng.normal(size=(HIDDEN, 1)).astype(np.float32) / np.sqrt(HIDDEN))
+
+    def model(input_ids, attention_mask, e_code_input):
+        embeddings = tf.nn.gelu(tf.einsum('bsh,hk->bsk', tf.gather(token_table, input_ids), hidden))
+        pooled = _masked_mean(tf, embeddings, attention_mask) + tf.gather(e_code_table, e_code_input[:, 0])
+        return tf.sigmoid(tf.matmul(pooled, head))
+
+    specs = [
+        tf.TensorSpec([None, None], tf.int32, name='input_ids'),
+        tf.TensorSpec([None, None], tf.int32, name='attention_mask'),
+        tf.TensorSpec([None, 1], tf.int32, name='e_code_input'),
+    ]
+    return _convert(model, specs, path, HALAL_INPUTS)
+
+
+def build_vocab(path, corpus_path=os.path.join(REPO_DIR, 'py', 'allergen.csv')):
+    """
+    Write a small uncased WordPiece vocabulary: special tokens, single
+    characters (word-initial and '##' continuation) and the words of the
+    ingredient corpus. Every input can be tokenized with it.
+    """
+    words = set()
+    if os.path.exists(corpus_path):
+        with open(corpus_path, newline='', encoding='utf-8') as f:
+            for row in csv.reader(f):
+                words.update(re.findall(r'[a-z0-9]+', ' '.join(row).lower()))
+    chars = [chr(cp) for cp in range(33, 127) if not chr(cp).isupper()]
+    tokens = SPECIAL_TOKENS + chars + ['##' + char for char in chars if char.isalnum()]
+    tokens += sorted(words - set(tokens))
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('\n'.join(tokens) + '\n')
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--out', default=DEFAULT_OUT)
+    parser.add_argument('--labels', default=os.path.join(BACKEND_DIR, 'model', 'exolabels.txt'),
+                        help='label file; the allergen model gets one output per line')
+    args = parser.parse_args()
+
+    os.makedirs(args.out, exist_ok=True)
+    with open(args.labels) as f:
+        n_labels = sum(1 for line in f if line.strip())
+    print(build_allergen_model(os.path.join(args.out, 'model.tflite'), n_labels))
+    print(build_halal_model(os.path.join(args.out, 'halal_model.tflite')))
+    print(build_vocab(os.path.join(args.out, 'vocab.txt')))
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,78 @@
+"""
+Check that profile allergens map onto the allergen model's labels the way
+personalized /predict needs: every way of naming one allergen (the label
+name itself, its canonical allergen, a synonym) must cover the same labels.
+Under-covering here means a verdict that ignores an allergen the user asked
+about.
+
+Usage (from myapp/flask_backend):
+    python bench/profile_mask_check.py
+
+Exits with status 1 if any case fails.
+"""
+import os
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+sys.path.insert(0, os.path.join(BACKEND_DIR, 'bench'))
+
+from allergen_matcher_check import load_synonyms  # noqa: E402
+from util.personalization import LabelAllergenIndex  # noqa: E402
+
+LABELS_PATH = os.path.join(BACKEND_DIR, 'model', 'exolabels.txt')
+
+# Profile entries that must cover exactly the same labels
+SAME_MASK = [
+    ('Dairy', 'milk', 'ghee'),
+    ('nuts', 'tree nut', 'almonds', 'pine nuts'),
+    ('anchovies', 'fish'),
+    ('Eggs', 'egg'),
+    ('peanuts', 'peanut'),
+]
+
+# profile entry -> labels it must cover
+MUST_COVER = {
+    'Dairy': {'dairy', 'ghee', 'milk'},
+    'nuts': {'almonds', 'nuts', 'pine nuts'},
+    'fish': {'fish', 'anchovies'},
+}
+
+# profile entry -> labels it must not cover
+MUST_NOT_COVER = {
+    'fish': {'shellfish'},
+    'milk': {'coconut'},
+}
+
+
+def main():
+    with open(LABELS_PATH, 'r') as f:
+        labels = [line.strip() for line in f.readlines()]
+    index = LabelAllergenIndex(labels, load_synonyms())
+
+    def covered(allergen):
+        return set(index.labels_in(index.allergen_mask(allergen)))
+
+    failures = 0
+    for names in SAME_MASK:
+        masks = {name: covered(name) for name in names}
+        if len({frozenset(mask) for mask in masks.values()}) != 1:
+            failures += 1
+            print("DIFFERENT " + ', '.join(f"{name!r}: {sorted(mask)}" for name, mask in masks.items()))
+    for name, expected in MUST_COVER.items():
+        found = covered(name)
+        if not expected <= found:
+            failures += 1
+            print(f"MISSED    {name!r}: expected {sorted(expected)}, found {sorted(found)}")
+    for name, forbidden in MUST_NOT_COVER.items():
+        found = covered(name)
+        if found & forbidden:
+            failures += 1
+            print(f"COVERED   {name!r}: {sorted(found & forbidden)}")
+    total = len(SAME_MASK) + len(MUST_COVER) + len(MUST_NOT_COVER)
+    print(f"{total - failures}/{total} cases passed")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
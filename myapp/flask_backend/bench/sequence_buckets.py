@@ -0,0 +1,125 @@
+"""
+Compare length-bucketed inference (SEQUENCE_BUCKETS) with the fixed
+full-length path: per-text and batched latency, how texts spread over the
+buckets, and output drift (largest absolute score difference and the
+number of 0.5-threshold decisions that change).
+
+Usage (from myapp/flask_backend):
+    python bench/sequence_buckets.py --buckets 32 64 128 --limit 400
+
+Texts are the ingredient lists of py/cleaned_allergen_dataset.csv. Model
+paths come from ALLERGEN_MODEL_PATH / HALAL_MODEL_PATH as in app.py.
+"""
+import os
+import sys
+import csv
+import time
+import argparse
+
+import numpy as np
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+REPO_DIR = os.path.dirname(os.path.dirname(BACKEND_DIR))
+sys.path.insert(0, BACKEND_DIR)
+
+from util.model_registry import ModelRegistry  # noqa: E402
+from util.preprocessing import preprocess, preprocess_halal_batch  # noqa: E402
+from util.sequence_buckets import parse_buckets, split_by_bucket, trim_inputs  # noqa: E402
+
+MAX_LENGTH = 128
+MODELS = {
+    'allergen': os.environ.get('ALLERGEN_MODEL_PATH', os.path.join(BACKEND_DIR, 'model', 'model.tflite')),
+    'halal': os.environ.get('HALAL_MODEL_PATH', os.path.join(BACKEND_DIR, 'halal_model.tflite')),
+}
+
+
+def load_texts(limit):
+    path = os.path.join(REPO_DIR, 'py', 'cleaned_allergen_dataset.csv')
+    with open(path, newline='', encoding='utf-8') as f:
+        texts = [row['Combined_Ingredients'] for row in csv.DictReader(f)]
+    return texts[:limit] if limit else texts
+
+
+def model_inputs(name, texts):
+    if name == 'allergen':
+        ids, mask, type_ids = preprocess(texts, max_length=MAX_LENGTH)
+        return [ids, mask, type_ids], mask
+    ids, mask, e_codes = preprocess_halal_batch(texts, max_length=MAX_LENGTH)
+    return {'input_ids': ids, 'attention_mask': mask, 'e_code_input': e_codes}, mask
+
+
+def run(registry, name, inputs, mask, buckets):
+    if not buckets:
+        with registry.checkout(name) as pooled:
+            return pooled.run(inputs)
+    output = None
+    for length, rows in split_by_bucket(mask, buckets):
+        with registry.checkout(name, sequence_length=length) as pooled:
+            part = pooled.run(trim_inputs(inputs, rows, length, MAX_LENGTH))
+        if output is None:
+            output = np.empty((mask.shape[0],) + part.shape[1:], dtype=part.dtype)
+        output[rows] = part
+    return output
+
+
+def row(inputs, index):
+    if isinstance(inputs, dict):
+        return {key: value[index:index + 1] for key, value in inputs.items()}
+    return [value[index:index + 1] for value in inputs]
+
+
+def percentile_ms(samples, q):
+    return float(np.percentile(samples, q) * 1000) if samples else float('nan')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--buckets', type=int, nargs='+', default=[32, 64, 128])
+    parser.add_argument('--limit', type=int, default=400, help='number of texts (0 for all)')
+    parser.add_argument('--batch-size', type=int, default=32)
+    args = parser.parse_args()
+
+    texts = load_texts(args.limit)
+    registry = ModelRegistry(pool_size=1)
+    for name, path in MODELS.items():
+        registry.register(name, path)
+    registry.load_all()
+
+    for name in registry.stats():
+        buckets = registry.supported_buckets(name, parse_buckets(args.buckets, MAX_LENGTH))
+        inputs, mask = model_inputs(name, texts)
+        spread = ', '.join(f"{length}: {len(rows)}" for length, rows in split_by_bucket(mask, buckets))
+        print(f"\n{name}: {len(texts)} texts, buckets {buckets} ({spread})")
+
+        outputs = {}
+        for label, mode_buckets in (('fixed', ()), ('bucketed', buckets)):
+            # Warm both paths once so allocation is not timed
+            run(registry, name, row(inputs, 0), mask[:1], mode_buckets)
+
+            single = []
+            for index in range(len(texts)):
+                start = time.perf_counter()
+                run(registry, name, row(inputs, index), mask[index:index + 1], mode_buckets)
+                single.append(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            chunks = []
+            for offset in range(0, len(texts), args.batch_size):
+                part = slice(offset, offset + args.batch_size)
+                chunk = ({key: value[part] for key, value in inputs.items()} if isinstance(inputs, dict)
+                         else [value[part] for value in inputs])
+                chunks.append(run(registry, name, chunk, mask[part], mode_buckets))
+            batched = time.perf_counter() - start
+            outputs[label] = np.concatenate(chunks)
+
+            print(f"  {label:>8}: single p50 {percentile_ms(single, 50):7.2f} ms  "
+                  f"p95 {percentile_ms(single, 95):7.2f} ms  "
+                  f"batched {batched * 1000 / len(texts):7.3f} ms/text")
+
+        drift = np.abs(outputs['fixed'].astype(np.float64) - outputs['bucketed'].astype(np.float64))
+        flips = int(((outputs['fixed'] > 0.5) != (outputs['bucketed'] > 0.5)).sum())
+        print(f"  drift: max {drift.max():.2e}, mean {drift.mean():.2e}, decisions changed {flips}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,128 @@
+"""
+Local stand-in for the Spoonacular endpoints the backend uses
+(/recipes/complexSearch and /recipes/<id>/information), serving recipes
+built from the ingredient corpus. Point the backend at it with
+SPOONACULAR_BASE_URL=http://127.0.0.1:<port>.
+
+Usage:
+    python bench/spoonacular_stub.py --port 8099 --delay-ms 80
+"""
+import os
+import csv
+import json
+import time
+import random
+import argparse
+import threading
+from urllib.parse import urlparse, parse_qs
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+REPO_DIR = os.path.dirname(os.path.dirname(BACKEND_DIR))
+CORPUS_PATH = os.path.join(REPO_DIR, 'py', 'allergen.csv')
+
+
+def load_recipes(corpus_path=CORPUS_PATH, count=200, seed=0):
+    """
+    Build `count` fake recipes from the food products and ingredients of
+    allergen.csv.
+    """
+    rng = random.Random(seed)
+    with open(corpus_path, newline='', encoding='utf-8') as f:
+        rows = list(csv.DictReader(f))
+    recipes = {}
+    for recipe_id in range(1, count + 1):
+        row = rng.choice(rows)
+        ingredients = [
+            value.strip()
+            for key in ('Main Ingredient', 'Sweetener', 'Fat/Oil', 'Seasoning')
+            for value in row[key].split(',')
+            if value.strip() and value.strip().lower() != 'none'
+        ]
+        recipes[recipe_id] = {
+            'id': recipe_id,
+            'title': f"{row['Food Product']} #{recipe_id}",
+            'image': f"https://example.invalid/{recipe_id}.jpg",
+            'extendedIngredients': [{'name': name} for name in ingredients],
+        }
+    return recipes
+
+
+class SpoonacularStub:
+    """
+    Threaded HTTP server answering like Spoonacular, with an optional fixed
+    delay per response to mimic upstream latency.
+    """
+
+    def __init__(self, host='127.0.0.1', port=0, delay_ms=0.0, recipes=None):
+        self.recipes = recipes or load_recipes()
+        self.delay = delay_ms / 1000.0
+        self.requests = 0
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                stub.requests += 1
+                if stub.delay:
+                    time.sleep(stub.delay)
+                url = urlparse(self.path)
+                parts = url.path.strip('/').split('/')
+                if parts == ['recipes', 'complexSearch']:
+                    self._send(200, stub.search(parse_qs(url.query)))
+                elif len(parts) == 3 and parts[0] == 'recipes' and parts[2] == 'information':
+                    recipe = stub.recipes.get(int(parts[1])) if parts[1].isdigit() else None
+                    self._send(200, recipe) if recipe else self._send(404, {'message': 'not found'})
+                else:
+                    self._send(404, {'message': 'not found'})
+
+            def _send(self, status, body):
+                payload = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        self.url = f"http://{host}:{self.server.server_address[1]}"
+
+    def search(self, query):
+        number = int(query.get('number', ['10'])[0])
+        excluded = [term for term in query.get('excludeIngredients', [''])[0].lower().split(',') if term]
+        results = []
+        for recipe in self.recipes.values():
+            names = ' '.join(i['name'].lower() for i in recipe['extendedIngredients'])
+            # Exclude only some matches so the backend's own filter has work to do
+            if any(term in names for term in excluded) and recipe['id'] % 2:
+                continue
+            results.append({key: recipe[key] for key in ('id', 'title', 'image')})
+            if len(results) >= number:
+                break
+        return {'results': results, 'number': number, 'totalResults': len(self.recipes)}
+
+    def start(self):
+        threading.Thread(target=self.server.serve_forever, name='spoonacular-stub', daemon=True).start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8099)
+    parser.add_argument('--delay-ms', type=float, default=0.0)
+    args = parser.parse_args()
+    stub = SpoonacularStub(args.host, args.port, args.delay_ms)
+    print(f"Spoonacular stub on {stub.url}")
+    stub.server.serve_forever()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,59 @@
+"""
+Measure backend startup: time until app.py is imported (the server can
+accept connections), time until /ready would return 200, and RSS at each
+startup stage, for each STARTUP_MODE.
+
+Usage (from myapp/flask_backend):
+    python bench/startup_time.py --modes eager lazy --runs 3
+
+Each run is a fresh interpreter, so import and model-load costs are
+measured cold (apart from the OS file cache).
+"""
+import os
+import sys
+import json
+import argparse
+import subprocess
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Runs inside the child process
+CHILD = '''
+import json, time
+import app
+from util.startup import PROCESS_START
+imported = time.perf_counter() - PROCESS_START
+while not app.startup.ready and app.startup.error is None:
+    time.sleep(0.01)
+state = app.startup.as_dict()
+state['import_seconds'] = imported
+print(json.dumps(state))
+'''
+
+
+def run_once(mode):
+    env = dict(os.environ, STARTUP_MODE=mode)
+    output = subprocess.run([sys.executable, '-c', CHILD], cwd=BACKEND_DIR, env=env,
+                            capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--modes', nargs='+', default=['eager', 'lazy'])
+    parser.add_argument('--runs', type=int, default=3)
+    args = parser.parse_args()
+
+    for mode in args.modes:
+        for run in range(args.runs):
+            state = run_once(mode)
+            stages = ', '.join(
+                f"{s['stage']} {s['seconds']:.2f}s/{s['rss_bytes'] / 2**20:.0f}MiB" for s in state['stages']
+            )
+            print(f"{mode:>5} run {run + 1}: imported {state['import_seconds']:.2f}s, "
+                  f"ready {state['time_to_ready_seconds'] or float('nan'):.2f}s, "
+                  f"rss {state['memory']['rss'] / 2**20:.0f}MiB | {stages}")
+
+
+if __name__ == '__main__':
+    main()
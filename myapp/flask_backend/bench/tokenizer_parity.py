@@ -0,0 +1,116 @@
+"""
+Check that every tokenizer backend produces exactly the same input_ids,
+attention_mask and token_type_ids as transformers.BertTokenizer, and time
+batch encoding with each of them.
+
+Usage (from myapp/flask_backend):
+    python bench/tokenizer_parity.py --backends fast wordpiece --max-length 32 64 128
+
+The corpus is every text column of py/allergen.csv and
+py/cleaned_allergen_dataset.csv (rows and single ingredients), plus edge
+cases: accents, punctuation, CJK, control characters, special tokens,
+over-long words and texts longer than max_length. Exits with status 1 if
+any backend differs from the reference.
+"""
+import os
+import sys
+import csv
+import time
+import argparse
+
+import numpy as np
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+REPO_DIR = os.path.dirname(os.path.dirname(BACKEND_DIR))
+sys.path.insert(0, BACKEND_DIR)
+
+from util.tokenizer import get_tokenizer  # noqa: E402
+
+CORPUS_FILES = [
+    os.path.join(REPO_DIR, 'py', 'allergen.csv'),
+    os.path.join(REPO_DIR, 'py', 'cleaned_allergen_dataset.csv'),
+]
+
+EDGE_CASES = [
+    '',
+    '   ',
+    'Crème fraîche, jalapeño, açaí',
+    'SOY LECITHIN (E322), MONO- & DI-GLYCERIDES (E471)!!',
+    'wheat flour; sugar: 45%... salt/pepper',
+    '牛奶, 小麦, 大豆',
+    'milk powder whey\tcasein\nlactose\r\n',
+    'zero\u200bwidth space, soft\u00adhyphen',
+    'Contains: [UNK] [CLS] peanuts [SEP] tree nuts [MASK]',
+    'emoji 🥜🥛 peanuts',
+    'x' * 150,
+    'supercalifragilisticexpialidociousflour, E' + '1' * 120,
+    ', '.join(['sugar, salt, wheat flour, hazelnuts, skimmed milk powder'] * 40),
+]
+
+
+def load_corpus():
+    texts = []
+    for path in CORPUS_FILES:
+        if not os.path.exists(path):
+            print(f"warning: {path} not found, skipping")
+            continue
+        with open(path, newline='', encoding='utf-8') as f:
+            for row in csv.reader(f):
+                texts.append(', '.join(row))
+                texts.extend(cell for cell in row if cell)
+                # Lower-cased as the /predict clients send them too
+                texts.append(', '.join(row).lower())
+    return list(dict.fromkeys(texts + EDGE_CASES))
+
+
+def encode(tokenizer, texts, max_length):
+    return tokenizer(texts, max_length=max_length, padding='max_length', truncation=True,
+                     return_tensors='np', add_special_tokens=True)
+
+
+def compare(reference, candidate, texts):
+    mismatches = []
+    for key in ('input_ids', 'attention_mask', 'token_type_ids'):
+        rows = np.nonzero((np.asarray(reference[key]) != np.asarray(candidate[key])).any(axis=1))[0]
+        mismatches.extend((key, int(row), texts[row]) for row in rows)
+    return mismatches
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--backends', nargs='+', default=['fast', 'wordpiece'])
+    parser.add_argument('--max-length', type=int, nargs='+', default=[32, 128])
+    parser.add_argument('--batch-size', type=int, default=64)
+    parser.add_argument('--show', type=int, default=5, help='mismatching texts to print per backend')
+    args = parser.parse_args()
+
+    texts = load_corpus()
+    print(f"{len(texts)} distinct texts")
+    tokenizers = {name: get_tokenizer(name) for name in ['bert'] + args.backends}
+    failed = False
+
+    for max_length in args.max_length:
+        reference = encode(tokenizers['bert'], texts, max_length)
+        for name in args.backends:
+            mismatches = compare(reference, encode(tokenizers[name], texts, max_length), texts)
+            status = 'OK' if not mismatches else f'{len(mismatches)} MISMATCHES'
+            print(f"max_length={max_length:<4} {name:>10} ({type(tokenizers[name]).__name__}): {status}")
+            for key, row, text in mismatches[:args.show]:
+                print(f"    {key} row {row}: {text[:80]!r}")
+            failed = failed or bool(mismatches)
+
+    # Throughput over the corpus in request-sized batches
+    max_length = args.max_length[-1]
+    for name, tokenizer in tokenizers.items():
+        start = time.perf_counter()
+        for offset in range(0, len(texts), args.batch_size):
+            encode(tokenizer, texts[offset:offset + args.batch_size], max_length)
+        elapsed = time.perf_counter() - start
+        print(f"{name:>10}: {elapsed * 1000:8.1f} ms for {len(texts)} texts "
+              f"({len(texts) / elapsed:,.0f} texts/s, batch {args.batch_size})")
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
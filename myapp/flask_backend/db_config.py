@@ -1,12 +1,254 @@
-import mysql.connector
+import os
+import queue
+import sqlite3
+import threading
+import time
+import logging
+
+from util.metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+# 'mysql' for the real database, 'sqlite' for a local stand-in with the same schema
+DB_BACKEND = os.environ.get('DB_BACKEND', 'mysql').lower()
+
+MYSQL_CONFIG = {
+    'host': os.environ.get('DB_HOST', 'localhost'),
+    # 'host': '192.168.18.16',
+    'user': os.environ.get('DB_USER', 'flutter_user'),              # your MySQL username
+    'password': os.environ.get('DB_PASSWORD', 'FlutterPass123!'),   # your MySQL password
+    'database': os.environ.get('DB_NAME', 'flutter_auth'),          # use your actual DB name
+}
+
+SQLITE_PATH = os.environ.get(
+    'DB_SQLITE_PATH',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'instance', 'flutter_auth.db')
+)
+
+# Pool size and how long a request waits for a free connection (seconds)
+DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 5))
+DB_POOL_TIMEOUT = float(os.environ.get('DB_POOL_TIMEOUT', 10))
+
+DB_POOL_WAIT_SECONDS = REGISTRY.histogram(
+    'nutriguard_db_pool_wait_seconds',
+    'Time spent waiting for a database connection.',
+)
+
+
+class _SQLiteCursor:
+    """
+    Cursor wrapper that accepts the MySQL '%s' paramstyle and dictionary rows.
+    """
+
+    def __init__(self, cursor, dictionary=False):
+        self._cursor = cursor
+        self._dictionary = dictionary
+
+    def execute(self, sql, params=()):
+        self._cursor.execute(sql.replace('%s', '?'), params)
+
+    def _row(self, row):
+        if row is None:
+            return None
+        return dict(row) if self._dictionary else tuple(row)
+
+    def fetchone(self):
+        return self._row(self._cursor.fetchone())
+
+    def fetchall(self):
+        return [self._row(row) for row in self._cursor.fetchall()]
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+    @property
+    def lastrowid(self):
+        return self._cursor.lastrowid
+
+    def close(self):
+        self._cursor.close()
+
+
+class _SQLiteConnection:
+    """
+    SQLite connection exposing the subset of the mysql.connector API used by app.py.
+    """
+
+    def __init__(self, path):
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS users ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, "
+            "email TEXT UNIQUE NOT NULL, "
+            "password TEXT NOT NULL, "
+            "username TEXT, "
+            "allergens TEXT)"
+        )
+        self._conn.commit()
+
+    def cursor(self, dictionary=False):
+        return _SQLiteCursor(self._conn.cursor(), dictionary=dictionary)
+
+    def commit(self):
+        self._conn.commit()
+
+    def rollback(self):
+        self._conn.rollback()
+
+    def ping(self, reconnect=False, attempts=1, delay=0):
+        self._conn.execute("SELECT 1")
+
+    def close(self):
+        self._conn.close()
 
-def get_db_connection():
-    connection = mysql.connector.connect(
-        host='localhost',
-        # host='192.168.18.16',
-        user='flutter_user',            # your MySQL username
-        password='FlutterPass123!',            # your MySQL password
-        database='flutter_auth' # use your actual DB name
-    )
-    return connection
 
+def _connect():
+    if DB_BACKEND == 'sqlite':
+        return _SQLiteConnection(SQLITE_PATH)
+    import mysql.connector
+    return mysql.connector.connect(**MYSQL_CONFIG)
+
+
+class PooledConnection:
+    """
+    A borrowed connection. close() hands it back to the pool instead of
+    closing the underlying connection; everything else is passed through.
+    """
+
+    def __init__(self, pool, connection):
+        self._pool = pool
+        self._connection = connection
+
+    def __getattr__(self, name):
+        return getattr(self._connection, name)
+
+    def close(self):
+        if self._connection is not None:
+            connection, self._connection = self._connection, None
+            self._pool._release(connection)
+
+
+class ConnectionPool:
+    """
+    Thread-safe pool of database connections with a health check on checkout.
+    Connections are opened lazily up to `size`.
+    """
+
+    def __init__(self, connect=_connect, size=DB_POOL_SIZE, timeout=DB_POOL_TIMEOUT):
+        self._connect = connect
+        self.size = size
+        self.timeout = timeout
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._opened = 0
+
+        # Checkout statistics, updated under _lock
+        self.checkouts = 0
+        self.reconnects = 0
+        self.timeouts = 0
+
+        # A forked worker must not share the parent's connections (or sockets)
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._after_fork)
+
+    def _after_fork(self):
+        # The inherited connections are left to the parent, not closed
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._opened = 0
+
+    def _open(self):
+        with self._lock:
+            if self._opened >= self.size:
+                return None
+            self._opened += 1
+        try:
+            return self._connect()
+        except Exception:
+            with self._lock:
+                self._opened -= 1
+            raise
+
+    def _discard(self, connection):
+        with self._lock:
+            self._opened -= 1
+        try:
+            connection.close()
+        except Exception:
+            pass
+
+    @staticmethod
+    def _is_healthy(connection):
+        try:
+            connection.ping(reconnect=False, attempts=1, delay=0)
+            return True
+        except Exception:
+            return False
+
+    def get(self):
+        """
+        Borrow a connection, waiting up to `timeout` seconds for a free one.
+        """
+        start = time.perf_counter()
+        try:
+            connection = self._idle.get_nowait()
+        except queue.Empty:
+            connection = self._open()
+            if connection is None:
+                try:
+                    connection = self._idle.get(timeout=self.timeout)
+                except queue.Empty:
+                    with self._lock:
+                        self.timeouts += 1
+                    raise TimeoutError(f"No free database connection after {self.timeout}s")
+
+        # Replace connections that were dropped by the server while idle
+        if not self._is_healthy(connection):
+            logger.warning("Discarding unhealthy database connection")
+            self._discard(connection)
+            with self._lock:
+                self.reconnects += 1
+            connection = self._open()
+            if connection is None:
+                raise TimeoutError("No free database connection")
+
+        DB_POOL_WAIT_SECONDS.observe(time.perf_counter() - start)
+        with self._lock:
+            self.checkouts += 1
+        return PooledConnection(self, connection)
+
+    def _release(self, connection):
+        try:
+            # End any open transaction so the next user starts clean
+            connection.rollback()
+        except Exception:
+            self._discard(connection)
+            return
+        self._idle.put(connection)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'size': self.size,
+                'opened': self._opened,
+                'idle': self._idle.qsize(),
+                'checkouts': self.checkouts,
+                'reconnects': self.reconnects,
+                'timeouts': self.timeouts,
+            }
+
+
+_pool = ConnectionPool()
+
+REGISTRY.gauge('nutriguard_db_pool', 'Database connection pool statistics.', ('stat',),
+               lambda: {(stat,): value for stat, value in _pool.stats().items()})
+
+
+def get_db_connection():
+    """
+    Borrow a connection from the shared pool. Calling close() on it returns
+    it to the pool.
+    """
+    return _pool.get()
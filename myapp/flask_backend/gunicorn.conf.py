@@ -0,0 +1,95 @@
+# Production server settings for the Flask backend.
+#
+#   cd myapp/flask_backend
+#   gunicorn -c gunicorn.conf.py wsgi:application
+#
+# The app (tokenizer, e-code index, TFLite models) is loaded once in the
+# master process and the workers are forked from it, so they share those
+# pages copy-on-write instead of each loading their own copy.
+#
+# Graceful restarts: `kill -HUP <master pid>` starts new workers and lets the
+# old ones finish their requests (up to GUNICORN_GRACEFUL_TIMEOUT seconds).
+# With preload_app the code is not re-imported on HUP; to deploy new code or
+# models use `kill -USR2 <master pid>` (new master) and then QUIT the old one.
+import gc
+import os
+import shutil
+import tempfile
+
+from util.startup import memory_breakdown
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:5050')
+workers = int(os.environ.get('GUNICORN_WORKERS', 2))
+# Request threads per worker; keep at or below INTERPRETER_POOL_SIZE so
+# threads do not queue for interpreters
+threads = int(os.environ.get('GUNICORN_THREADS', os.environ.get('INTERPRETER_POOL_SIZE', 4)))
+worker_class = 'gthread' if threads > 1 else 'sync'
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 60))
+graceful_timeout = int(os.environ.get('GUNICORN_GRACEFUL_TIMEOUT', 30))
+keepalive = int(os.environ.get('GUNICORN_KEEPALIVE', 5))
+# Recycle workers after this many requests (0 = never), with jitter so they
+# do not all restart together
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 0))
+max_requests_jitter = int(os.environ.get('GUNICORN_MAX_REQUESTS_JITTER', 50))
+
+preload_app = True
+# Load and warm up everything in the master before forking. A background
+# warm-up thread (STARTUP_MODE=lazy) would not survive the fork.
+os.environ['STARTUP_MODE'] = 'eager'
+# Each worker starts its own password hashing processes in post_fork, from a
+# fork server so they do not inherit the worker's threads and fork handlers
+os.environ['PASSWORD_HASH_PRESTART'] = '0'
+os.environ['PASSWORD_HASH_START_METHOD'] = 'forkserver'
+# Allergen profile writes must reach every worker, which needs the shared
+# store; without it the other workers keep their cached copy for up to
+# PROFILE_CACHE_TTL seconds. Use a fresh file for this master unless one is set.
+_profile_cache_dir = None
+if workers > 1 and not os.environ.get('PROFILE_CACHE_DB'):
+    _profile_cache_dir = tempfile.mkdtemp(prefix='nutriguard-profiles-')
+    os.environ['PROFILE_CACHE_DB'] = os.path.join(_profile_cache_dir, 'profiles.sqlite')
+
+
+
+def _mib(value):
+    return value / 2 ** 20
+
+
+def when_ready(server):
+    memory = memory_breakdown()
+    server.log.info("Master %d loaded the app: rss %.1f MiB", os.getpid(), _mib(memory['rss']))
+    # Move everything allocated so far out of the collector's reach so that
+    # garbage collection in the workers does not touch (and copy) those pages
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    # The SQLAlchemy engine may hold connections opened in the master
+    from app import app, db, password_hasher
+    with app.app_context():
+        db.engine.dispose()
+    # Start the hashing pool before the first request. The worker already
+    # runs the batcher threads, which is why the pool uses a fork server.
+    password_hasher.start()
+
+
+def post_worker_init(worker):
+    memory = memory_breakdown()
+    worker.log.info(
+        "Worker %d started: rss %.1f MiB, pss %.1f MiB, shared %.1f MiB, private (incremental) %.1f MiB",
+        worker.pid, _mib(memory['rss']), _mib(memory.get('pss', 0)),
+        _mib(memory.get('shared', 0)), _mib(memory.get('private', 0)),
+    )
+
+
+def worker_exit(server, worker):
+    memory = memory_breakdown()
+    server.log.info("Worker %d exiting: private (incremental) %.1f MiB",
+                    worker.pid, _mib(memory.get('private', 0)))
+    # Stop this worker's password hashing processes with it
+    from app import password_hasher
+    password_hasher.shutdown()
+
+
+def on_exit(server):
+    if _profile_cache_dir is not None:
+        shutil.rmtree(_profile_cache_dir, ignore_errors=True)
@@ -0,0 +1,160 @@
+from collections import deque
+
+# Suffixes still treated as the end of a term ('egg' -> 'eggs', 'peach' -> 'peaches')
+PLURAL_SUFFIXES = ('s', 'es')
+
+# Words that start or end with a synonym but do not contain the allergen.
+# Keep this short: a missed allergen is worse than a dropped recipe.
+FALSE_POSITIVE_WORDS = frozenset({'eggplant', 'butternut', 'hamburger'})
+
+
+def _is_word_char(char):
+    return char.isalnum()
+
+
+class AllergenMatcher:
+    """
+    Aho-Corasick automaton over an allergen synonym table.
+
+    Scans text once, whatever the number of synonyms, and reports which
+    canonical allergens occur in it. A match must start or end a word (a
+    plural -s/-es counts as the end), so compound words are caught either
+    way round ('eggnog', 'soymilk', 'buttermilk', 'cornbread') while terms
+    buried inside a word are not. Words in FALSE_POSITIVE_WORDS ('eggplant',
+    'butternut') never match. With whole_words=True a match must both start
+    and end a word.
+    """
+
+    def __init__(self, synonyms, whole_words=False):
+        """
+        Args:
+            synonyms (dict): canonical allergen -> list of synonym terms. The
+                canonical name itself is always matched as well.
+            whole_words (bool): Require matches to start at a word boundary too.
+        """
+        self.synonyms = {canonical.lower(): list(terms) for canonical, terms in synonyms.items()}
+        self.whole_words = whole_words
+
+        # term -> set of canonical allergens it stands for
+        self._canonicals = {}
+        for canonical, terms in self.synonyms.items():
+            for term in [canonical] + terms:
+                term = term.lower().strip()
+                if term:
+                    self._canonicals.setdefault(term, set()).add(canonical)
+        self._build(list(self._canonicals))
+
+    def _build(self, terms):
+        # Trie of goto transitions; outputs holds the terms ending at each state
+        self._goto = [{}]
+        self._outputs = [[]]
+        for term in terms:
+            state = 0
+            for char in term:
+                nxt = self._goto[state].get(char)
+                if nxt is None:
+                    nxt = len(self._goto)
+                    self._goto[state][char] = nxt
+                    self._goto.append({})
+                    self._outputs.append([])
+                state = nxt
+            self._outputs[state].append(term)
+
+        # Breadth-first pass for failure links, merging outputs along them
+        self._fail = [0] * len(self._goto)
+        pending = deque(self._goto[0].values())
+        while pending:
+            state = pending.popleft()
+            for char, nxt in self._goto[state].items():
+                pending.append(nxt)
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                target = self._goto[fallback].get(char, 0)
+                self._fail[nxt] = target if target != nxt else 0
+                self._outputs[nxt] = self._outputs[nxt] + self._outputs[self._fail[nxt]]
+
+    def extended(self, extra_synonyms):
+        """
+        Return a new matcher with additional canonical allergens/terms.
+        """
+        merged = {canonical: list(terms) for canonical, terms in self.synonyms.items()}
+        for canonical, terms in extra_synonyms.items():
+            merged.setdefault(canonical.lower(), []).extend(terms)
+        return AllergenMatcher(merged, whole_words=self.whole_words)
+
+    def _ends_word(self, text, end):
+        # end is the index just past the match
+        if end == len(text) or not _is_word_char(text[end]):
+            return True
+        for suffix in PLURAL_SUFFIXES:
+            after = end + len(suffix)
+            if text.startswith(suffix, end) and (after == len(text) or not _is_word_char(text[after])):
+                return True
+        return False
+
+    @staticmethod
+    def _word_at(text, start, end):
+        # The whole word containing text[start:end]
+        while start > 0 and _is_word_char(text[start - 1]):
+            start -= 1
+        while end < len(text) and _is_word_char(text[end]):
+            end += 1
+        return text[start:end]
+
+    def _is_false_positive(self, text, start, end):
+        word = self._word_at(text, start, end)
+        if word in FALSE_POSITIVE_WORDS:
+            return True
+        return any(word.endswith(suffix) and word[:-len(suffix)] in FALSE_POSITIVE_WORDS
+                   for suffix in PLURAL_SUFFIXES)
+
+    def find(self, text):
+        """
+        Find all synonym occurrences in text.
+        Returns:
+            list of (term, start) tuples, in order of their end position.
+        """
+        text = text.lower()
+        goto, fail, outputs = self._goto, self._fail, self._outputs
+        found = []
+        state = 0
+        for position, char in enumerate(text):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            for term in outputs[state]:
+                start = position - len(term) + 1
+                starts_word = start == 0 or not _is_word_char(text[start - 1])
+                ends_word = self._ends_word(text, position + 1)
+                if self.whole_words:
+                    if not (starts_word and ends_word):
+                        continue
+                elif not (starts_word or ends_word):
+                    continue
+                if self._is_false_positive(text, start, position + 1):
+                    continue
+                found.append((term, start))
+        return found
+
+    def matches(self, texts):
+        """
+        Return which canonical allergens occur in a text or list of texts,
+        with the terms that matched.
+        Returns:
+            dict: canonical allergen -> sorted list of matched terms.
+        """
+        if isinstance(texts, str):
+            texts = [texts]
+        # One pass over all texts; the separator is never part of a match
+        matched = {}
+        for term, _ in self.find('\n'.join(texts)):
+            for canonical in self._canonicals[term]:
+                matched.setdefault(canonical, set()).add(term)
+        return {canonical: sorted(terms) for canonical, terms in matched.items()}
+
+    def canonical_allergens(self, texts):
+        """
+        Return the set of canonical allergens found in a text or list of texts.
+        """
+        return set(self.matches(texts))
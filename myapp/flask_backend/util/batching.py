@@ -0,0 +1,104 @@
+import os
+import queue
+import threading
+import time
+import logging
+from concurrent.futures import Future
+
+logger = logging.getLogger(__name__)
+
+
+class MicroBatcher:
+    """
+    Coalesces single requests that arrive within a short window into one batch.
+
+    Callers block in submit() while a background thread collects up to
+    max_batch items (or whatever arrived within window_ms of the first one),
+    runs batch_fn once on the whole list and hands each caller its own result.
+    """
+
+    def __init__(self, name, batch_fn, window_ms=5, max_batch=32):
+        """
+        Args:
+            name (str): Name used for the worker thread and in logs.
+            batch_fn (callable): Takes a list of items and returns a list of
+                results in the same order.
+            window_ms (float): How long to wait for more items after the first one.
+            max_batch (int): Maximum number of items run together.
+        """
+        self.name = name
+        self.batch_fn = batch_fn
+        self.window = window_ms / 1000.0
+        self.max_batch = max_batch
+        self._queue = queue.Queue()
+
+        # Batch statistics
+        self._stats_lock = threading.Lock()
+        self._batches = 0
+        self._items = 0
+
+        self._start()
+        # Threads do not survive fork(); pre-fork servers need a fresh worker per process
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._after_fork)
+
+    def _start(self):
+        self._worker = threading.Thread(target=self._run, name=f"batcher-{self.name}", daemon=True)
+        self._worker.start()
+
+    def _after_fork(self):
+        self._queue = queue.Queue()
+        self._stats_lock = threading.Lock()
+        self._start()
+
+    def submit(self, item, timeout=None):
+        """
+        Queue one item and wait for its result.
+        Re-raises any exception raised by batch_fn for the batch it was in.
+        """
+        future = Future()
+        self._queue.put((item, future))
+        return future.result(timeout=timeout)
+
+    def _collect(self):
+        # Block for the first item, then keep collecting until the window
+        # closes or the batch is full
+        batch = [self._queue.get()]
+        deadline = time.perf_counter() + self.window
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            items = [item for item, _ in batch]
+            try:
+                results = self.batch_fn(items)
+            except Exception as e:
+                logger.exception("Batch of %d failed in batcher '%s'", len(items), self.name)
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            for (_, future), result in zip(batch, results):
+                future.set_result(result)
+            with self._stats_lock:
+                self._batches += 1
+                self._items += len(batch)
+
+    def stats(self):
+        with self._stats_lock:
+            return {
+                'window_ms': self.window * 1000.0,
+                'max_batch': self.max_batch,
+                'batches': self._batches,
+                'items': self._items,
+                'avg_batch_size': self._items / self._batches if self._batches else 0.0,
+                'queued': self._queue.qsize(),
+            }
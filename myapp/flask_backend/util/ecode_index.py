@@ -0,0 +1,137 @@
+import os
+import re
+import json
+import time
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAPPING_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'e_code_mapping.json')
+# Seconds between checks of the mapping file's mtime; 0 checks on every lookup
+DEFAULT_CHECK_INTERVAL = float(os.environ.get('ECODE_INDEX_CHECK_INTERVAL', 5))
+
+# One e-code inside free text, e.g. "E471", "e 471a", "E-160(a)"
+_E_CODE_IN_TEXT = re.compile(r'(?<![a-z0-9])e\s*-?\s*(\d{3,4})\s*\(?([a-z])?\)?(?![a-z0-9])', re.IGNORECASE)
+# A single e-code once spaces, dashes and brackets are removed
+_E_CODE_EXACT = re.compile(r'E?(\d{3,4})([A-Z]?)')
+
+
+def canonical_e_code(code):
+    """
+    Normalize an e-code variant ('e471', 'E 471', '471', 'e471a') to its
+    canonical form ('E471', 'E471A'). Returns None if it is not an e-code.
+    """
+    if code is None:
+        return None
+    compact = re.sub(r'[\s\-()]', '', str(code)).upper()
+    match = _E_CODE_EXACT.fullmatch(compact)
+    if not match:
+        return None
+    return f"E{match.group(1)}{match.group(2)}"
+
+
+class ECodeIndex:
+    """
+    In-memory index of e_code_mapping.json keyed by canonical e-code.
+
+    The file is read once and only re-read when its mtime changes; the mtime
+    itself is checked at most every check_interval seconds, so lookups do
+    no file I/O in between.
+    """
+
+    def __init__(self, path=DEFAULT_MAPPING_PATH, check_interval=DEFAULT_CHECK_INTERVAL):
+        self.path = path
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._mtime = None
+        self._next_check = 0.0
+        self.mapping = {}
+        self.min_value = 0
+        self.max_value = 0
+        self._canonical = {}
+        self._maybe_reload()
+
+    def _load(self, mtime):
+        with open(self.path) as f:
+            mapping = json.load(f)
+        canonical = {}
+        for key, value in mapping.items():
+            canon = canonical_e_code(key)
+            # Keys already written in canonical form win over other spellings
+            if canon and (canon not in canonical or key == canon):
+                canonical[canon] = value
+        self.mapping = mapping
+        self._canonical = canonical
+        self.min_value = min(mapping.values()) if mapping else 0
+        self.max_value = max(mapping.values()) if mapping else 0
+        self._mtime = mtime
+        logger.info("E-code index loaded with %d entries (range %d to %d)",
+                    len(mapping), self.min_value, self.max_value)
+
+    def _maybe_reload(self):
+        now = time.monotonic()
+        if now < self._next_check:
+            return
+        with self._lock:
+            if now < self._next_check:
+                return
+            self._next_check = now + self.check_interval
+            mtime = os.stat(self.path).st_mtime
+            if mtime != self._mtime:
+                self._load(mtime)
+
+    def lookup(self, code):
+        """
+        Return the model id for an e-code, or None if unknown. An unknown
+        lettered variant (e.g. 'E471a') falls back to its base code ('E471').
+        """
+        self._maybe_reload()
+        if code in self.mapping:
+            return self.mapping[code]
+        canon = canonical_e_code(code)
+        if canon is None:
+            return None
+        if canon in self._canonical:
+            return self._canonical[canon]
+        return self._canonical.get(canon.rstrip('ABCDEFGHIJKLMNOPQRSTUVWXYZ'))
+
+    def lookup_many(self, codes):
+        """
+        Look up several e-codes at once. Returns a list of ids (None for unknown).
+        """
+        return [self.lookup(code) for code in codes]
+
+    def find_in_text(self, text):
+        """
+        Find all e-codes mentioned in a label text.
+        Returns:
+            list of (canonical e-code, id) pairs for known codes, in order of appearance.
+        """
+        found = []
+        seen = set()
+        for match in _E_CODE_IN_TEXT.finditer(text or ''):
+            canon = f"E{match.group(1)}{(match.group(2) or '').upper()}"
+            if canon in seen:
+                continue
+            seen.add(canon)
+            value = self.lookup(canon)
+            if value is not None:
+                found.append((canon, value))
+        return found
+
+
+_default_index = None
+_default_lock = threading.Lock()
+
+
+def get_e_code_index():
+    """
+    Return the process-wide index for util/e_code_mapping.json.
+    """
+    global _default_index
+    if _default_index is None:
+        with _default_lock:
+            if _default_index is None:
+                _default_index = ECodeIndex()
+    return _default_index
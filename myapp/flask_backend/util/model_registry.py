@@ -0,0 +1,352 @@
+import os
+import queue
+import hashlib
+import threading
+import time
+import logging
+from contextlib import contextmanager
+
+import numpy as np
+
+from util.metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+INTERPRETER_WAIT_SECONDS = REGISTRY.histogram(
+    'nutriguard_interpreter_wait_seconds',
+    'Time spent waiting for a free interpreter.',
+    ('model',),
+)
+
+# Number of interpreters kept per model. TFLite interpreters are not
+# thread-safe, so this should match the number of worker threads that can
+# run inference at the same time.
+DEFAULT_POOL_SIZE = int(os.environ.get('INTERPRETER_POOL_SIZE', 4))
+# How long a request waits for a free interpreter before giving up (seconds)
+DEFAULT_CHECKOUT_TIMEOUT = float(os.environ.get('INTERPRETER_CHECKOUT_TIMEOUT', 30))
+# Batch sizes every interpreter keeps tensors allocated for; a batch is padded
+# up to the next one. Each size in use costs one more tensor arena per pooled
+# interpreter. Keep the largest at the micro-batch and chunk size (32).
+INTERPRETER_BATCH_SIZES = tuple(sorted(
+    int(size) for size in os.environ.get('INTERPRETER_BATCH_SIZES', '1,2,4,8,16,32').split(',') if size.strip()
+))
+
+
+_fingerprints = {}
+_fingerprints_lock = threading.Lock()
+
+
+def file_fingerprint(path):
+    """
+    SHA-256 of a model file, computed once per file version (path, size,
+    modification time).
+    """
+    stat = os.stat(path)
+    key = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+    with _fingerprints_lock:
+        fingerprint = _fingerprints.get(key)
+    if fingerprint is None:
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                digest.update(block)
+        fingerprint = digest.hexdigest()
+        with _fingerprints_lock:
+            _fingerprints[key] = fingerprint
+    return fingerprint
+
+
+class PooledInterpreter:
+    """
+    A TFLite model with tensors allocated and input/output details cached.
+
+    Each batch size in batch_sizes gets its own interpreter, created on first
+    use and allocated once; a batch is zero-padded up to the next size and
+    its outputs are cut back to the real rows. Alternating between single
+    requests and full micro-batches therefore never re-allocates tensors.
+    Batches larger than every size share one interpreter that is resized
+    when their size changes.
+    """
+
+    def __init__(self, model_path, sequence_length=None, batch_sizes=INTERPRETER_BATCH_SIZES):
+        """
+        Args:
+            model_path (str): Path of the .tflite file.
+            sequence_length (int): Resize the sequence inputs (2-D inputs of
+                the model's native sequence length) to this length up front.
+            batch_sizes (tuple of int): Batch sizes inputs are padded up to.
+        """
+        # TensorFlow is only imported once the first model is loaded
+        import tensorflow as tf
+
+        self._tf = tf
+        self.model_path = model_path
+        self.batch_sizes = tuple(sorted(batch_sizes))
+        self.interpreter = tf.lite.Interpreter(model_path=model_path)
+        self.interpreter.allocate_tensors()
+        self.input_details = self.interpreter.get_input_details()
+        self.output_details = self.interpreter.get_output_details()
+        self.input_index_by_name = {d['name']: d['index'] for d in self.input_details}
+        # Native sequence length: the widest 2-D input (None if there is none)
+        widths = [int(d['shape'][1]) for d in self.input_details if len(d['shape']) == 2]
+        self.native_sequence_length = max(widths) if widths else None
+        self.sequence_length = self.native_sequence_length
+        if sequence_length is not None and sequence_length != self.native_sequence_length:
+            self._use(self._allocate(self.interpreter, {
+                d['index']: (int(d['shape'][0]), sequence_length)
+                for d in self.input_details
+                if len(d['shape']) == 2 and d['shape'][1] == self.native_sequence_length
+            }))
+            self.sequence_length = sequence_length
+        self.batch_size = int(self.input_details[0]['shape'][0]) if self.input_details else 1
+        # batch size -> (interpreter, input details, output details)
+        self._by_batch = {self.batch_size: (self.interpreter, self.input_details, self.output_details)}
+        # (batch size, entry) of the interpreter for batches above every size
+        self._overflow = None
+        self._rows = None
+
+    @staticmethod
+    def _allocate(interpreter, shapes):
+        """
+        Resize the inputs in shapes ({index: shape}) that differ from the
+        interpreter's current ones, allocate tensors once, and return the
+        (interpreter, input details, output details) entry.
+        """
+        current = {d['index']: tuple(d['shape']) for d in interpreter.get_input_details()}
+        changed = [(index, tuple(shape)) for index, shape in shapes.items() if current[index] != tuple(shape)]
+        for index, shape in changed:
+            interpreter.resize_tensor_input(index, shape)
+        if changed:
+            interpreter.allocate_tensors()
+        return interpreter, interpreter.get_input_details(), interpreter.get_output_details()
+
+    def _use(self, entry):
+        self.interpreter, self.input_details, self.output_details = entry
+
+    def _padded_batch(self, rows):
+        for size in self.batch_sizes:
+            if size >= rows:
+                return size
+        return rows
+
+    def _select(self, batch):
+        # Switch to the interpreter allocated for this batch size
+        entry = self._by_batch.get(batch)
+        if entry is None and self._overflow is not None and self._overflow[0] == batch:
+            entry = self._overflow[1]
+        if entry is None:
+            shapes = {d['index']: (batch,) + tuple(int(dim) for dim in d['shape'][1:]) for d in self.input_details}
+            if batch in self.batch_sizes or self._overflow is None:
+                interpreter = self._tf.lite.Interpreter(model_path=self.model_path)
+            else:
+                interpreter = self._overflow[1][0]
+            entry = self._allocate(interpreter, shapes)
+            if batch in self.batch_sizes:
+                self._by_batch[batch] = entry
+            else:
+                self._overflow = (batch, entry)
+        self._use(entry)
+
+    def set_inputs(self, arrays):
+        """
+        Set all model inputs.
+        Args:
+            arrays (list or dict): Arrays in input_details order, or keyed by input name.
+        """
+        if isinstance(arrays, dict):
+            items = [(self.input_index_by_name[name], value) for name, value in arrays.items()]
+        else:
+            items = [(detail['index'], value) for detail, value in zip(self.input_details, arrays)]
+        rows = items[0][1].shape[0]
+        batch = self._padded_batch(rows)
+        self._select(batch)
+        for index, value in items:
+            if batch > rows:
+                # Zero rows (all padding, attention mask 0); their outputs are dropped
+                value = np.pad(value, [(0, batch - rows)] + [(0, 0)] * (value.ndim - 1))
+            self.interpreter.set_tensor(index, value)
+        self._rows = rows
+
+    def invoke(self):
+        self.interpreter.invoke()
+
+    def output(self, position=0):
+        """
+        Return a copy of the output tensor at the given position, for the
+        rows last passed to set_inputs.
+        """
+        output = self.interpreter.get_tensor(self.output_details[position]['index'])
+        return output[:self._rows] if self._rows is not None else output
+
+    def run(self, arrays, position=0):
+        """
+        Set inputs, invoke the model and return one output tensor.
+        """
+        self.set_inputs(arrays)
+        self.invoke()
+        return self.output(position)
+
+
+class InterpreterPool:
+    """
+    Thread-safe pool of pre-allocated interpreters for one model file.
+    """
+
+    def __init__(self, model_path, size=DEFAULT_POOL_SIZE, checkout_timeout=DEFAULT_CHECKOUT_TIMEOUT, name=None,
+                 sequence_length=None):
+        if not os.path.exists(model_path):
+            raise FileNotFoundError(f"Model file not found: {model_path}")
+        self.model_path = model_path
+        # Identifies the model version these interpreters were loaded from
+        self.fingerprint = file_fingerprint(model_path)
+        self.name = name or os.path.basename(model_path)
+        self.size = size
+        self.checkout_timeout = checkout_timeout
+        self._idle = queue.LifoQueue()
+        interpreters = [PooledInterpreter(model_path, sequence_length) for _ in range(size)]
+        # Details are identical for every copy of the model
+        self.input_details = interpreters[0].input_details
+        self.output_details = interpreters[0].output_details
+        self.sequence_length = interpreters[0].sequence_length
+        self.native_sequence_length = interpreters[0].native_sequence_length
+        for pooled in interpreters:
+            self._idle.put(pooled)
+
+        # Checkout statistics
+        self._stats_lock = threading.Lock()
+        self._checkouts = 0
+        self._timeouts = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+
+    @contextmanager
+    def checkout(self, timeout=None):
+        """
+        Borrow an interpreter for the duration of the with-block.
+        Raises TimeoutError if none becomes free within the timeout.
+        """
+        timeout = self.checkout_timeout if timeout is None else timeout
+        start = time.perf_counter()
+        try:
+            pooled = self._idle.get(timeout=timeout)
+        except queue.Empty:
+            with self._stats_lock:
+                self._timeouts += 1
+            raise TimeoutError(
+                f"No free interpreter for {os.path.basename(self.model_path)} after {timeout}s"
+            )
+        waited = time.perf_counter() - start
+        INTERPRETER_WAIT_SECONDS.observe(waited, model=self.name)
+        with self._stats_lock:
+            self._checkouts += 1
+            self._wait_total += waited
+            self._wait_max = max(self._wait_max, waited)
+        try:
+            yield pooled
+        finally:
+            self._idle.put(pooled)
+
+    def stats(self):
+        with self._stats_lock:
+            return {
+                'model_path': self.model_path,
+                'fingerprint': self.fingerprint,
+                'sequence_length': self.sequence_length,
+                'size': self.size,
+                'idle': self._idle.qsize(),
+                'checkouts': self._checkouts,
+                'timeouts': self._timeouts,
+                'wait_seconds_total': self._wait_total,
+                'wait_seconds_avg': self._wait_total / self._checkouts if self._checkouts else 0.0,
+                'wait_seconds_max': self._wait_max,
+            }
+
+
+class ModelRegistry:
+    """
+    Loads each registered model once and serves interpreters from its pool.
+    """
+
+    def __init__(self, pool_size=DEFAULT_POOL_SIZE):
+        self.pool_size = pool_size
+        self._paths = {}
+        self._pools = {}
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def register(self, name, model_path):
+        self._paths[name] = model_path
+
+    def load_all(self):
+        """
+        Load every registered model. Missing model files are logged and skipped
+        so the remaining endpoints can still serve.
+        """
+        for name in self._paths:
+            try:
+                self.pool(name)
+            except FileNotFoundError as e:
+                logger.warning("Skipping model '%s': %s", name, e)
+
+    def pool(self, name):
+        pool = self._pools.get(name)
+        if pool is None:
+            with self._lock:
+                pool = self._pools.get(name)
+                if pool is None:
+                    pool = InterpreterPool(self._paths[name], size=self.pool_size, name=name)
+                    self._pools[name] = pool
+                    logger.info("Loaded model '%s' with %d interpreters", name, self.pool_size)
+        return pool
+
+    def bucket_pool(self, name, sequence_length):
+        """
+        Pool of interpreters with the sequence inputs resized to
+        sequence_length. The native length is served by the main pool.
+        """
+        base = self.pool(name)
+        if sequence_length is None or sequence_length == base.native_sequence_length:
+            return base
+        key = f"{name}@{sequence_length}"
+        pool = self._pools.get(key)
+        if pool is None:
+            with self._lock:
+                pool = self._pools.get(key)
+                if pool is None:
+                    pool = InterpreterPool(self._paths[name], size=self.pool_size, name=key,
+                                           sequence_length=sequence_length)
+                    self._pools[key] = pool
+                    logger.info("Loaded model '%s' with %d interpreters", key, self.pool_size)
+        return pool
+
+    def supported_buckets(self, name, buckets):
+        """
+        Return the subset of sequence-length buckets this model can be resized
+        to, creating their pools on first call. Models with fixed input
+        shapes reject the resize; they are logged and served at full length.
+        """
+        key = (name, tuple(buckets))
+        supported = self._buckets.get(key)
+        if supported is None:
+            supported = []
+            for length in buckets:
+                try:
+                    self.bucket_pool(name, length)
+                    supported.append(length)
+                except (RuntimeError, ValueError) as e:
+                    logger.warning("Model '%s' cannot run at sequence length %d: %s", name, length, e)
+            supported = self._buckets[key] = tuple(supported)
+        return supported
+
+    def checkout(self, name, timeout=None, sequence_length=None):
+        return self.bucket_pool(name, sequence_length).checkout(timeout=timeout)
+
+    def fingerprint(self, name):
+        """
+        Fingerprint of the model file loaded for name (loading it if needed).
+        A changed file gets a new fingerprint once it is loaded, on restart.
+        """
+        return self.pool(name).fingerprint
+
+    def stats(self):
+        return {name: pool.stats() for name, pool in self._pools.items()}
@@ -0,0 +1,213 @@
+import os
+import hmac
+import time
+import threading
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+
+import bcrypt
+
+from util.metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+# bcrypt work factor for new hashes (Flask-Bcrypt's default is 12); existing
+# hashes keep the factor they were made with
+BCRYPT_LOG_ROUNDS = int(os.environ.get('BCRYPT_LOG_ROUNDS', 12))
+# Processes doing the hashing; 0 hashes on the request thread as before
+PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', 2))
+# Hashes allowed to wait for a process before requests are turned away
+PASSWORD_HASH_MAX_PENDING = int(os.environ.get('PASSWORD_HASH_MAX_PENDING', 64))
+# Seconds a request waits for a queue slot and then for its hash
+PASSWORD_HASH_TIMEOUT = float(os.environ.get('PASSWORD_HASH_TIMEOUT', 10))
+# Start the hashing processes when the app is imported. gunicorn.conf.py turns
+# this off and starts them in each worker's post_fork hook instead.
+PASSWORD_HASH_PRESTART = os.environ.get('PASSWORD_HASH_PRESTART', '1').lower() in ('1', 'true', 'yes')
+# How the hashing processes are started: 'fork' (python app.py) or
+# 'forkserver' (set by gunicorn.conf.py)
+PASSWORD_HASH_START_METHOD = os.environ.get('PASSWORD_HASH_START_METHOD', 'fork')
+
+HASH_SECONDS = REGISTRY.histogram(
+    'nutriguard_password_hash_seconds',
+    'Password hashing time by operation and phase (queue wait, hash, total).',
+    ('op', 'phase'),
+)
+HASH_REJECTED = REGISTRY.counter(
+    'nutriguard_password_hash_rejected_total',
+    'Password hashing requests turned away (queue full or hash timed out).',
+    ('op', 'reason'),
+)
+
+
+class HasherBusy(Exception):
+    """
+    Raised when no hashing slot frees up, or the hash does not finish,
+    within the timeout.
+    """
+
+
+def _noop():
+    return None
+
+
+def _hash(password, rounds):
+    return bcrypt.hashpw(password, bcrypt.gensalt(rounds)).decode('utf-8')
+
+
+def _check(pw_hash, password):
+    # Same comparison as Flask-Bcrypt's check_password_hash
+    return hmac.compare_digest(bcrypt.hashpw(password, pw_hash), pw_hash)
+
+
+def _encode(value):
+    return value.encode('utf-8') if isinstance(value, str) else value
+
+
+class PasswordHasher:
+    """
+    Runs bcrypt in a small process pool so that login and signup bursts do
+    not hold the GIL of the workers serving inference.
+
+    At most `workers + max_pending` hashes are in flight; further callers
+    wait up to `timeout` seconds for a slot and then get HasherBusy. A slot
+    is only freed when its hash has finished in the pool, even if the
+    caller gave up waiting.
+
+    Under `python app.py` the pool processes are forked, since spawn and
+    forkserver children re-import the main script, which there means
+    TensorFlow, the models and the warm-up. app.py calls start() early in
+    its import, before any threads exist and before the batchers and caches
+    register their fork handlers, so the children only ever run bcrypt.
+    Under gunicorn the worker already runs batcher threads and those
+    handlers, so the pool uses a fork server instead: a fresh interpreter
+    that has only imported this module, and whose children re-import just
+    the gunicorn script. Where the start method is unavailable, hashing
+    stays on the request thread.
+    """
+
+    def __init__(self, workers=PASSWORD_HASH_WORKERS, max_pending=PASSWORD_HASH_MAX_PENDING,
+                 rounds=BCRYPT_LOG_ROUNDS, timeout=PASSWORD_HASH_TIMEOUT, start_method=PASSWORD_HASH_START_METHOD):
+        if workers and start_method not in multiprocessing.get_all_start_methods():
+            logger.warning("%s is not available; hashing passwords on the request thread", start_method)
+            workers = 0
+        self.workers = workers
+        self.start_method = start_method
+        self.max_pending = max_pending
+        self.rounds = rounds
+        self.timeout = timeout
+        self._init_state()
+        if hasattr(os, 'register_at_fork'):
+            # A forked child (gunicorn worker or hashing process) must not use the parent's pool
+            os.register_at_fork(after_in_child=self._init_state)
+
+    def _init_state(self):
+        self._executor = None
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(self.workers + self.max_pending) if self.workers else None
+        self.in_flight = 0
+        self.completed = 0
+        self.rejected = 0
+        self.timeouts = 0
+
+    def start(self):
+        """
+        Start the hashing processes now. With fork, call while the process
+        is single-threaded; later calls do nothing.
+        """
+        if not self.workers:
+            return
+        with self._lock:
+            if self._executor is not None:
+                return
+            context = multiprocessing.get_context(self.start_method)
+            if self.start_method == 'forkserver':
+                # The fork server imports bcrypt once instead of every child
+                context.set_forkserver_preload([__name__])
+            executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=context)
+            # Starts the processes now rather than on the first login (with
+            # fork all of them, with forkserver the first one)
+            executor.submit(_noop).result()
+            self._executor = executor
+
+    def _pool(self):
+        if self._executor is None:
+            logger.warning("Password hashing pool started on first use; call start() earlier")
+            self.start()
+        return self._executor
+
+    def _release(self, op, start, acquired, future):
+        # Runs when the pool has finished the hash, whether or not the caller still waits
+        now = time.perf_counter()
+        with self._lock:
+            self.in_flight -= 1
+            self.completed += 1
+        self._slots.release()
+        HASH_SECONDS.observe(now - acquired, op=op, phase='hash')
+        HASH_SECONDS.observe(now - start, op=op, phase='total')
+
+    def _run(self, op, fn, *args):
+        start = time.perf_counter()
+        if self._slots is None:
+            result = fn(*args)
+            HASH_SECONDS.observe(time.perf_counter() - start, op=op, phase='total')
+            return result
+
+        if not self._slots.acquire(timeout=self.timeout):
+            with self._lock:
+                self.rejected += 1
+            HASH_REJECTED.inc(op=op, reason='queue_full')
+            raise HasherBusy("Password hashing queue is full")
+        acquired = time.perf_counter()
+        HASH_SECONDS.observe(acquired - start, op=op, phase='queue')
+        with self._lock:
+            self.in_flight += 1
+        try:
+            future = self._pool().submit(fn, *args)
+        except Exception:
+            with self._lock:
+                self.in_flight -= 1
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda done: self._release(op, start, acquired, done))
+
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeoutError:
+            with self._lock:
+                self.timeouts += 1
+            HASH_REJECTED.inc(op=op, reason='timeout')
+            raise HasherBusy("Password hashing timed out")
+
+    def generate_password_hash(self, password):
+        """
+        Hash a password with the configured work factor.
+        Returns:
+            str: The bcrypt hash.
+        """
+        return self._run('hash', _hash, _encode(password), self.rounds)
+
+    def check_password_hash(self, pw_hash, password):
+        """
+        Returns:
+            bool: Whether password matches the stored bcrypt hash.
+        """
+        return self._run('check', _check, _encode(pw_hash), _encode(password))
+
+    def stats(self):
+        with self._lock:
+            return {
+                'workers': self.workers,
+                'in_flight': self.in_flight,
+                'queued': max(0, self.in_flight - self.workers),
+                'completed': self.completed,
+                'rejected': self.rejected,
+                'timeouts': self.timeouts,
+                'rounds': self.rounds,
+            }
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False)
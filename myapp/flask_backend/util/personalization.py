@@ -0,0 +1,100 @@
+import numpy as np
+
+from util.allergen_matcher import AllergenMatcher
+
+# Model labels the synonym table does not cover, mapped to the allergen they imply
+LABEL_ALIASES = {
+    'dairy': 'milk',
+    'ghee': 'milk',
+    'nuts': 'tree nut',
+    'pine nuts': 'tree nut',
+    'anchovies': 'fish',
+}
+
+
+class LabelAllergenIndex:
+    """
+    Maps profile allergens onto the allergen model's output labels.
+
+    Every allergen gets a precomputed bitmask with one bit per label it
+    covers, so a user's profile becomes one integer and checking a batch of
+    predictions against it is a single vectorized AND.
+    """
+
+    def __init__(self, labels, synonyms, aliases=LABEL_ALIASES):
+        """
+        Args:
+            labels (list of str): Model output labels, in output order (at most 63).
+            synonyms (dict): canonical allergen -> synonym terms (ALLERGEN_SYNONYMS).
+            aliases (dict): label -> canonical allergen, for labels the synonyms miss.
+        """
+        if len(labels) > 63:
+            raise ValueError("At most 63 labels fit in an int64 bitmask")
+        self.labels = list(labels)
+        # Whole words only, so the 'fish' synonym does not claim the 'shellfish' label
+        self._matcher = AllergenMatcher(synonyms, whole_words=True)
+        self._bits = np.left_shift(np.int64(1), np.arange(len(self.labels), dtype=np.int64))
+
+        # allergen name -> bitmask of the labels it covers; each label also stands for itself
+        self.masks = {}
+        groups = {}
+        for position, label in enumerate(self.labels):
+            label = label.lower()
+            groups[label] = self._matcher.canonical_allergens(label)
+            if label in aliases:
+                groups[label].add(aliases[label])
+            for allergen in groups[label] | {label}:
+                self.masks[allergen] = self.masks.get(allergen, 0) | (1 << position)
+
+        # A label name in a profile stands for its whole allergen group, so
+        # 'Dairy' covers milk and ghee just like 'milk' does
+        group_masks = dict(self.masks)
+        for label, label_groups in groups.items():
+            for group in label_groups:
+                self.masks[label] |= group_masks.get(group, 0)
+
+    def allergen_mask(self, allergen):
+        """
+        Bitmask of the labels one profile allergen covers; 0 if none.
+        Names not in the table are resolved through the synonym matcher,
+        so 'Eggs' or 'soya' work as well as 'egg' or 'soy'.
+        """
+        name = allergen.lower().strip()
+        mask = self.masks.get(name)
+        if mask is None:
+            mask = 0
+            for canonical in self._matcher.canonical_allergens(name):
+                mask |= self.masks.get(canonical, 0)
+        return mask
+
+    def profile_mask(self, allergens):
+        """
+        Returns:
+            tuple: (bitmask of all covered labels, allergens no label covers).
+        """
+        mask = 0
+        unchecked = []
+        for allergen in allergens:
+            allergen_mask = self.allergen_mask(allergen)
+            if not allergen_mask:
+                unchecked.append(allergen)
+            mask |= allergen_mask
+        return mask, unchecked
+
+    def predicted_bits(self, scores, threshold=0.5):
+        """
+        Bitmask of the labels above threshold, one per row of scores.
+        """
+        scores = np.atleast_2d(np.asarray(scores))
+        return (scores > threshold).astype(np.int64) @ self._bits
+
+    def labels_mask(self, labels):
+        """
+        Bitmask of the given label names, e.g. the keys of a cached
+        model_prediction.
+        """
+        positions = {label: position for position, label in enumerate(self.labels)}
+        return sum(1 << positions[label] for label in set(labels) if label in positions)
+
+    def labels_in(self, mask):
+        return [label for position, label in enumerate(self.labels) if mask >> position & 1]
@@ -1,11 +1,77 @@
-from transformers import BertTokenizer
 import numpy as np
-import tensorflow as tf
-import numpy as np
-import json
-import os
-from transformers import BertTokenizer
-tokenizer = BertTokenizer.from_pretrained("bert-base-uncased")
+import logging
+from util.token_cache import TokenCache, normalize_text
+from util.ecode_index import get_e_code_index
+from util.tokenizer import get_tokenizer
+
+logger = logging.getLogger(__name__)
+
+# Shared LRU cache of tokenized texts (popular products are scanned repeatedly)
+token_cache = TokenCache()
+
+
+def _tokenize_cached(texts, max_length, tokenizer):
+    """
+    Tokenize texts through the shared cache. Misses are tokenized together in
+    a single tokenizer call.
+    Returns:
+        tuple: input_ids, attention_mask, token_type_ids as (n, max_length) int32 arrays.
+    """
+    lowercase = getattr(tokenizer, 'do_lower_case', False)
+    name = getattr(tokenizer, 'name_or_path', '')
+    keys = [(normalize_text(text, lowercase), max_length, name) for text in texts]
+
+    rows = {}
+    missing = []
+    for key in keys:
+        if key in rows:
+            continue
+        cached = token_cache.get(key)
+        if cached is None:
+            rows[key] = None
+            missing.append(key)
+        else:
+            rows[key] = cached
+
+    if missing:
+        encoded = tokenizer(
+            [key[0] for key in missing],
+            max_length=max_length,
+            padding='max_length',
+            truncation=True,
+            return_tensors='np',
+            add_special_tokens=True
+        )
+        for i, key in enumerate(missing):
+            value = (
+                encoded['input_ids'][i].astype(np.int32),
+                encoded['attention_mask'][i].astype(np.int32),
+                encoded['token_type_ids'][i].astype(np.int32),
+            )
+            rows[key] = value
+            token_cache.put(key, value)
+
+    # np.stack copies, so callers may modify the returned arrays freely
+    return tuple(np.stack([rows[key][part] for key in keys]) for part in range(3))
+
+
+def lookup_e_code(e_code):
+    """
+    Map a request e_code to its model id using the in-memory e-code index.
+    Accepts spelling variants ('e 471', 'E471a') and several codes from one
+    label ('E471, E322'), in which case the first known one is used.
+    Returns None for missing or unknown codes.
+    """
+    if e_code is None or e_code == "":
+        return None
+    index = get_e_code_index()
+    e_code_int = index.lookup(e_code)
+    if e_code_int is None:
+        found = index.find_in_text(str(e_code))
+        if found:
+            e_code_int = found[0][1]
+    return e_code_int
+
 def preprocess_halal(
     text,
     e_code=None,
@@ -16,40 +82,32 @@ def preprocess_halal(
     """
     Preprocess input for Halal TFLite model with conservative bounds checking.
     """
-    # Load tokenizer if not provided
+    # Use the shared tokenizer if none is provided
     if tokenizer is None:
-        tokenizer = BertTokenizer.from_pretrained('bert-base-uncased')
+        tokenizer = get_tokenizer()
     
-    # Load e_code mapping
-    BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-    mapping_path = os.path.join(BASE_DIR, 'e_code_mapping.json')
-    with open(mapping_path) as f:
-        e_code_mapping = json.load(f)
-    
-    print(f"E-code mapping loaded with {len(e_code_mapping)} entries", flush=True)
-    print(f"E-code mapping range: {min(e_code_mapping.values())} to {max(e_code_mapping.values())}", flush=True)
+    # E-code mapping comes from the in-memory index (no file I/O per request)
+    e_code_index = get_e_code_index()
+    # Debug dumps below are skipped entirely unless DEBUG logging is enabled
+    debug = logger.isEnabledFor(logging.DEBUG)
+    if debug:
+        logger.debug("E-code mapping has %d entries, range %d to %d",
+                     len(e_code_index.mapping), e_code_index.min_value, e_code_index.max_value)
     
     # Validate and clean input text
     if not text or not text.strip():
         text = "unknown"  # Use a simple fallback
-        print(f"Empty text provided, using fallback: '{text}'", flush=True)
+        logger.debug("Empty text provided, using fallback: %r", text)
     
-    print(f"Processing text: '{text}'", flush=True)
+    logger.debug("Processing text: %r", text)
     
     # Tokenize text with extra safety
     try:
-        tokens = tokenizer(
-            text,
-            max_length=max_length,
-            padding='max_length',
-            truncation=True,
-            return_tensors='np',
-            add_special_tokens=True  # Ensure CLS and SEP tokens are added
-        )
-        input_ids = tokens['input_ids'].astype(np.int32)
-        attention_mask = tokens['attention_mask'].astype(np.int32)
+        input_ids, attention_mask, _ = _tokenize_cached([text], max_length, tokenizer)
         
-        print(f"Initial tokenization - shape: {input_ids.shape}, min/max: {input_ids.min()}/{input_ids.max()}", flush=True)
+        if debug:
+            logger.debug("Initial tokenization - shape: %s, min/max: %d/%d",
+                          input_ids.shape, input_ids.min(), input_ids.max())
         
         # Very conservative token ID bounds - use smaller range to be safe
         # Many TFLite models use smaller vocab sizes than full BERT
@@ -57,24 +115,21 @@ def preprocess_halal(
         
         # Replace any out-of-bounds tokens with [UNK] token
         unk_token_id = tokenizer.unk_token_id
-        print(f"UNK token ID: {unk_token_id}", flush=True)
         
         # Clip to safe range
         original_max = input_ids.max()
         input_ids = np.clip(input_ids, 0, MAX_SAFE_TOKEN_ID)
         if original_max > MAX_SAFE_TOKEN_ID:
-            print(f"Clipped token IDs from max {original_max} to {input_ids.max()}", flush=True)
+            logger.warning("Clipped token IDs from max %d to %d", original_max, input_ids.max())
         
         # Replace any remaining problematic tokens with UNK
         problematic_mask = input_ids > MAX_SAFE_TOKEN_ID
         if problematic_mask.any():
             input_ids[problematic_mask] = unk_token_id
-            print(f"Replaced {problematic_mask.sum()} tokens with UNK token", flush=True)
-        
-        print(f"Final input_ids - shape: {input_ids.shape}, min/max: {input_ids.min()}/{input_ids.max()}", flush=True)
+            logger.warning("Replaced %d tokens with UNK token", problematic_mask.sum())
         
     except Exception as e:
-        print(f"Tokenization error: {e}", flush=True)
+        logger.warning("Tokenization error, using fallback tokenization: %s", e)
         # Create minimal safe tokens
         input_ids = np.full((1, max_length), tokenizer.pad_token_id, dtype=np.int32)
         input_ids[0, 0] = tokenizer.cls_token_id  # [CLS]
@@ -82,35 +137,118 @@ def preprocess_halal(
         input_ids[0, 2] = tokenizer.sep_token_id  # [SEP]
         attention_mask = np.zeros((1, max_length), dtype=np.int32)
         attention_mask[0, :3] = 1
-        print(f"Used fallback tokenization", flush=True)
     
     # Handle e_code with very conservative bounds
-    if e_code is None or e_code == "" or e_code not in e_code_mapping:
+    e_code_int = lookup_e_code(e_code)
+    if e_code_int is None:
         e_code_int = 0  # Always use 0 for unknown
-        print(f"Using default e_code: 0", flush=True)
+        logger.debug("Using default e_code: 0")
     else:
-        e_code_int = e_code_mapping[e_code]
-        print(f"Found e_code '{e_code}' -> {e_code_int}", flush=True)
+        logger.debug("Found e_code %r -> %d", e_code, e_code_int)
         
         # Very conservative e_code bounds - many models expect small integers
         MAX_SAFE_ECODE = 500  # Conservative upper bound
         if e_code_int > MAX_SAFE_ECODE:
-            print(f"E-code {e_code_int} exceeds safe limit {MAX_SAFE_ECODE}, using 0", flush=True)
+            logger.warning("E-code %d exceeds safe limit %d, using 0", e_code_int, MAX_SAFE_ECODE)
             e_code_int = 0
         elif e_code_int < 0:
-            print(f"Negative e_code {e_code_int}, using 0", flush=True)
+            logger.warning("Negative e_code %d, using 0", e_code_int)
             e_code_int = 0
     
     e_code_input = np.array([[e_code_int]], dtype=np.int32)
     
     # Final validation
-    print(f"Final preprocessing results:", flush=True)
-    print(f"  input_ids: shape={input_ids.shape}, range=[{input_ids.min()}, {input_ids.max()}]", flush=True)
-    print(f"  attention_mask: shape={attention_mask.shape}, sum={attention_mask.sum()}", flush=True)
-    print(f"  e_code_input: shape={e_code_input.shape}, value={e_code_input[0][0]}", flush=True)
+    if debug:
+        logger.debug("Final preprocessing results: input_ids shape=%s range=[%d, %d], "
+                     "attention_mask sum=%d, e_code_input=%d",
+                     input_ids.shape, input_ids.min(), input_ids.max(),
+                     attention_mask.sum(), e_code_input[0][0])
     
     return input_ids, attention_mask, e_code_input
 
+def preprocess_halal_batch(
+    texts,
+    e_codes=None,
+    tokenizer=None,
+    max_length=128
+):
+    """
+    Batch version of preprocess_halal: tokenizes all texts in one call.
+    Args:
+        texts (list of str): Input texts.
+        e_codes (list of str or None): One e-code (or None) per text.
+        max_length (int): Maximum sequence length.
+    Returns:
+        tuple: input_ids (n, max_length), attention_mask (n, max_length), e_code_input (n, 1)
+    """
+    if tokenizer is None:
+        tokenizer = get_tokenizer()
+    if e_codes is None:
+        e_codes = [None] * len(texts)
+
+    # Same fallback as preprocess_halal for empty texts
+    texts = [text if text and text.strip() else "unknown" for text in texts]
+    input_ids, attention_mask, _ = _tokenize_cached(texts, max_length, tokenizer)
+    input_ids = np.clip(input_ids, 0, 30000)
+
+    return input_ids, attention_mask, _e_code_input(e_codes)
+
+
+def e_code_value(e_code):
+    """
+    The e-code id the halal model is fed for a request e_code. Unknown or
+    out-of-range e-codes map to 0, as in preprocess_halal.
+    """
+    e_code_int = lookup_e_code(e_code) or 0
+    if e_code_int > 500 or e_code_int < 0:
+        e_code_int = 0
+    return e_code_int
+
+
+def _e_code_input(e_codes):
+    return np.array([e_code_value(e_code) for e_code in e_codes], dtype=np.int32).reshape(-1, 1)
+
+
+def cache_key_text(text):
+    """
+    Normalize a text the way the tokenization cache does, so texts that
+    tokenize identically share result cache entries too.
+    """
+    return normalize_text(text or '', getattr(get_tokenizer(), 'do_lower_case', False))
+
+
+def preprocess_shared(texts, e_codes=None, tokenizer=None, max_length=128):
+    """
+    Inputs for both the allergen and the halal model from one tokenizer call.
+    The results are identical to preprocess() and preprocess_halal_batch()
+    on the same texts.
+    Args:
+        texts (list of str): Input texts.
+        e_codes (list of str or None): One e-code (or None) per text.
+        max_length (int): Maximum sequence length.
+    Returns:
+        tuple: (input_word_ids, input_mask, input_type_ids) for the allergen
+            model and (input_ids, attention_mask, e_code_input) for the halal model.
+    """
+    if tokenizer is None:
+        tokenizer = get_tokenizer()
+    if e_codes is None:
+        e_codes = [None] * len(texts)
+
+    # The halal model sees "unknown" for empty texts; tokenize it in the same call
+    blank = [i for i, text in enumerate(texts) if not text or not text.strip()]
+    input_ids, attention_mask, type_ids = _tokenize_cached(
+        list(texts) + (["unknown"] if blank else []), max_length, tokenizer
+    )
+    allergen_inputs = (input_ids[:len(texts)], attention_mask[:len(texts)], type_ids[:len(texts)])
+
+    halal_ids = np.clip(input_ids[:len(texts)], 0, 30000)
+    halal_mask = attention_mask[:len(texts)].copy()
+    if blank:
+        halal_ids[blank] = np.clip(input_ids[-1], 0, 30000)
+        halal_mask[blank] = attention_mask[-1]
+    return allergen_inputs, (halal_ids, halal_mask, _e_code_input(e_codes))
+
 # Example usage:
 # input_ids, attention_mask, e_code_input = preprocess_halal_input("Sample ingredient")
 # input_ids, attention_mask, e_code_input = preprocess_halal_input("Sample ingredient", "E100")
@@ -129,20 +267,6 @@ def preprocess(texts, max_length=128):
     if isinstance(texts, str):
         texts = [texts]
 
-        
-    if tokenizer is not None:
-        print("@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@")
-    # Tokenize using HuggingFace tokenizer
-    encoded = tokenizer(
-        texts,
-        padding='max_length',
-        truncation=True,
-        max_length=max_length,
-        return_tensors='np'  # Return NumPy arrays
-    )
-    # Ensure correct dtype
-    return (
-        encoded['input_ids'].astype('int32'),
-        encoded['attention_mask'].astype('int32'),
-        encoded['token_type_ids'].astype('int32'),
-    )
+
+    # Tokenize using the shared tokenizer, skipping texts already in the cache
+    return _tokenize_cached(texts, max_length, get_tokenizer())
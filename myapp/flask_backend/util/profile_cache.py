@@ -0,0 +1,149 @@
+import os
+import time
+import uuid
+import threading
+
+from util.metrics import REGISTRY
+from util.ttl_cache import TTLCache, SQLiteStore, TieredCache
+
+# Allergen profile caching: TTL in seconds (0 turns the cache off), in-process
+# entry limit, and an optional SQLite file shared by all workers on the host.
+# With several worker processes the shared file is required, or a write only
+# reaches the worker that served it (gunicorn.conf.py creates one).
+PROFILE_CACHE_TTL = float(os.environ.get('PROFILE_CACHE_TTL', 300))
+PROFILE_CACHE_SIZE = int(os.environ.get('PROFILE_CACHE_SIZE', 10000))
+PROFILE_CACHE_DB = os.environ.get('PROFILE_CACHE_DB', '')
+# How often (seconds) a worker checks the shared store for writes made by other workers
+PROFILE_CACHE_SYNC_INTERVAL = float(os.environ.get('PROFILE_CACHE_SYNC_INTERVAL', 1.0))
+
+PROFILE_CACHE_EVENTS = REGISTRY.counter(
+    'nutriguard_profile_cache_events_total',
+    'Allergen profile cache invalidations, discarded loads and cross-worker resyncs.',
+    ('event',),
+)
+
+# Key in the shared store that changes on every profile write
+_GENERATION_KEY = 'profiles:generation'
+
+
+def _key(user_id):
+    # Prefixed so the store can be shared with other caches
+    return f'profile:{user_id}'
+
+
+def _version_key(user_id):
+    return f'profile-version:{user_id}'
+
+
+class ProfileCache:
+    """
+    Read-through cache of user allergen profiles.
+
+    Lookups go through a TieredCache (in-process LRU, then the shared SQLite
+    store when configured), and only misses reach the database. Writes do
+    not fill the cache; they invalidate the user's entry and bump a
+    per-user version, and a load only stays cached if that version did not
+    change while it ran, so a read racing a write cannot put the old
+    profile back. Writes also bump a generation token in the shared store;
+    every worker checks it at most once per sync interval and drops its
+    in-process entries when another worker has written.
+    """
+
+    def __init__(self, loader, ttl=PROFILE_CACHE_TTL, max_entries=PROFILE_CACHE_SIZE,
+                 cache_db=PROFILE_CACHE_DB, sync_interval=PROFILE_CACHE_SYNC_INTERVAL):
+        """
+        Args:
+            loader (callable): loader(user_id) returning the allergen list,
+                or None for an unknown user (not cached).
+        """
+        self.loader = loader
+        self.enabled = ttl > 0
+        self.sync_interval = sync_interval
+        disk = SQLiteStore(cache_db, ttl=ttl) if cache_db and self.enabled else None
+        self.cache = TieredCache('user_profiles', TTLCache(max_entries=max_entries, ttl=ttl), disk)
+        self._lock = threading.Lock()
+        self._generation = disk.get(_GENERATION_KEY) if disk is not None else None
+        self._next_sync = 0.0
+        # Per-user write versions when there is no shared store; an evicted
+        # version only makes a racing load be discarded
+        self._versions = TTLCache(max_entries=max_entries, ttl=ttl)
+        self.hits = 0
+        self.misses = 0
+
+    def _sync(self):
+        # Drop local entries if another worker has written since the last check
+        if self.cache.disk is None:
+            return
+        now = time.monotonic()
+        with self._lock:
+            if now < self._next_sync:
+                return
+            self._next_sync = now + self.sync_interval
+        generation = self.cache.disk.get(_GENERATION_KEY)
+        with self._lock:
+            changed = generation != self._generation
+            self._generation = generation
+        if changed:
+            self.cache.memory.clear()
+            PROFILE_CACHE_EVENTS.inc(event='resync')
+
+    def _version(self, user_id):
+        if self.cache.disk is not None:
+            return self.cache.disk.get(_version_key(user_id))
+        return self._versions.get(_version_key(user_id))
+
+    def get(self, user_id):
+        """
+        Return the allergen list of a user, loading it on a miss.
+        """
+        if not self.enabled:
+            return self.loader(user_id)
+        self._sync()
+        key = _key(user_id)
+        value = self.cache.get(key)
+        if value is not None:
+            with self._lock:
+                self.hits += 1
+            return value
+
+        with self._lock:
+            self.misses += 1
+        version = self._version(user_id)
+        value = self.loader(user_id)
+        if value is not None:
+            self.cache.set(key, value)
+            # A write that landed during the load may have been read before
+            # its commit; drop what was just cached. A write after this check
+            # deletes the entry itself.
+            if self._version(user_id) != version:
+                self.cache.delete(key)
+                PROFILE_CACHE_EVENTS.inc(event='discarded_load')
+        return value
+
+    def invalidate(self, user_id):
+        """
+        Forget one user's profile; call after the database commit of a write.
+        """
+        if not self.enabled:
+            return
+        version = uuid.uuid4().hex
+        if self.cache.disk is not None:
+            self.cache.disk.set(_version_key(user_id), version)
+            self.cache.disk.set(_GENERATION_KEY, uuid.uuid4().hex, ttl=None)
+        else:
+            self._versions.set(_version_key(user_id), version)
+        self.cache.delete(_key(user_id))
+        PROFILE_CACHE_EVENTS.inc(event='invalidate')
+
+    def stats(self):
+        with self._lock:
+            hits, misses = self.hits, self.misses
+        total = hits + misses
+        return {
+            'enabled': self.enabled,
+            'shared': self.cache.disk is not None,
+            'entries': len(self.cache.memory),
+            'hits': hits,
+            'misses': misses,
+            'hit_rate': hits / total if total else 0.0,
+        }
@@ -0,0 +1,88 @@
+import os
+import hashlib
+import threading
+
+from util.ttl_cache import TTLCache, SQLiteStore, TieredCache
+
+# Response caching for /predict and /halal_check: on/off, in-process entry
+# limit, TTL in seconds (0 keeps entries until evicted) and an optional
+# SQLite file that survives restarts and is shared between workers
+RESULT_CACHE_ENABLED = os.environ.get('RESULT_CACHE', '1').lower() in ('1', 'true', 'yes')
+RESULT_CACHE_SIZE = int(os.environ.get('RESULT_CACHE_SIZE', 10000))
+RESULT_CACHE_TTL = float(os.environ.get('RESULT_CACHE_TTL', 7 * 24 * 3600)) or None
+RESULT_CACHE_DB = os.environ.get('RESULT_CACHE_DB', '')
+RESULT_CACHE_DB_SIZE = int(os.environ.get('RESULT_CACHE_DB_SIZE', 200000))
+
+# Bump when the cached response format changes, so old disk entries are ignored
+RESULT_CACHE_VERSION = 1
+
+
+class ResultCache:
+    """
+    Content-addressed cache of final JSON responses.
+
+    Keys are SHA-256 digests of the endpoint, the fingerprint of the loaded
+    model file, the other settings that change outputs (sequence length,
+    buckets, tokenizer) and the normalized inputs, so identical scans share
+    one entry and a new model version or configuration never sees results
+    of the old one. The key doubles as the response's ETag.
+
+    Fingerprints and settings are read when the process starts, so a model
+    or vocabulary replaced on disk only gets new keys after a restart; until
+    then the old responses and ETags are served.
+    """
+
+    def __init__(self, name='results', enabled=RESULT_CACHE_ENABLED, max_entries=RESULT_CACHE_SIZE,
+                 ttl=RESULT_CACHE_TTL, cache_db=RESULT_CACHE_DB):
+        self.enabled = enabled
+        disk = SQLiteStore(cache_db, ttl=ttl, max_entries=RESULT_CACHE_DB_SIZE) if cache_db and enabled else None
+        self.cache = TieredCache(name, TTLCache(max_entries=max_entries, ttl=ttl), disk)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(endpoint, model_fingerprint, *inputs):
+        """
+        Args:
+            inputs: Inference settings and request inputs, as strings or numbers.
+        Returns:
+            str: Hex digest identifying one response.
+        """
+        parts = [str(RESULT_CACHE_VERSION), endpoint, model_fingerprint] + [str(value) for value in inputs]
+        return hashlib.sha256('\x1f'.join(parts).encode('utf-8')).hexdigest()
+
+    def get_or_compute(self, key, compute):
+        """
+        Return the cached response for key, or compute() it once and cache
+        it. Concurrent requests for the same key wait for one computation.
+        Callers must not modify the returned dict.
+        """
+        if not self.enabled:
+            return compute()
+        computed = []
+
+        def load():
+            computed.append(True)
+            return compute()
+
+        value = self.cache.get_or_load(key, load)
+        with self._lock:
+            if computed:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return value
+
+    def stats(self):
+        with self._lock:
+            hits, misses = self.hits, self.misses
+        total = hits + misses
+        return {
+            'enabled': self.enabled,
+            'persistent': self.cache.disk is not None,
+            'entries': len(self.cache.memory),
+            'hits': hits,
+            'misses': misses,
+            'hit_rate': hits / total if total else 0.0,
+        }
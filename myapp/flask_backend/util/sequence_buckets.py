@@ -0,0 +1,60 @@
+import os
+
+import numpy as np
+
+# Sequence lengths texts are padded to, e.g. SEQUENCE_BUCKETS=32,64,128.
+# Empty (the default) pads everything to the full max_length as before.
+SEQUENCE_BUCKETS = os.environ.get('SEQUENCE_BUCKETS', '')
+
+
+def parse_buckets(value, max_length):
+    """
+    Parse a comma-separated bucket list. Buckets above max_length are
+    dropped and max_length itself is always the last bucket, so every text
+    fits somewhere.
+    Returns:
+        tuple: Sorted bucket lengths; empty if bucketing is off.
+    """
+    if isinstance(value, str):
+        value = [part for part in value.replace(' ', '').split(',') if part]
+    buckets = sorted({int(length) for length in value if 0 < int(length) < max_length})
+    return tuple(buckets + [max_length]) if buckets else ()
+
+
+def split_by_bucket(attention_mask, buckets):
+    """
+    Group rows by the smallest bucket their tokens fit in.
+    Args:
+        attention_mask (np.ndarray): (n, max_length) mask; its row sums are the token counts.
+        buckets (tuple): Sorted bucket lengths from parse_buckets.
+    Returns:
+        list: (bucket length, row indices) for every bucket that has rows.
+    """
+    lengths = attention_mask.sum(axis=1)
+    positions = np.minimum(np.searchsorted(buckets, lengths, side='left'), len(buckets) - 1)
+    groups = []
+    for position, length in enumerate(buckets):
+        rows = np.nonzero(positions == position)[0]
+        if len(rows):
+            groups.append((length, rows))
+    return groups
+
+
+def trim_inputs(inputs, rows, length, max_length):
+    """
+    Select rows of every input and cut sequence inputs (those whose second
+    dimension is max_length) down to `length` columns.
+    Args:
+        inputs (list or dict): Input arrays with the batch as first dimension.
+    Returns:
+        Same container type with the trimmed arrays.
+    """
+    def trim(array):
+        array = array[rows]
+        if array.ndim == 2 and array.shape[1] == max_length:
+            array = np.ascontiguousarray(array[:, :length])
+        return array
+
+    if isinstance(inputs, dict):
+        return {name: trim(array) for name, array in inputs.items()}
+    return [trim(array) for array in inputs]
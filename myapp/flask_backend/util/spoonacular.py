@@ -0,0 +1,107 @@
+import os
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from util.ttl_cache import TTLCache, SQLiteStore, TieredCache
+
+logger = logging.getLogger(__name__)
+
+# Upstream base URL (point it at a local stub server for benchmarks)
+SPOONACULAR_BASE_URL = os.environ.get('SPOONACULAR_BASE_URL', 'https://api.spoonacular.com')
+# Per-call timeout in seconds
+SPOONACULAR_TIMEOUT = float(os.environ.get('SPOONACULAR_TIMEOUT', 5))
+# Recipe detail requests run at the same time
+SPOONACULAR_MAX_WORKERS = int(os.environ.get('SPOONACULAR_MAX_WORKERS', 10))
+
+# Response caching: TTLs in seconds, in-process entry limit, optional SQLite
+# file (one table and one entry limit per cache)
+SPOONACULAR_SEARCH_TTL = float(os.environ.get('SPOONACULAR_SEARCH_TTL', 6 * 3600))
+SPOONACULAR_DETAIL_TTL = float(os.environ.get('SPOONACULAR_DETAIL_TTL', 7 * 24 * 3600))
+SPOONACULAR_CACHE_SIZE = int(os.environ.get('SPOONACULAR_CACHE_SIZE', 2048))
+SPOONACULAR_CACHE_DB = os.environ.get('SPOONACULAR_CACHE_DB', '')
+SPOONACULAR_CACHE_DB_SIZE = int(os.environ.get('SPOONACULAR_CACHE_DB_SIZE', 100000))
+
+
+def _make_cache(name, ttl, cache_db=SPOONACULAR_CACHE_DB):
+    # Own table, so pruning one cache never evicts entries of the other
+    disk = SQLiteStore(cache_db, ttl=ttl, max_entries=SPOONACULAR_CACHE_DB_SIZE, table=name) if cache_db else None
+    return TieredCache(name, TTLCache(max_entries=SPOONACULAR_CACHE_SIZE, ttl=ttl), disk)
+
+
+class SpoonacularClient:
+    """
+    Spoonacular API client over a shared keep-alive session.
+    Recipe details are fetched concurrently on a small thread pool, and both
+    search results and recipe details are cached with TTLs.
+    """
+
+    def __init__(self, api_key, base_url=SPOONACULAR_BASE_URL, timeout=SPOONACULAR_TIMEOUT,
+                 max_workers=SPOONACULAR_MAX_WORKERS, cache_db=SPOONACULAR_CACHE_DB):
+        self.api_key = api_key
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+        self.session = requests.Session()
+        # Keep enough pooled connections for every concurrent detail fetch
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_workers)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='spoonacular')
+        self.search_cache = _make_cache('spoonacular_search', SPOONACULAR_SEARCH_TTL, cache_db)
+        self.detail_cache = _make_cache('spoonacular_detail', SPOONACULAR_DETAIL_TTL, cache_db)
+
+    def _get(self, path, **params):
+        params['apiKey'] = self.api_key
+        return self.session.get(f"{self.base_url}{path}", params=params, timeout=self.timeout)
+
+    def search_recipes(self, exclude_terms=(), number=10):
+        """
+        Run complexSearch excluding the given ingredient terms. Results are
+        cached per sorted exclude list, so the same allergen set in any order
+        shares one entry.
+        Returns:
+            list: The 'results' list of the response.
+        Raises:
+            requests.RequestException: On network errors, timeouts or non-2xx responses.
+        """
+        exclude = ','.join(sorted(set(exclude_terms)))
+        key = f"search:{number}:{exclude}"
+        return self.search_cache.get_or_load(key, lambda: self._search(exclude, number))
+
+    def _search(self, exclude, number):
+        params = {'number': number}
+        if exclude:
+            params['excludeIngredients'] = exclude
+        response = self._get('/recipes/complexSearch', **params)
+        response.raise_for_status()
+        return response.json().get('results', [])
+
+    def recipe_information(self, recipe_id):
+        """
+        Fetch one recipe's details (cached by recipe id).
+        Returns None if the call fails or times out.
+        """
+        return self.detail_cache.get_or_load(
+            f"recipe:{recipe_id}", lambda: self._recipe_information(recipe_id)
+        )
+
+    def _recipe_information(self, recipe_id):
+        try:
+            response = self._get(f'/recipes/{recipe_id}/information')
+        except requests.RequestException as e:
+            logger.warning("Spoonacular detail request for %s failed: %s", recipe_id, e)
+            return None
+        if response.status_code != 200:
+            return None
+        return response.json()
+
+    def recipe_information_many(self, recipe_ids):
+        """
+        Fetch several recipes' details concurrently.
+        Returns:
+            dict: recipe id -> details (None for recipes that could not be fetched).
+        """
+        recipe_ids = list(recipe_ids)
+        return dict(zip(recipe_ids, self._executor.map(self.recipe_information, recipe_ids)))
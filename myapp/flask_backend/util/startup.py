@@ -0,0 +1,100 @@
+import os
+import time
+import threading
+
+# Import this module first so the clock starts before the heavy imports
+PROCESS_START = time.perf_counter()
+
+
+def rss_bytes():
+    """
+    Resident set size of this process in bytes (0 if it cannot be read).
+    """
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    try:
+        import resource
+        # ru_maxrss is the peak, in kilobytes on Linux and bytes on macOS
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if os.uname().sysname == 'Darwin' else peak * 1024
+    except (ImportError, AttributeError):
+        return 0
+
+
+def memory_breakdown():
+    """
+    Memory of this process from /proc/self/smaps_rollup, in bytes: 'rss',
+    'pss' (shared pages divided among the processes sharing them), 'shared'
+    and 'private' (pages only this process uses, i.e. what a forked worker
+    adds on top of its parent). Only 'rss' is available off Linux.
+    """
+    fields = {}
+    try:
+        with open('/proc/self/smaps_rollup') as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) == 3 and parts[2] == 'kB':
+                    fields[parts[0].rstrip(':')] = int(parts[1]) * 1024
+    except OSError:
+        return {'rss': rss_bytes()}
+    return {
+        'rss': fields.get('Rss', 0),
+        'pss': fields.get('Pss', 0),
+        'shared': fields.get('Shared_Clean', 0) + fields.get('Shared_Dirty', 0),
+        'private': fields.get('Private_Clean', 0) + fields.get('Private_Dirty', 0),
+    }
+
+
+class StartupState:
+    """
+    Records how long each startup stage took and the RSS after it, and
+    whether the service is ready to serve.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stages = []
+        self._last = PROCESS_START
+        self.ready = False
+        self.error = None
+        self.time_to_ready = None
+
+    def mark(self, stage):
+        """
+        Record that a stage has just finished.
+        """
+        now = time.perf_counter()
+        with self._lock:
+            self._stages.append({
+                'stage': stage,
+                'seconds': now - self._last,
+                'since_start': now - PROCESS_START,
+                'rss_bytes': rss_bytes(),
+            })
+            self._last = now
+
+    def set_ready(self):
+        self.mark('ready')
+        self.time_to_ready = time.perf_counter() - PROCESS_START
+        self.ready = True
+
+    def set_failed(self, error):
+        self.mark('failed')
+        self.error = str(error)
+
+    def as_dict(self):
+        with self._lock:
+            stages = list(self._stages)
+        return {
+            'ready': self.ready,
+            'error': self.error,
+            'time_to_ready_seconds': self.time_to_ready,
+            'pid': os.getpid(),
+            'memory': memory_breakdown(),
+            'stages': stages,
+        }
@@ -0,0 +1,86 @@
+import os
+import sys
+import threading
+from collections import OrderedDict
+
+# Upper bounds for the tokenization cache (bytes of cached arrays + keys, entries)
+DEFAULT_MAX_BYTES = int(os.environ.get('TOKEN_CACHE_MAX_BYTES', 64 * 1024 * 1024))
+DEFAULT_MAX_ENTRIES = int(os.environ.get('TOKEN_CACHE_MAX_ENTRIES', 100000))
+
+
+def normalize_text(text, lowercase=True):
+    """
+    Normalize text for use as a cache key. Collapsing whitespace (and
+    lowercasing for uncased vocabularies) does not change BERT tokenization.
+    """
+    text = ' '.join(text.split())
+    return text.lower() if lowercase else text
+
+
+class TokenCache:
+    """
+    Bounded, thread-safe LRU cache of tokenized texts.
+
+    Values are tuples of 1-D int32 arrays (input_ids, attention_mask,
+    token_type_ids) ready to be stacked into a model input. The cache is
+    bounded both by entry count and by the memory held by keys and arrays.
+    """
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES, max_entries=DEFAULT_MAX_ENTRIES):
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def _size(key, value):
+        return sys.getsizeof(key[0]) + sum(array.nbytes for array in value)
+
+    def get(self, key):
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        size = self._size(key, value)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= self._size(key, old)
+            self._entries[key] = value
+            self._bytes += size
+            # Evict least recently used entries until within both bounds
+            while self._bytes > self.max_bytes or len(self._entries) > self.max_entries:
+                old_key, old_value = self._entries.popitem(last=False)
+                self._bytes -= self._size(old_key, old_value)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+            }
@@ -0,0 +1,108 @@
+import os
+import sys
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# WordPiece vocabulary bundled next to the models, so startup needs no network
+TOKENIZER_VOCAB_PATH = os.environ.get('TOKENIZER_VOCAB_PATH', os.path.join(BASE_DIR, 'model', 'vocab.txt'))
+# Hugging Face model used when the bundled vocabulary is missing
+TOKENIZER_PRETRAINED = os.environ.get('TOKENIZER_PRETRAINED', 'bert-base-uncased')
+# Tokenizer implementation; all of them produce the same ids:
+#   bert      - transformers.BertTokenizer (pure Python)
+#   fast      - transformers.BertTokenizerFast (Rust 'tokenizers'), falls back to bert
+#   wordpiece - util.wordpiece.WordPieceTokenizer (trie + per-word memo)
+TOKENIZER_BACKEND = os.environ.get('TOKENIZER_BACKEND', 'bert').lower()
+TOKENIZER_BACKENDS = ('bert', 'fast', 'wordpiece')
+
+_tokenizers = {}
+_lock = threading.Lock()
+
+
+def _read_vocab(path):
+    # One token per line, ids in line order (the format export_vocab writes)
+    with open(path, encoding='utf-8') as f:
+        return {line.rstrip('\n'): index for index, line in enumerate(f)}
+
+
+def _load_bert(cls_name):
+    # transformers is only imported when the tokenizer is first needed
+    import transformers
+
+    cls = getattr(transformers, cls_name)
+    if os.path.exists(TOKENIZER_VOCAB_PATH):
+        logger.info("Loading %s vocabulary from %s", cls_name, TOKENIZER_VOCAB_PATH)
+        vocab = _read_vocab(TOKENIZER_VOCAB_PATH)
+        if int(transformers.__version__.split('.')[0]) >= 5:
+            # transformers 5 ignores vocab_file and would build a tokenizer
+            # that maps everything to [UNK]; it takes the vocabulary itself
+            tokenizer = cls(vocab=vocab, do_lower_case=True)
+        else:
+            tokenizer = cls(vocab_file=TOKENIZER_VOCAB_PATH, do_lower_case=True)
+        if tokenizer.vocab_size != len(vocab):
+            raise RuntimeError(
+                f"{cls_name} loaded {tokenizer.vocab_size} tokens from {TOKENIZER_VOCAB_PATH}, "
+                f"which has {len(vocab)} (transformers {transformers.__version__})"
+            )
+        return tokenizer
+    logger.warning("No bundled vocabulary at %s, loading '%s' from the Hugging Face cache "
+                   "(run 'python -m util.tokenizer' to bundle it)", TOKENIZER_VOCAB_PATH, TOKENIZER_PRETRAINED)
+    return cls.from_pretrained(TOKENIZER_PRETRAINED)
+
+
+def _load(backend):
+    if backend == 'fast':
+        try:
+            return _load_bert('BertTokenizerFast')
+        except ImportError as e:
+            logger.warning("Fast tokenizer unavailable (%s), using BertTokenizer", e)
+            return _load_bert('BertTokenizer')
+    if backend == 'wordpiece':
+        from util.wordpiece import WordPieceTokenizer
+
+        if os.path.exists(TOKENIZER_VOCAB_PATH):
+            return WordPieceTokenizer.from_file(TOKENIZER_VOCAB_PATH)
+        return WordPieceTokenizer(_load_bert('BertTokenizer').vocab)
+    return _load_bert('BertTokenizer')
+
+
+def get_tokenizer(backend=None):
+    """
+    Return the process-wide tokenizer for a backend (TOKENIZER_BACKEND by
+    default), loading it on first use.
+    """
+    backend = (backend or TOKENIZER_BACKEND).lower()
+    if backend not in TOKENIZER_BACKENDS:
+        raise ValueError(f"Unknown tokenizer backend '{backend}', expected one of {TOKENIZER_BACKENDS}")
+    tokenizer = _tokenizers.get(backend)
+    if tokenizer is None:
+        with _lock:
+            tokenizer = _tokenizers.get(backend)
+            if tokenizer is None:
+                tokenizer = _tokenizers[backend] = _load(backend)
+    return tokenizer
+
+
+def export_vocab(path=TOKENIZER_VOCAB_PATH, pretrained=TOKENIZER_PRETRAINED):
+    """
+    Write the vocabulary of a pretrained tokenizer to `path` so it can be
+    bundled with the models.
+    """
+    from transformers import BertTokenizer
+
+    tokenizer = BertTokenizer.from_pretrained(pretrained)
+    # Written in id order, one token per line, as BertTokenizer(vocab_file=...) expects
+    tokens = sorted(tokenizer.vocab.items(), key=lambda item: item[1])
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        for token, _ in tokens:
+            f.write(token + '\n')
+    return path
+
+
+if __name__ == '__main__':
+    # Usage: python -m util.tokenizer [output path]
+    print(f"Wrote {export_vocab(*sys.argv[1:2])}")
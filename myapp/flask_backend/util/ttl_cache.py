@@ -0,0 +1,221 @@
+import os
+import re
+import json
+import time
+import sqlite3
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+
+from util.metrics import REGISTRY
+
+CACHE_REQUESTS = REGISTRY.counter(
+    'nutriguard_cache_requests_total',
+    'Cache lookups by cache name and result (memory_hit, disk_hit, miss).',
+    ('cache', 'result'),
+)
+
+_MISSING = object()
+
+
+class TTLCache:
+    """
+    Thread-safe in-process LRU cache whose entries expire after `ttl` seconds.
+    A ttl of None keeps entries until they are evicted.
+    """
+
+    def __init__(self, max_entries=1024, ttl=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return default
+            expires, value = entry
+            if expires is not None and expires < time.time():
+                del self._entries[key]
+                return default
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=_MISSING):
+        ttl = self.ttl if ttl is _MISSING else ttl
+        expires = time.time() + ttl if ttl is not None else None
+        with self._lock:
+            self._entries[key] = (expires, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class SQLiteStore:
+    """
+    On-disk cache of JSON-serializable values in a SQLite file, with TTLs and
+    a size limit. Safe to share between threads and between processes.
+    Caches sharing one file should use their own `table`, so that each
+    keeps its own size limit.
+    """
+
+    def __init__(self, path, ttl=None, max_entries=100000, table='cache'):
+        if not re.fullmatch(r'[A-Za-z_][A-Za-z0-9_]*', table):
+            raise ValueError(f"Invalid table name '{table}'")
+        self.path = path
+        self.table = table
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._writes = 0
+        self._connect()
+        # SQLite connections must not be used across fork(); children reconnect
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._after_fork)
+
+    def _after_fork(self):
+        self._lock = threading.Lock()
+        self._connect()
+
+    def _connect(self):
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, timeout=5)
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                f"CREATE TABLE IF NOT EXISTS {self.table} ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires REAL, accessed REAL NOT NULL)"
+            )
+            self._conn.commit()
+
+    def get(self, key, default=None):
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT value, expires FROM {self.table} WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return default
+            value, expires = row
+            if expires is not None and expires < now:
+                self._conn.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+                self._conn.commit()
+                return default
+            self._conn.execute(f"UPDATE {self.table} SET accessed = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+        return json.loads(value)
+
+    def set(self, key, value, ttl=_MISSING):
+        ttl = self.ttl if ttl is _MISSING else ttl
+        now = time.time()
+        expires = now + ttl if ttl is not None else None
+        with self._lock:
+            self._conn.execute(
+                f"INSERT OR REPLACE INTO {self.table} (key, value, expires, accessed) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value), expires, now),
+            )
+            self._writes += 1
+            # Enforce the size limit every 100 writes rather than on every one
+            if self._writes % 100 == 0:
+                self._prune(now)
+            self._conn.commit()
+
+    def _prune(self, now):
+        self._conn.execute(f"DELETE FROM {self.table} WHERE expires IS NOT NULL AND expires < ?", (now,))
+        self._conn.execute(
+            f"DELETE FROM {self.table} WHERE key IN ("
+            f"SELECT key FROM {self.table} ORDER BY accessed DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,),
+        )
+
+    def delete(self, key):
+        with self._lock:
+            self._conn.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+            self._conn.commit()
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute(f"DELETE FROM {self.table}")
+            self._conn.commit()
+
+
+class TieredCache:
+    """
+    Two-level cache: an in-process TTLCache in front of an optional SQLiteStore.
+
+    get_or_load() de-duplicates concurrent misses for the same key, so only
+    one caller runs the loader while the others wait for its result.
+    """
+
+    def __init__(self, name, memory, disk=None):
+        self.name = name
+        self.memory = memory
+        self.disk = disk
+        self._inflight = {}
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        value = self.memory.get(key, _MISSING)
+        if value is not _MISSING:
+            CACHE_REQUESTS.inc(cache=self.name, result='memory_hit')
+            return value
+        if self.disk is not None:
+            value = self.disk.get(key, _MISSING)
+            if value is not _MISSING:
+                CACHE_REQUESTS.inc(cache=self.name, result='disk_hit')
+                self.memory.set(key, value)
+                return value
+        CACHE_REQUESTS.inc(cache=self.name, result='miss')
+        return default
+
+    def set(self, key, value):
+        self.memory.set(key, value)
+        if self.disk is not None:
+            self.disk.set(key, value)
+
+    def delete(self, key):
+        self.memory.delete(key)
+        if self.disk is not None:
+            self.disk.delete(key)
+
+    def get_or_load(self, key, loader):
+        """
+        Return the cached value for key, or call loader() once to produce it.
+        Results of None are returned but not cached; exceptions are passed to
+        every waiting caller and not cached either.
+        """
+        value = self.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+
+        with self._lock:
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = self._inflight[key] = Future()
+        if not leader:
+            return future.result()
+
+        try:
+            value = loader()
+            if value is not None:
+                self.set(key, value)
+            future.set_result(value)
+            return value
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
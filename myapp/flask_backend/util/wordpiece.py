@@ -0,0 +1,252 @@
+import re
+import threading
+import unicodedata
+
+import numpy as np
+
+SPECIAL_TOKENS = ('[UNK]', '[SEP]', '[PAD]', '[CLS]', '[MASK]')
+# Words longer than this become [UNK], as in BertTokenizer
+MAX_INPUT_CHARS_PER_WORD = 100
+# Distinct words whose WordPiece ids are memoized
+DEFAULT_MEMO_SIZE = 100000
+
+
+def _is_whitespace(char):
+    if char in (' ', '\t', '\n', '\r'):
+        return True
+    return unicodedata.category(char) == 'Zs'
+
+
+def _is_control(char):
+    if char in ('\t', '\n', '\r'):
+        return False
+    return unicodedata.category(char).startswith('C')
+
+
+def _is_punctuation(char):
+    cp = ord(char)
+    # All non-letter/number ASCII is treated as punctuation, like BERT does
+    if 33 <= cp <= 47 or 58 <= cp <= 64 or 91 <= cp <= 96 or 123 <= cp <= 126:
+        return True
+    return unicodedata.category(char).startswith('P')
+
+
+def _is_chinese_char(cp):
+    return (0x4E00 <= cp <= 0x9FFF or 0x3400 <= cp <= 0x4DBF or 0x20000 <= cp <= 0x2A6DF
+            or 0x2A700 <= cp <= 0x2B73F or 0x2B740 <= cp <= 0x2B81F or 0x2B820 <= cp <= 0x2CEAF
+            or 0xF900 <= cp <= 0xFAFF or 0x2F800 <= cp <= 0x2FA1F)
+
+
+class _Trie:
+    """
+    Character trie over vocabulary pieces, for longest-prefix lookups.
+    """
+
+    def __init__(self):
+        self._children = [{}]
+        self._ids = [None]
+
+    def add(self, piece, token_id):
+        node = 0
+        for char in piece:
+            nxt = self._children[node].get(char)
+            if nxt is None:
+                nxt = len(self._children)
+                self._children[node][char] = nxt
+                self._children.append({})
+                self._ids.append(None)
+            node = nxt
+        self._ids[node] = token_id
+
+    def longest_prefix(self, word, start):
+        """
+        Return (end, token_id) of the longest piece matching word[start:end],
+        or (start, None) if no piece matches.
+        """
+        children, ids = self._children, self._ids
+        node, best_end, best_id = 0, start, None
+        for position in range(start, len(word)):
+            node = children[node].get(word[position])
+            if node is None:
+                break
+            if ids[node] is not None:
+                best_end, best_id = position + 1, ids[node]
+        return best_end, best_id
+
+
+class WordPieceTokenizer:
+    """
+    Pure-Python BERT (uncased) tokenizer producing the same ids as
+    transformers.BertTokenizer, optimized for batches:
+
+    - basic tokenization (cleanup, lowercasing, accent stripping, punctuation
+      splitting) follows BertTokenizer's BasicTokenizer,
+    - WordPiece uses two tries (word-initial and '##' continuation pieces)
+      for greedy longest-match instead of repeated substring lookups,
+    - the ids of each distinct word are memoized, since ingredient lists
+      reuse a small vocabulary of words.
+
+    Called like a Hugging Face tokenizer with return_tensors='np'.
+    """
+
+    def __init__(self, vocab, do_lower_case=True, memo_size=DEFAULT_MEMO_SIZE, name_or_path='wordpiece'):
+        """
+        Args:
+            vocab (dict): token -> id.
+            do_lower_case (bool): Lowercase and strip accents (uncased models).
+            memo_size (int): Maximum number of memoized words.
+        """
+        self.vocab = dict(vocab)
+        self.do_lower_case = do_lower_case
+        self.name_or_path = name_or_path
+        self.unk_token_id = self.vocab['[UNK]']
+        self.sep_token_id = self.vocab['[SEP]']
+        self.pad_token_id = self.vocab['[PAD]']
+        self.cls_token_id = self.vocab['[CLS]']
+
+        self._initial = _Trie()
+        self._continuation = _Trie()
+        for token, token_id in self.vocab.items():
+            if token.startswith('##'):
+                self._continuation.add(token[2:], token_id)
+            else:
+                self._initial.add(token, token_id)
+
+        self._memo = {}
+        self._memo_size = memo_size
+        self._memo_lock = threading.Lock()
+        specials = [re.escape(token) for token in SPECIAL_TOKENS if token in self.vocab]
+        self._special_re = re.compile('(' + '|'.join(specials) + ')') if specials else None
+
+    @classmethod
+    def from_file(cls, vocab_path, **kwargs):
+        """
+        Load a BERT vocab.txt (one token per line, line number = id).
+        """
+        with open(vocab_path, encoding='utf-8') as f:
+            vocab = {line.rstrip('\n'): index for index, line in enumerate(f)}
+        kwargs.setdefault('name_or_path', vocab_path)
+        return cls(vocab, **kwargs)
+
+    # ----- basic tokenization -----
+
+    def _clean(self, text):
+        output = []
+        for char in text:
+            cp = ord(char)
+            if cp == 0 or cp == 0xFFFD or _is_control(char):
+                continue
+            if _is_whitespace(char):
+                output.append(' ')
+            elif _is_chinese_char(cp):
+                output.append(f' {char} ')
+            else:
+                output.append(char)
+        return unicodedata.normalize('NFC', ''.join(output))
+
+    def _strip_accents(self, text):
+        return ''.join(char for char in unicodedata.normalize('NFD', text)
+                       if unicodedata.category(char) != 'Mn')
+
+    def _split_punctuation(self, token):
+        pieces, current = [], []
+        for char in token:
+            if _is_punctuation(char):
+                if current:
+                    pieces.append(''.join(current))
+                    current = []
+                pieces.append(char)
+            else:
+                current.append(char)
+        if current:
+            pieces.append(''.join(current))
+        return pieces
+
+    def _basic_tokenize(self, text):
+        words = []
+        for token in self._clean(text).split():
+            if self.do_lower_case:
+                token = self._strip_accents(token.lower())
+            words.extend(self._split_punctuation(token))
+        return words
+
+    # ----- WordPiece -----
+
+    def _word_ids(self, word):
+        ids = self._memo.get(word)
+        if ids is not None:
+            return ids
+        if len(word) > MAX_INPUT_CHARS_PER_WORD:
+            ids = (self.unk_token_id,)
+        else:
+            pieces = []
+            start = 0
+            while start < len(word):
+                trie = self._initial if start == 0 else self._continuation
+                end, token_id = trie.longest_prefix(word, start)
+                if token_id is None:
+                    pieces = [self.unk_token_id]
+                    break
+                pieces.append(token_id)
+                start = end
+            ids = tuple(pieces)
+        with self._memo_lock:
+            # Start over rather than track recency; the working set is small
+            if len(self._memo) >= self._memo_size:
+                self._memo.clear()
+            self._memo[word] = ids
+        return ids
+
+    def encode(self, text):
+        """
+        Return the token ids of a text, without special tokens.
+        """
+        ids = []
+        parts = self._special_re.split(text) if self._special_re else [text]
+        for part in parts:
+            if part in SPECIAL_TOKENS:
+                ids.append(self.vocab[part])
+                continue
+            for word in self._basic_tokenize(part):
+                ids.extend(self._word_ids(word))
+        return ids
+
+    def __call__(self, texts, max_length=128, padding='max_length', truncation=True,
+                 return_tensors='np', add_special_tokens=True):
+        """
+        Encode a text or list of texts into padded numpy arrays.
+        Returns:
+            dict: 'input_ids', 'attention_mask', 'token_type_ids' as (n, length) int64 arrays.
+        """
+        if return_tensors != 'np':
+            raise ValueError("WordPieceTokenizer only supports return_tensors='np'")
+        if isinstance(texts, str):
+            texts = [texts]
+
+        special = 2 if add_special_tokens else 0
+        encoded = []
+        for text in texts:
+            ids = self.encode(text)
+            if truncation and max_length is not None:
+                ids = ids[:max(max_length - special, 0)]
+            if add_special_tokens:
+                ids = [self.cls_token_id] + ids + [self.sep_token_id]
+            encoded.append(ids)
+
+        if padding == 'max_length' and max_length is not None:
+            length = max_length
+        elif padding in (True, 'longest', 'max_length'):
+            length = max((len(ids) for ids in encoded), default=0)
+        else:
+            raise ValueError("WordPieceTokenizer needs padding='max_length' or 'longest'")
+
+        input_ids = np.full((len(encoded), length), self.pad_token_id, dtype=np.int64)
+        attention_mask = np.zeros((len(encoded), length), dtype=np.int64)
+        for row, ids in enumerate(encoded):
+            input_ids[row, :len(ids)] = ids
+            attention_mask[row, :len(ids)] = 1
+        return {
+            'input_ids': input_ids,
+            'attention_mask': attention_mask,
+            'token_type_ids': np.zeros((len(encoded), length), dtype=np.int64),
+        }
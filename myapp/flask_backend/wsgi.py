@@ -0,0 +1,6 @@
+# WSGI entry point for production servers, e.g.
+#   gunicorn -c gunicorn.conf.py wsgi:application
+# (app.py's __main__ block runs the Flask development server instead)
+from app import app
+
+application = app
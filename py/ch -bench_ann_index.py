@@ -0,0 +1,110 @@
+"""
+Compare the approximate (LSH) TF-IDF similarity backend with the exact one.
+
+Usage:
+    python "ch -bench_ann_index.py" --sizes 100000 1000000 --queries 200 --k 10
+
+The first corpus is the ingredient vocabulary of cleaned_allergen_dataset.csv;
+the others are synthetic vocabularies scaled up from it (see
+"ch -bench_fuzzy_index.py"). For each corpus the report shows the index build
+time, per-query latency of both backends, the average number of candidates
+the LSH index re-scores, and recall@k: the share of the exact top-k
+neighbours (cosine > 0) that the LSH backend also returns.
+"""
+import os
+import time
+import random
+import argparse
+import importlib.util
+
+import numpy as np
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def _load(name, filename):
+    # The module file names contain spaces, so load them by path
+    spec = importlib.util.spec_from_file_location(name, os.path.join(HERE, filename))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+ingredient_analysis = _load('ingredient_analysis', 'ch -ingredient_analysis.py')
+bench_fuzzy_index = _load('bench_fuzzy_index', 'ch -bench_fuzzy_index.py')
+RandomProjectionIndex = ingredient_analysis.RandomProjectionIndex
+
+
+def exact_top_k(query_vectors, matrix, k):
+    similarities = (query_vectors @ matrix.T).tocsr()
+    results = []
+    for row in range(similarities.shape[0]):
+        start, end = similarities.indptr[row], similarities.indptr[row + 1]
+        scores = similarities.data[start:end]
+        columns = similarities.indices[start:end]
+        keep = scores > 0
+        scores, columns = scores[keep], columns[keep]
+        if len(scores) > k:
+            columns = columns[np.argpartition(-scores, k - 1)[:k]]
+        results.append(set(columns.tolist()))
+    return results
+
+
+def run(label, vocabulary, queries, args):
+    vectorizer = TfidfVectorizer(ngram_range=(1, 2))
+    matrix = vectorizer.fit_transform(vocabulary)
+    query_vectors = vectorizer.transform(queries)
+
+    start = time.perf_counter()
+    index = RandomProjectionIndex(matrix, n_bits=args.bits, n_tables=args.tables,
+                                  multi_probe=args.multi_probe, bucket_size=args.bucket_size)
+    build_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    expected = exact_top_k(query_vectors, matrix, args.k)
+    exact_ms = (time.perf_counter() - start) * 1000 / len(queries)
+
+    start = time.perf_counter()
+    approximate = index.query(query_vectors, threshold=0.0, top_k=args.k)
+    lsh_ms = (time.perf_counter() - start) * 1000 / len(queries)
+
+    candidates = len(index.candidate_pairs(index._keys(query_vectors))[0]) / len(queries)
+    found = sum(len(want & set(got.tolist())) for want, (got, _) in zip(expected, approximate))
+    wanted = sum(len(want) for want in expected)
+    recall = found / wanted if wanted else 1.0
+
+    print(f"{label:>12} {len(vocabulary):>9} {index.n_bits:>5} {build_time:>9.2f} {exact_ms:>9.3f} "
+          f"{lsh_ms:>9.3f} {candidates:>11.0f} {recall:>9.3f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--csv', default=os.path.join(HERE, 'cleaned_allergen_dataset.csv'))
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100000, 1000000],
+                        help='synthetic vocabulary sizes')
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--k', type=int, default=10)
+    parser.add_argument('--bits', type=int, default=None, help='bits per key (default: sized from the corpus)')
+    parser.add_argument('--bucket-size', type=int, default=16)
+    parser.add_argument('--tables', type=int, default=16)
+    parser.add_argument('--multi-probe', action='store_true')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    base = bench_fuzzy_index.base_ingredients(args.csv)
+    print(f"{'corpus':>12} {'size':>9} {'bits':>5} {'build s':>9} {'exact ms':>9} {'lsh ms':>9} "
+          f"{'candidates':>11} {f'recall@{args.k}':>9}")
+
+    # Queries are dataset ingredients and variants of them
+    queries = [rng.choice(base) if rng.random() < 0.5 else bench_fuzzy_index.mutate(rng.choice(base), rng)
+               for _ in range(args.queries)]
+    run('dataset', base, queries, args)
+    for size in args.sizes:
+        vocabulary = bench_fuzzy_index.build_vocabulary(base, size, rng)
+        run('synthetic', vocabulary, queries, args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,121 @@
+"""
+Benchmark FuzzyIngredientIndex against the original per-ingredient fuzz.ratio loop.
+
+Usage:
+    python "ch -bench_fuzzy_index.py" --sizes 1000 100000 1000000 --queries 20
+
+The vocabulary is built from the ingredients in cleaned_allergen_dataset.csv,
+padded with synthetic variants (typos, prefixes, suffixes) up to each size.
+For sizes up to --max-baseline (all sizes by default) the original loop is
+also timed and both methods must return the same matches.
+"""
+import os
+import sys
+import time
+import random
+import argparse
+import importlib.util
+
+import pandas as pd
+from fuzzywuzzy import fuzz
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# The module file name contains a space, so load it by path
+_spec = importlib.util.spec_from_file_location(
+    'ingredient_analysis', os.path.join(HERE, 'ch -ingredient_analysis.py')
+)
+ingredient_analysis = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(ingredient_analysis)
+FuzzyIngredientIndex = ingredient_analysis.FuzzyIngredientIndex
+
+PREFIXES = ['organic', 'raw', 'dried', 'roasted', 'ground', 'natural', 'refined', 'whole', 'powdered', 'smoked']
+SUFFIXES = ['extract', 'oil', 'powder', 'flakes', 'paste', 'syrup', 'concentrate', 'flour', 'butter', 'juice']
+LETTERS = 'abcdefghijklmnopqrstuvwxyz'
+
+
+def base_ingredients(csv_path):
+    df = pd.read_csv(csv_path)
+    names = set()
+    for combined in df['Combined_Ingredients'].astype(str).str.lower():
+        names.update(i.strip() for i in combined.split(',') if i.strip() and i.strip() != 'none')
+    return sorted(names)
+
+
+def mutate(word, rng):
+    choice = rng.random()
+    if choice < 0.3:
+        return f"{rng.choice(PREFIXES)} {word}"
+    if choice < 0.6:
+        return f"{word} {rng.choice(SUFFIXES)}"
+    # Random typo: substitution, insertion or deletion
+    chars = list(word)
+    pos = rng.randrange(len(chars) + 1)
+    op = rng.random()
+    if op < 0.4 and pos < len(chars):
+        chars[pos] = rng.choice(LETTERS)
+    elif op < 0.8:
+        chars.insert(pos, rng.choice(LETTERS))
+    elif pos < len(chars):
+        del chars[pos]
+    return ''.join(chars)
+
+
+def build_vocabulary(base, size, rng):
+    vocabulary = set(base)
+    pool = list(base)
+    while len(vocabulary) < size:
+        word = mutate(rng.choice(pool), rng)
+        if word not in vocabulary:
+            vocabulary.add(word)
+            pool.append(word)
+    return sorted(vocabulary)[:size]
+
+
+def baseline(query, vocabulary, threshold):
+    # The loop used by IngredientAnalyzer._find_similar_ingredients before the index
+    return [idx for idx, known in enumerate(vocabulary) if fuzz.ratio(query, known) / 100 > threshold]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--csv', default=os.path.join(HERE, 'cleaned_allergen_dataset.csv'))
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 100000, 1000000])
+    parser.add_argument('--queries', type=int, default=20)
+    parser.add_argument('--threshold', type=float, default=0.6)
+    parser.add_argument('--max-baseline', type=int, default=1000000,
+                        help='largest vocabulary size for which the original loop is also run')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    base = base_ingredients(args.csv)
+    print(f"{len(base)} distinct ingredients in {os.path.basename(args.csv)}")
+    print(f"{'size':>9} {'build s':>9} {'index ms/q':>11} {'loop ms/q':>10} {'speedup':>8} {'same':>5}")
+
+    for size in args.sizes:
+        vocabulary = build_vocabulary(base, size, rng)
+        queries = [mutate(rng.choice(base), rng) for _ in range(args.queries)]
+
+        start = time.perf_counter()
+        index = FuzzyIngredientIndex(vocabulary)
+        build_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        indexed = [index.query(q, args.threshold) for q in queries]
+        index_ms = (time.perf_counter() - start) * 1000 / len(queries)
+
+        if size <= args.max_baseline:
+            start = time.perf_counter()
+            expected = [baseline(q, vocabulary, args.threshold) for q in queries]
+            loop_ms = (time.perf_counter() - start) * 1000 / len(queries)
+            same = 'yes' if expected == indexed else 'NO'
+            print(f"{size:>9} {build_time:>9.2f} {index_ms:>11.3f} {loop_ms:>10.3f} {loop_ms / index_ms:>7.1f}x {same:>5}")
+            if same != 'yes':
+                sys.exit(1)
+        else:
+            print(f"{size:>9} {build_time:>9.2f} {index_ms:>11.3f} {'-':>10} {'-':>8} {'-':>5}")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,30 +1,346 @@
+import os
+import sys
+import json
+import hashlib
+import argparse
 import pandas as pd
 import numpy as np
+import scipy.sparse as sp
 from collections import defaultdict
 from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
 from fuzzywuzzy import fuzz
 
+# Bump when the layout of the prebuilt index artifact changes
+ARTIFACT_VERSION = 2
+# Allergen flags stored per ingredient in the artifact
+_ALLERGEN_FLAG = 1
+_NO_ALLERGEN_FLAG = 2
+# TF-IDF similarity search: 'exact' scores every known ingredient,
+# 'lsh' only re-scores candidates from a RandomProjectionIndex
+SIMILARITY_BACKENDS = ('exact', 'lsh')
+# The 'lsh' backend is only used from this many known ingredients on; below
+# it the exact search is faster. Measured with "ch -bench_ann_index.py": up to
+# 1M rows no index setting beat the exact search at any useful recall.
+LSH_MIN_ROWS = 2000000
+
+
+class FuzzyIngredientIndex:
+    """
+    Index for finding strings whose fuzz.ratio with a query is above a threshold
+    without scoring the whole vocabulary.
+
+    fuzz.ratio is 2*M / (len(a) + len(b)) where M (matched characters) can never
+    exceed min(len(a), len(b)) nor the number of characters the two strings
+    share. Both bounds are checked with NumPy before any exact scoring:
+    strings are sorted by length so only a contiguous length window is
+    considered, and a character histogram per string bounds M for that window.
+    Only the survivors are scored with fuzz.ratio, so results are identical to
+    scoring every string.
+    """
+
+    # Characters are counted in this many histogram buckets (by code point)
+    N_BUCKETS = 64
+
+    def __init__(self, strings, arrays=None):
+        """
+        Args:
+            strings (list of str): The vocabulary.
+            arrays (dict): Optional prebuilt 'order', 'lengths' and 'histograms'
+                arrays (see to_arrays), e.g. memory-mapped from an artifact.
+        """
+        self.strings = list(strings)
+        if arrays is not None:
+            self._order = arrays['order']
+            self._lengths = arrays['lengths']
+            self._histograms = arrays['histograms']
+            return
+        lengths = np.array([len(s) for s in self.strings], dtype=np.int32)
+        # Sort by length so a length window is a contiguous slice
+        self._order = np.argsort(lengths, kind='stable')
+        self._lengths = lengths[self._order]
+        self._histograms = np.stack(
+            [self._histogram(self.strings[i]) for i in self._order]
+        ) if self.strings else np.zeros((0, self.N_BUCKETS), dtype=np.uint16)
+
+    def to_arrays(self):
+        return {'order': self._order, 'lengths': self._lengths, 'histograms': self._histograms}
+
+    @classmethod
+    def _histogram(cls, text):
+        codes = np.frombuffer(text.encode('utf-32-le'), dtype=np.uint32) % cls.N_BUCKETS
+        return np.bincount(codes, minlength=cls.N_BUCKETS).astype(np.uint16)
+
+    @staticmethod
+    def _passes(matched, total, threshold):
+        # Upper bound of fuzz.ratio (which rounds to an integer percentage)
+        return np.floor(200.0 * matched / np.maximum(total, 1) + 0.5) / 100 > threshold
+
+    def query(self, text, threshold):
+        """
+        Return indices (into the original string list, ascending) of strings
+        with fuzz.ratio(text, string) / 100 > threshold.
+        """
+        if not text or not self.strings:
+            return []
+        length = len(text)
+
+        # Length bound: the ratio can only pass inside one window of lengths
+        candidate_lengths = np.unique(self._lengths)
+        ok = self._passes(np.minimum(candidate_lengths, length), candidate_lengths + length, threshold)
+        if not ok.any():
+            return []
+        lo = np.searchsorted(self._lengths, candidate_lengths[ok].min(), side='left')
+        hi = np.searchsorted(self._lengths, candidate_lengths[ok].max(), side='right')
+
+        # Character histogram bound on the window
+        shared = np.minimum(self._histograms[lo:hi], self._histogram(text)).sum(axis=1)
+        window = np.nonzero(self._passes(shared, self._lengths[lo:hi] + length, threshold))[0] + lo
+
+        # Exact scores for the remaining candidates only
+        matches = [
+            int(i) for i in self._order[window]
+            if fuzz.ratio(text, self.strings[i]) / 100 > threshold
+        ]
+        return sorted(matches)
+
+
+class RandomProjectionIndex:
+    """
+    Approximate cosine-similarity index over the rows of a sparse matrix
+    (random-projection LSH, a.k.a. SimHash).
+
+    Every row is projected on n_bits * n_tables random Gaussian directions; the
+    signs of each group of n_bits projections form one hash key per table.
+    Two rows with cosine similarity s agree on a bit with probability
+    1 - arccos(s) / pi, so similar rows tend to share a key in at least one
+    table. A query looks up its own key (and, with multi_probe, every key one
+    bit away) in each table and only the rows found there are scored exactly.
+
+    By default n_bits is sized from the number of rows so that a bucket holds
+    about bucket_size rows; coarser keys make every query re-score a large
+    share of the corpus, which is slower than the exact search.
+
+    Memory is n_features * n_bits * n_tables float32 values for the
+    projections plus two int32 values per row and table.
+    """
+
+    def __init__(self, matrix, n_bits=None, n_tables=16, multi_probe=False, bucket_size=16, seed=0,
+                 chunk_size=50000):
+        """
+        Args:
+            matrix (scipy.sparse matrix): Rows to index (e.g. L2-normalized TF-IDF vectors).
+            n_bits (int): Bits per hash key. More bits -> smaller buckets, lower recall.
+                None derives it from the row count and bucket_size.
+            n_tables (int): Number of hash tables. More tables -> higher recall, more memory.
+            multi_probe (bool): Also probe the keys at Hamming distance 1.
+            bucket_size (int): Target rows per bucket when n_bits is derived.
+            seed (int): Seed for the random projections.
+            chunk_size (int): Rows hashed at a time while building.
+        """
+        self.matrix = sp.csr_matrix(matrix, dtype=np.float32)
+        n_rows = self.matrix.shape[0]
+        if n_bits is None:
+            n_bits = min(30, max(1, int(np.ceil(np.log2(max(n_rows, 2) / bucket_size)))))
+        if not 1 <= n_bits <= 30:
+            raise ValueError("n_bits must be between 1 and 30")
+        self.n_bits = n_bits
+        self.n_tables = n_tables
+        rng = np.random.default_rng(seed)
+        self.projections = rng.standard_normal(
+            (self.matrix.shape[1], n_bits * n_tables)
+        ).astype(np.float32)
+        self._bit_values = (1 << np.arange(n_bits)).astype(np.int32)
+        self._probe_masks = np.array(
+            [0] + ([1 << bit for bit in range(n_bits)] if multi_probe else []), dtype=np.int32
+        )
+
+        keys = np.concatenate(
+            [self._keys(self.matrix[start:start + chunk_size]) for start in range(0, n_rows, chunk_size)]
+        ) if n_rows else np.zeros((0, n_tables), dtype=np.int32)
+        # One sorted key array per table; a bucket is a contiguous slice of it
+        keys = np.ascontiguousarray(keys.T)
+        self._order = np.argsort(keys, axis=1, kind='stable').astype(np.int32)
+        self._sorted_keys = np.take_along_axis(keys, self._order, axis=1)
+
+    def _keys(self, vectors):
+        # (rows, n_tables) hash keys from the signs of the projections
+        signs = np.asarray(vectors @ self.projections) > 0
+        signs = signs.reshape(signs.shape[0], self.n_tables, self.n_bits)
+        return signs.astype(np.int32) @ self._bit_values
+
+    def candidate_pairs(self, query_keys):
+        """
+        Return (query, row) index arrays of every row sharing a probed key
+        with a query in any table, without duplicates, sorted by query.
+        Args:
+            query_keys (np.ndarray): (queries, n_tables) keys from _keys.
+        """
+        n_queries = query_keys.shape[0]
+        n_probes = len(self._probe_masks)
+        probe_queries = np.repeat(np.arange(n_queries, dtype=np.int64), n_probes)
+        pairs = []
+        for table in range(self.n_tables):
+            probes = (query_keys[:, table, None] ^ self._probe_masks).ravel()
+            sorted_keys = self._sorted_keys[table]
+            lo = np.searchsorted(sorted_keys, probes, side='left')
+            counts = np.searchsorted(sorted_keys, probes, side='right') - lo
+            # Positions lo..hi-1 of every probed bucket, concatenated
+            ends = np.cumsum(counts)
+            positions = np.arange(ends[-1] if len(ends) else 0) + np.repeat(lo - ends + counts, counts)
+            rows = self._order[table, positions].astype(np.int64)
+            pairs.append(np.repeat(probe_queries, counts) * self.matrix.shape[0] + rows)
+        pairs = np.unique(np.concatenate(pairs)) if pairs else np.zeros(0, dtype=np.int64)
+        return pairs // self.matrix.shape[0], pairs % self.matrix.shape[0]
+
+    def query(self, vectors, threshold=0.0, top_k=None):
+        """
+        Approximate nearest rows for each query vector.
+        Args:
+            vectors (scipy.sparse matrix): One query per row, in the same space as the index.
+            threshold (float): Only return rows scoring above this.
+            top_k (int): Return at most this many rows per query. None returns all.
+        Returns:
+            list: One (indices, scores) pair of arrays per query, best score first.
+        """
+        vectors = sp.csr_matrix(vectors, dtype=np.float32)
+        queries, rows = self.candidate_pairs(self._keys(vectors))
+        # Exact scores for the candidate pairs only: one sparse product of the
+        # candidate rows with all queries, read back at the pairs
+        candidates, inverse = np.unique(rows, return_inverse=True)
+        similarities = (self.matrix[candidates] @ vectors.T).tocsr()
+        scores = np.asarray(similarities[inverse, queries]).ravel()
+        keep = scores > threshold
+        queries, rows, scores = queries[keep], rows[keep], scores[keep]
+
+        # Best first within each query, then cut each query's run at top_k
+        ranked = np.lexsort((-scores, queries))
+        queries, rows, scores = queries[ranked], rows[ranked], scores[ranked]
+        starts = np.searchsorted(queries, np.arange(vectors.shape[0] + 1))
+        if top_k is not None:
+            rank = np.arange(len(queries)) - starts[queries]
+            keep = rank < top_k
+            queries, rows, scores = queries[keep], rows[keep], scores[keep]
+            starts = np.searchsorted(queries, np.arange(vectors.shape[0] + 1))
+        return [(rows[start:end], scores[start:end]) for start, end in zip(starts[:-1], starts[1:])]
+
+
+class IngredientContextTable:
+    """
+    Compact store of the dataset rows ("context") each ingredient occurs in.
+
+    Every distinct token gets an integer id, every distinct dataset row is
+    stored once as a run of token ids (CSR-style row_indptr/row_tokens), and
+    an ingredient's context is a run of row ids into that table
+    (context_indptr/context_rows). Duplicate dataset rows share one entry.
+    """
+
+    def __init__(self, tokens, row_indptr, row_tokens, context_indptr, context_rows):
+        self.tokens = list(tokens)
+        self.row_indptr = row_indptr
+        self.row_tokens = row_tokens
+        self.context_indptr = context_indptr
+        self.context_rows = context_rows
+
+    def to_arrays(self):
+        return {
+            'row_indptr': self.row_indptr,
+            'row_tokens': self.row_tokens,
+            'context_indptr': self.context_indptr,
+            'context_rows': self.context_rows,
+        }
+
+    def row(self, row_id):
+        """
+        Return a stored row as its list of ingredient strings.
+        """
+        start, end = self.row_indptr[row_id], self.row_indptr[row_id + 1]
+        return [self.tokens[token] for token in self.row_tokens[start:end]]
+
+    def context(self, position):
+        """
+        Return the context of the ingredient at this position as a sequence
+        of rows, decoded on access.
+        """
+        return ContextView(self, int(self.context_indptr[position]), int(self.context_indptr[position + 1]))
+
+    def nbytes(self):
+        """
+        Approximate memory used by the table, token strings included.
+        """
+        arrays = sum(array.nbytes for array in self.to_arrays().values())
+        return arrays + sys.getsizeof(self.tokens) + sum(sys.getsizeof(token) for token in self.tokens)
+
+
+class ContextView:
+    """
+    Read-only list-like view of one ingredient's context rows.
+    Supports len(), iteration, indexing and slicing (context[:3]).
+    """
+
+    __slots__ = ('_table', '_start', '_end')
+
+    def __init__(self, table, start, end):
+        self._table = table
+        self._start = start
+        self._end = end
+
+    def _row_ids(self):
+        return self._table.context_rows[self._start:self._end]
+
+    def __len__(self):
+        return self._end - self._start
+
+    def __iter__(self):
+        for row_id in self._row_ids():
+            yield self._table.row(row_id)
+
+    def __getitem__(self, item):
+        if isinstance(item, slice):
+            return [self._table.row(row_id) for row_id in self._row_ids()[item]]
+        return self._table.row(self._row_ids()[item])
+
+
 class IngredientAnalyzer:
     """
     A class to analyze ingredients and their associated allergens from a dataset.
     Provides methods to map ingredients to allergens and analyze ingredient lists.
     """
 
-    def __init__(self, csv_path=r'C:\Users\PMLS\Downloads\NUTRI-GUARD\py\cleaned_allergen_dataset.csv'):
+    def __init__(self, csv_path=r'C:\Users\PMLS\Downloads\NUTRI-GUARD\py\cleaned_allergen_dataset.csv',
+                 artifact_path=None, use_artifact=True, similarity_backend='exact', lsh_min_rows=LSH_MIN_ROWS):
         """
         Initialize the analyzer with the allergen dataset.
-        Load the dataset into a pandas DataFrame and create mappings and vectors.
-        """
-        self.df = pd.read_csv(csv_path)  # Load allergen dataset
-        print("Columns in the dataset:", self.df.columns)
-        # Create mapping between ingredients and their allergens
-        self.ingredient_allergen_map = self._create_ingredient_allergen_map()
-        # Initialize TF-IDF vectorizer with unigrams and bigrams
-        #bigrams so that we can match ingredients like "peanut butter" and "almond milk"
-        self.vectorizer = TfidfVectorizer(ngram_range=(1, 2))
-        # Create vectors for ingredient matching
-        self._create_ingredient_vectors()
+        If a prebuilt index artifact for this dataset exists (see build_artifact)
+        it is loaded instead; otherwise the dataset is loaded into a pandas
+        DataFrame and the mappings and vectors are created.
+        similarity_backend selects the TF-IDF similarity search: 'exact', or
+        'lsh' for an approximate RandomProjectionIndex on large vocabularies
+        (only built from lsh_min_rows known ingredients on; smaller
+        vocabularies use the exact search).
+        """
+        if similarity_backend not in SIMILARITY_BACKENDS:
+            raise ValueError(f"similarity_backend must be one of {SIMILARITY_BACKENDS}")
+
+        artifact_path = artifact_path or default_artifact_path(csv_path)
+        if use_artifact and artifact_is_current(artifact_path, csv_path):
+            self._load_artifact(artifact_path)
+        else:
+            self.df = pd.read_csv(csv_path)  # Load allergen dataset
+            print("Columns in the dataset:", self.df.columns)
+            # Create mapping between ingredients and their allergens
+            self.ingredient_allergen_map = self._create_ingredient_allergen_map()
+            # Initialize TF-IDF vectorizer with unigrams and bigrams
+            #bigrams so that we can match ingredients like "peanut butter" and "almond milk"
+            self.vectorizer = TfidfVectorizer(ngram_range=(1, 2))
+            # Create vectors for ingredient matching
+            self._create_ingredient_vectors()
+
+        if similarity_backend == 'lsh' and self.ingredient_vectors.shape[0] < lsh_min_rows:
+            print(f"{self.ingredient_vectors.shape[0]} ingredients is below lsh_min_rows={lsh_min_rows}; "
+                  f"using the exact similarity search")
+            similarity_backend = 'exact'
+        self.similarity_backend = similarity_backend
+        self.ann_index = RandomProjectionIndex(self.ingredient_vectors) if similarity_backend == 'lsh' else None
 
     def _create_ingredient_vectors(self):
         
@@ -37,49 +353,141 @@ class IngredientAnalyzer:
             ' '.join(ing.split()) for ing in ingredients # single space between words
         ])
         self.known_ingredients = ingredients  # Store for later reference
+        # Index for fuzzy matching without scoring every known ingredient
+        self.fuzzy_index = FuzzyIngredientIndex(ingredients)
 
-    def _find_similar_ingredients(self, ingredient, threshold=0.6):
+    def _find_similar_ingredients(self, ingredient, threshold=0.6, top_k=None):
         """
         Find similar ingredients using TF-IDF and fuzzy matching.
         """
-        # Convert input ingredient to vector
-        ingredient_vector = self.vectorizer.transform([ingredient])
-        # Calculate similarity with all known ingredients
-        '''[0] is used to: Extract the first (and only) row of the 2D array returned by cosine_similarity'''
-        similarities = cosine_similarity(ingredient_vector, self.ingredient_vectors)[0]
-        
-        similar_ingredients = []
-        for idx, score in enumerate(similarities):
+        return self._find_similar_ingredients_batch([ingredient], threshold, top_k)[0]
+
+    def _find_similar_ingredients_batch(self, ingredients, threshold=0.6, top_k=None):
+        """
+        Find similar ingredients for many ingredients at once.
+        All ingredients are vectorized in one transform call and scored with a
+        single sparse matrix product. TF-IDF rows are L2-normalized, so the
+        product is the cosine similarity.
+        Args:
+            ingredients (list): Ingredient strings to look up.
+            threshold (float): Minimum TF-IDF cosine / fuzzy ratio to count as similar.
+            top_k (int): Keep at most this many TF-IDF matches per ingredient
+                (the best scoring ones). None keeps all of them.
+        Returns:
+            list: For each ingredient, the similar known ingredients in the
+                order of the known ingredient list.
+        """
+        if not ingredients:
+            return []
+        # Convert all input ingredients to vectors in one go
+        query_vectors = self.vectorizer.transform(ingredients)
+        if self.ann_index is not None:
+            vector_matches = [columns for columns, _ in self.ann_index.query(query_vectors, threshold, top_k)]
+        else:
+            vector_matches = self._exact_vector_matches(query_vectors, threshold, top_k)
+
+        results = []
+        for ingredient, columns in zip(ingredients, vector_matches):
             # Add ingredients that meet vector similarity threshold
-            if score > threshold:
-                similar_ingredients.append(self.known_ingredients[idx])
-            
+            matched = set(columns.tolist())
             # Use fuzzy string matching as backup method
-            fuzzy_score = fuzz.ratio(ingredient, self.known_ingredients[idx]) / 100
-            if fuzzy_score > threshold and self.known_ingredients[idx] not in similar_ingredients:
-                similar_ingredients.append(self.known_ingredients[idx])
-        
-        return similar_ingredients
+            matched.update(self.fuzzy_index.query(ingredient, threshold))
+
+            # Keep the order of the known ingredient list
+            results.append([self.known_ingredients[idx] for idx in sorted(matched)])
+        return results
+
+    def _exact_vector_matches(self, query_vectors, threshold, top_k):
+        # (queries x known) similarities; stays sparse since most pairs share no terms
+        similarities = (query_vectors @ self.ingredient_vectors.T).tocsr()
+        matches = []
+        for row in range(similarities.shape[0]):
+            start, end = similarities.indptr[row], similarities.indptr[row + 1]
+            scores = similarities.data[start:end]
+            columns = similarities.indices[start:end]
+            above = scores > threshold
+            scores, columns = scores[above], columns[above]
+            if top_k is not None and len(scores) > top_k:
+                columns = columns[np.argpartition(-scores, top_k - 1)[:top_k]]
+            matches.append(columns)
+        return matches
 
     def _create_ingredient_allergen_map(self):
         """
         Create enhanced ingredient-allergen mapping with context.
         """
-        # Create dictionary with nested structure for allergens and context
-        mapping = defaultdict(lambda: {'allergens': set(), 'context': []})
+        ingredients, flags, self.context_table = _ingredient_table(self.df)
+        return _mapping_from_table(ingredients, flags, self.context_table)
+
+    def save_artifact(self, artifact_path, csv_path):
+        """
+        Serialize the ingredient map, fitted vectorizer vocabulary, sparse
+        ingredient matrix and fuzzy index into a versioned artifact directory.
+        Arrays are stored as .npy files so they can be memory-mapped on load.
+        """
+        os.makedirs(artifact_path, exist_ok=True)
+        ingredients, flags, table = _ingredient_table(self.df)
+        arrays = {
+            'allergen_flags': flags,
+            'matrix_data': self.ingredient_vectors.data,
+            'matrix_indices': self.ingredient_vectors.indices,
+            'matrix_indptr': self.ingredient_vectors.indptr,
+            'idf': self.vectorizer.idf_,
+        }
+        for name, array in table.to_arrays().items():
+            arrays[f'context_{name}'] = array
+        for name, array in self.fuzzy_index.to_arrays().items():
+            arrays[f'fuzzy_{name}'] = array
+        for name, array in arrays.items():
+            np.save(os.path.join(artifact_path, f'{name}.npy'), np.ascontiguousarray(array))
+
+        with open(os.path.join(artifact_path, 'data.json'), 'w') as f:
+            json.dump({
+                'tokens': table.tokens,
+                'ingredients': ingredients,
+                'vocabulary': {term: int(col) for term, col in self.vectorizer.vocabulary_.items()},
+            }, f)
+        # Written last so a partially written artifact is never considered current
+        with open(os.path.join(artifact_path, 'meta.json'), 'w') as f:
+            json.dump({
+                'version': ARTIFACT_VERSION,
+                'csv_sha256': _file_sha256(csv_path),
+                'ngram_range': list(self.vectorizer.ngram_range),
+                'matrix_shape': list(self.ingredient_vectors.shape),
+            }, f)
 
-        for _, row in self.df.iterrows():
-            # Get the combined ingredients and label
-            combined_ingredients = str(row['Combined_Ingredients']).lower().split(', ')
-            label = row['Label']  # 1 indicates allergen present, 0 indicates no allergen
+    def _load_artifact(self, artifact_path):
+        """
+        Load everything built by save_artifact, memory-mapping the arrays.
+        """
+        def load(name):
+            return np.load(os.path.join(artifact_path, f'{name}.npy'), mmap_mode='r')
 
-            # Map each ingredient to its allergens and context
-            for ingredient in combined_ingredients:
-                if ingredient and ingredient != 'none':  # Skip empty or invalid ingredients
-                    mapping[ingredient]['allergens'].add('allergen' if label == 1 else 'no allergen')
-                    mapping[ingredient]['context'].append(combined_ingredients)
+        with open(os.path.join(artifact_path, 'meta.json')) as f:
+            meta = json.load(f)
+        with open(os.path.join(artifact_path, 'data.json')) as f:
+            data = json.load(f)
 
-        return mapping
+        self.df = None  # The dataset itself is not needed once the artifact exists
+        self.context_table = IngredientContextTable(data['tokens'], **{
+            name: load(f'context_{name}')
+            for name in ('row_indptr', 'row_tokens', 'context_indptr', 'context_rows')
+        })
+        self.ingredient_allergen_map = _mapping_from_table(
+            data['ingredients'], load('allergen_flags'), self.context_table
+        )
+
+        # Rebuild the fitted vectorizer from its vocabulary and idf weights
+        self.vectorizer = TfidfVectorizer(ngram_range=tuple(meta['ngram_range']), vocabulary=data['vocabulary'])
+        self.vectorizer.idf_ = np.asarray(load('idf'))
+        self.ingredient_vectors = sp.csr_matrix(
+            (load('matrix_data'), load('matrix_indices'), load('matrix_indptr')),
+            shape=tuple(meta['matrix_shape']),
+        )
+        self.known_ingredients = data['ingredients']
+        self.fuzzy_index = FuzzyIngredientIndex(self.known_ingredients, arrays={
+            name: load(f'fuzzy_{name}') for name in ('order', 'lengths', 'histograms')
+        })
 
     def analyze_ingredients(self, ingredients_text, tflite_classifier):
         """
@@ -96,9 +504,33 @@ class IngredientAnalyzer:
                   similar ingredients and their associated allergens
                 - 'model_prediction': TFLite model's prediction for the input text
         """
-        print("Ingredients text:", ingredients_text)
+        return self.analyze_many([ingredients_text], tflite_classifier)[0]
+
+    def analyze_many(self, ingredients_texts, tflite_classifier):
+        """
+        Analyze several ingredient lists (labels) at once.
+        The similarity search for every ingredient of every label is done in
+        one batch, so the TF-IDF cost is one transform and one matrix product
+        for the whole call.
+        Args:
+            ingredients_texts (list): Comma-separated ingredient lists to analyze.
+            tflite_classifier (AllergenClassifier): Instance of the TFLite classifier.
+        Returns:
+            list: One analyze_ingredients() result dict per input text.
+        """
         # Split and clean input ingredients
-        ingredients = [i.strip().lower() for i in ingredients_text.split(',')]
+        labels = [[i.strip().lower() for i in text.split(',')] for text in ingredients_texts]
+        # Look up each distinct ingredient once across all labels
+        distinct = list(dict.fromkeys(ingredient for ingredients in labels for ingredient in ingredients))
+        similar = dict(zip(distinct, self._find_similar_ingredients_batch(distinct)))
+
+        return [
+            self._analyze_label(text, ingredients, similar, tflite_classifier)
+            for text, ingredients in zip(ingredients_texts, labels)
+        ]
+
+    def _analyze_label(self, ingredients_text, ingredients, similar, tflite_classifier):
+        print("Ingredients text:", ingredients_text)
         found_allergens = set()  # Track unique allergens
         high_risk_ingredients = []  # Track direct matches
         potential_risks = []  # Track similar ingredient matches
@@ -120,8 +552,7 @@ class IngredientAnalyzer:
                     })
 
             # Check for similar ingredients that might indicate allergens
-            similar_ingredients = self._find_similar_ingredients(ingredient)
-            for similar_ing in similar_ingredients:
+            for similar_ing in similar[ingredient]:
                 if similar_ing != ingredient:  # Avoid duplicate matches
                     allergens = self.ingredient_allergen_map[similar_ing]['allergens']
                     if allergens:  # If allergens found in similar ingredient
@@ -143,4 +574,165 @@ class IngredientAnalyzer:
             'potential_risks': potential_risks,
             'model_prediction': model_prediction,
             'final_decision': final_decision
-        }
\ No newline at end of file
+        }
+
+
+def _ingredient_table(df):
+    """
+    Vectorized construction of the ingredient table from the dataset.
+    Returns:
+        tuple: ingredients (unique ingredients in order of first appearance),
+            flags (uint8 array of allergen flags per ingredient),
+            table (IngredientContextTable with each ingredient's context rows).
+    """
+    lowered = df['Combined_Ingredients'].astype(str).str.lower()
+    # Distinct rows are stored once; row_ids maps each dataset row to its entry
+    row_ids, unique_rows = pd.factorize(lowered)
+    split = pd.Series(unique_rows).str.split(', ')
+    row_lengths = split.str.len().to_numpy()
+    token_ids, tokens = pd.factorize(split.explode())
+    row_indptr = np.zeros(len(split) + 1, dtype=np.int64)
+    row_indptr[1:] = np.cumsum(row_lengths)
+
+    # One entry per ingredient occurrence in the dataset
+    occurrences = pd.DataFrame({
+        'row': np.repeat(row_ids, row_lengths[row_ids]),
+        'ingredient': lowered.str.split(', ').explode().values,
+        'flag': np.repeat(np.where(df['Label'].to_numpy() == 1, _ALLERGEN_FLAG, _NO_ALLERGEN_FLAG),
+                          row_lengths[row_ids]),
+    })
+    # Skip empty or invalid ingredients
+    occurrences = occurrences[(occurrences['ingredient'] != '') & (occurrences['ingredient'] != 'none')]
+
+    # Ingredient ids in order of first appearance, as iterating the rows would give
+    codes, ingredients = pd.factorize(occurrences['ingredient'])
+    flags = np.zeros(len(ingredients), dtype=np.uint8)
+    np.bitwise_or.at(flags, codes, occurrences['flag'].to_numpy().astype(np.uint8))
+
+    # Group occurrences by ingredient, keeping dataset order within each group
+    order = np.argsort(codes, kind='stable')
+    context_indptr = np.zeros(len(ingredients) + 1, dtype=np.int64)
+    context_indptr[1:] = np.cumsum(np.bincount(codes, minlength=len(ingredients)))
+    table = IngredientContextTable(
+        list(tokens),
+        row_indptr,
+        token_ids.astype(np.int32),
+        context_indptr,
+        occurrences['row'].to_numpy()[order].astype(np.int32),
+    )
+    return list(ingredients), flags, table
+
+
+def _mapping_from_table(ingredients, flags, table):
+    """
+    Build the ingredient -> {'allergens', 'context'} mapping from the table.
+    'context' is a ContextView over the ingredient's rows.
+    """
+    mapping = {}
+    for position, (ingredient, flag) in enumerate(zip(ingredients, flags)):
+        allergens = set()
+        if flag & _ALLERGEN_FLAG:
+            allergens.add('allergen')
+        if flag & _NO_ALLERGEN_FLAG:
+            allergens.add('no allergen')
+        mapping[ingredient] = {'allergens': allergens, 'context': table.context(position)}
+    return mapping
+
+
+def _deep_sizeof(obj, seen=None):
+    # sys.getsizeof over containers, counting shared objects once
+    seen = set() if seen is None else seen
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(_deep_sizeof(k, seen) + _deep_sizeof(v, seen) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set)):
+        size += sum(_deep_sizeof(item, seen) for item in obj)
+    return size
+
+
+def memory_report(csv_path):
+    """
+    Compare the memory used by ingredient contexts stored as nested lists
+    (one list per dataset row, appended for every ingredient in it) with the
+    IngredientContextTable.
+    Returns:
+        dict: 'list_bytes', 'table_bytes', 'rows', 'unique_rows', 'context_entries'.
+    """
+    df = pd.read_csv(csv_path)
+    contexts = defaultdict(list)
+    for combined in df['Combined_Ingredients'].astype(str).str.lower():
+        row = combined.split(', ')
+        for ingredient in row:
+            if ingredient and ingredient != 'none':
+                contexts[ingredient].append(row)
+
+    ingredients, _, table = _ingredient_table(df)
+    views = [table.context(position) for position in range(len(ingredients))]
+    return {
+        'list_bytes': _deep_sizeof(dict(contexts)),
+        'table_bytes': table.nbytes() + sum(sys.getsizeof(view) for view in views),
+        'rows': len(df),
+        'unique_rows': len(table.row_indptr) - 1,
+        'context_entries': len(table.context_rows),
+    }
+
+
+def _file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def default_artifact_path(csv_path):
+    """
+    Artifact directory used for a dataset when none is given: <csv name>.index
+    next to the CSV.
+    """
+    return os.path.splitext(csv_path)[0] + '.index'
+
+
+def artifact_is_current(artifact_path, csv_path):
+    """
+    True if the artifact exists, has the current layout version and was built
+    from this exact CSV.
+    """
+    meta_path = os.path.join(artifact_path, 'meta.json')
+    if not os.path.exists(meta_path) or not os.path.exists(csv_path):
+        return False
+    with open(meta_path) as f:
+        meta = json.load(f)
+    return meta.get('version') == ARTIFACT_VERSION and meta.get('csv_sha256') == _file_sha256(csv_path)
+
+
+def build_artifact(csv_path, artifact_path=None):
+    """
+    Build the analyzer from the CSV and write its prebuilt index artifact.
+    """
+    artifact_path = artifact_path or default_artifact_path(csv_path)
+    analyzer = IngredientAnalyzer(csv_path=csv_path, use_artifact=False)
+    analyzer.save_artifact(artifact_path, csv_path)
+    return artifact_path
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Build the prebuilt ingredient index artifact.')
+    parser.add_argument('--csv', default=os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                                      'cleaned_allergen_dataset.csv'))
+    parser.add_argument('--out', default=None, help='artifact directory (default: <csv name>.index)')
+    parser.add_argument('--memory-report', action='store_true',
+                        help='print context memory as nested lists vs. the compact table and exit')
+    args = parser.parse_args()
+    if args.memory_report:
+        report = memory_report(args.csv)
+        print(f"{report['rows']} rows ({report['unique_rows']} distinct), "
+              f"{report['context_entries']} context entries")
+        print(f"nested lists: {report['list_bytes'] / 2**20:.1f} MiB")
+        print(f"compact table: {report['table_bytes'] / 2**20:.1f} MiB")
+        sys.exit(0)
+    path = build_artifact(args.csv, args.out)
+    print(f"Wrote ingredient index artifact to {path}", file=sys.stderr)